@@ -20,7 +20,9 @@ export interface Product {
   fundCode?: string;
   realProductCode?: string;
   notes?: string;
+  navDate?: string;
   updatedAt?: string;
+  lastCheckedAt?: string;
 }
 
 export interface CycleData {
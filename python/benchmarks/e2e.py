@@ -0,0 +1,192 @@
+#!/usr/bin/env python3
+"""End-to-end throughput benchmark against local provider stubs.
+
+Runs ``scrape_all`` and ``run_scrape`` over generated catalogs and reports products/sec,
+peak RSS and request counts. Results can be saved as a baseline and later runs compared
+against it:
+
+    python3 python/benchmarks/e2e.py --sizes 10,100,1000 --save-baseline
+    python3 python/benchmarks/e2e.py --sizes 10,100,1000 --compare
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import resource
+import shutil
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Dict, List
+
+ROOT_DIR = Path(__file__).resolve().parents[1]
+if str(ROOT_DIR) not in sys.path:
+    sys.path.insert(0, str(ROOT_DIR))
+
+from benchmarks.stubs import PROVIDER_HOSTS, StubConfig, StubFarm, build_catalog  # noqa: E402
+from wealth_scraper import cache, http, metrics, throttle  # noqa: E402
+from wealth_scraper.run import run_scrape  # noqa: E402
+from wealth_scraper.scraper import load_targets, scrape_all  # noqa: E402
+
+DEFAULT_BASELINE = Path(__file__).resolve().parent / "baselines" / "e2e.json"
+
+
+def _peak_rss_mb() -> float:
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports KiB, macOS bytes.
+    return round(peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024, 1)
+
+
+def _run_case(farm: StubFarm, mode: str, size: int, catalog_path: Path, fund_path: Path, workdir: Path) -> Dict:
+    farm.reset_counters()
+    metrics.reset()
+    started = time.perf_counter()
+    if mode == "scrape_all":
+        products, failures = scrape_all(load_targets(catalog_path))
+        succeeded, failed = len(products), len(failures)
+    else:
+        summary = run_scrape(
+            wealth_links=catalog_path,
+            fund_links=fund_path,
+            wealth_output=workdir / "out" / "wealth.json",
+            fund_output=workdir / "out" / "fund.json",
+        )
+        succeeded, failed = summary["wealth"]["count"], summary["wealth"]["failed"]
+    elapsed = time.perf_counter() - started
+
+    requests = sum(counter["requests"] for counter in farm.counters.values())
+    return {
+        "mode": mode,
+        "size": size,
+        "succeeded": succeeded,
+        "failed": failed,
+        "seconds": round(elapsed, 3),
+        "productsPerSec": round(size / elapsed, 2) if elapsed else 0.0,
+        "requests": requests,
+        "requestsPerProduct": round(requests / size, 2) if size else 0.0,
+        "stubErrors": sum(counter["errors"] for counter in farm.counters.values()),
+        "stubThrottled": sum(counter["throttled"] for counter in farm.counters.values()),
+        "peakRssMb": _peak_rss_mb(),
+    }
+
+
+def _bench_case(farm: StubFarm, mode: str, size: int, providers: List[str], workdir: Path, warm: bool) -> Dict:
+    catalog_path = workdir / f"catalog-{size}.json"
+    catalog_path.write_text(json.dumps(build_catalog(size, providers), ensure_ascii=False), encoding="utf-8")
+    fund_path = workdir / "fund_links.txt"
+    fund_path.write_text("", encoding="utf-8")
+
+    # Every case starts from an empty state dir; --warm-cache measures a second run on top of it.
+    state_dir = Path(os.environ["WEALTH_STATE_DIR"])
+    shutil.rmtree(state_dir, ignore_errors=True)
+    cache.reset()
+    throttle.reset()
+    if warm:
+        _run_case(farm, mode, size, catalog_path, fund_path, workdir)
+        cache.flush()
+    result = _run_case(farm, mode, size, catalog_path, fund_path, workdir)
+    result["cache"] = "warm" if warm else "cold"
+    return result
+
+
+def run_benchmarks(
+    sizes: List[int], modes: List[str], providers: List[str], config: StubConfig, warm: bool = False
+) -> List[Dict]:
+    results: List[Dict] = []
+    with StubFarm(config) as farm, tempfile.TemporaryDirectory() as tmp:
+        active = [name for name in providers if name in farm.servers]
+        skipped = sorted(set(providers) - set(active))
+        if skipped:
+            print(f"[bench] skipping providers without a stub: {', '.join(skipped)}", file=sys.stderr)
+        http.set_host_overrides(farm.host_overrides())
+        os.environ["WEALTH_STATE_DIR"] = str(Path(tmp) / "state")
+        try:
+            for mode in modes:
+                for size in sizes:
+                    result = _bench_case(farm, mode, size, active, Path(tmp), warm)
+                    print(
+                        f"[bench] {mode} size={size}: {result['productsPerSec']} products/s, "
+                        f"{result['requests']} requests, peak RSS {result['peakRssMb']} MB",
+                        file=sys.stderr,
+                    )
+                    results.append(result)
+        finally:
+            http.set_host_overrides(None)
+    return results
+
+
+def compare(results: List[Dict], baseline: List[Dict], threshold: float) -> List[str]:
+    """Return regressions where throughput dropped by more than threshold (fraction)."""
+    previous = {(item["mode"], item["size"], item.get("cache", "cold")): item for item in baseline}
+    regressions: List[str] = []
+    for item in results:
+        base = previous.get((item["mode"], item["size"], item.get("cache", "cold")))
+        if not base or not base.get("productsPerSec"):
+            continue
+        ratio = item["productsPerSec"] / base["productsPerSec"]
+        line = f"{item['mode']} size={item['size']}: {base['productsPerSec']} -> {item['productsPerSec']} products/s ({ratio:.2f}x)"
+        print(f"[compare] {line}", file=sys.stderr)
+        if ratio < 1 - threshold:
+            regressions.append(line)
+        if item["requests"] > base.get("requests", item["requests"]):
+            print(f"[compare] {item['mode']} size={item['size']}: requests {base['requests']} -> {item['requests']}", file=sys.stderr)
+    return regressions
+
+
+def main(argv: List[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description="End-to-end scrape throughput benchmark against local stubs.")
+    parser.add_argument("--sizes", default="10,100", help="Comma-separated catalog sizes (e.g. 10,100,1000,10000)")
+    parser.add_argument("--modes", default="scrape_all,run_scrape", help="scrape_all and/or run_scrape")
+    parser.add_argument("--providers", default=",".join(PROVIDER_HOSTS), help="Providers to include")
+    parser.add_argument("--latency", type=float, default=0.0, help="Stub latency per request in seconds")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fraction of stub requests answered with 503")
+    parser.add_argument("--max-concurrency", type=int, default=0, help="Requests each stub host serves at once before answering 429")
+    parser.add_argument("--nav-points", type=int, default=200, help="NAV history length per product")
+    parser.add_argument("--html-padding", type=int, default=0, help="Extra bytes added to wealthccb pages")
+    parser.add_argument("--warm-cache", action="store_true", help="Measure a second run that reuses the first run's caches")
+    parser.add_argument("--baseline", type=Path, default=DEFAULT_BASELINE, help="Baseline JSON path")
+    parser.add_argument("--save-baseline", action="store_true", help="Write results to the baseline file")
+    parser.add_argument("--compare", action="store_true", help="Compare against the baseline file")
+    parser.add_argument("--threshold", type=float, default=0.25, help="Allowed throughput drop before failing")
+    args = parser.parse_args(argv)
+
+    # Keep retry backoff from dominating the measurement when error injection is on.
+    os.environ.setdefault("WEALTH_HTTP_RETRY_BACKOFF", "0.01")
+    config = StubConfig(
+        latency=args.latency,
+        error_rate=args.error_rate,
+        max_concurrency=args.max_concurrency,
+        nav_points=args.nav_points,
+        html_padding=args.html_padding,
+    )
+    results = run_benchmarks(
+        [int(size) for size in args.sizes.split(",") if size.strip()],
+        [mode.strip() for mode in args.modes.split(",") if mode.strip()],
+        [name.strip() for name in args.providers.split(",") if name.strip()],
+        config,
+        warm=args.warm_cache,
+    )
+    report = {"config": config.__dict__, "results": results}
+    print(json.dumps(report, ensure_ascii=False, indent=2))
+
+    if args.save_baseline:
+        args.baseline.parent.mkdir(parents=True, exist_ok=True)
+        args.baseline.write_text(json.dumps(report, ensure_ascii=False, indent=2) + "\n", encoding="utf-8")
+    if args.compare:
+        if not args.baseline.exists():
+            print(f"[compare] no baseline at {args.baseline}", file=sys.stderr)
+            return 1
+        baseline = json.loads(args.baseline.read_text(encoding="utf-8"))
+        regressions = compare(results, baseline.get("results") or [], args.threshold)
+        if regressions:
+            for line in regressions:
+                print(f"[compare] REGRESSION {line}", file=sys.stderr)
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
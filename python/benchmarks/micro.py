@@ -0,0 +1,209 @@
+#!/usr/bin/env python3
+"""Micro-benchmarks for the CPU-side hot paths, gated against a committed baseline.
+
+Timings are divided by a fixed pure-Python calibration loop measured in the same run,
+so the baseline stays comparable across machines. A benchmark fails the gate when its
+normalized time grows by more than ``--threshold`` over the baseline:
+
+    python3 python/benchmarks/micro.py                  # compare, exit 1 on regression
+    python3 python/benchmarks/micro.py --save-baseline  # refresh baselines/micro.json
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import statistics
+import sys
+import time
+from pathlib import Path
+from typing import Callable, Dict, List, Tuple
+
+ROOT_DIR = Path(__file__).resolve().parents[1]
+if str(ROOT_DIR) not in sys.path:
+    sys.path.insert(0, str(ROOT_DIR))
+
+from benchmarks.stubs import nav_series, wealthccb_html  # noqa: E402
+from wealth_scraper import codec  # noqa: E402
+from wealth_scraper.models import Product, Returns  # noqa: E402
+from wealth_scraper.providers import chinawealth, wealthccb  # noqa: E402
+from wealth_scraper.utils import compute_window_return_with_details, normalize_returns, parse_date  # noqa: E402
+
+DEFAULT_BASELINE = Path(__file__).resolve().parent / "baselines" / "micro.json"
+PAGE_BYTES = 1_000_000
+NAV_ROWS = 5_000
+
+
+def _calibrate() -> int:
+    total = 0
+    for i in range(200_000):
+        total += i * i
+    return total
+
+
+def _wealthccb_page() -> str:
+    html = wealthccb_html("12", nav_series("wealthccb-bench", 400))
+    padding = max(0, PAGE_BYTES - len(html.encode("utf-8")))
+    return wealthccb_html("12", nav_series("wealthccb-bench", 400), padding)
+
+
+def build_cases() -> List[Tuple[str, Callable[[], object]]]:
+    page = _wealthccb_page()
+    series = nav_series("chinawealth-bench", NAV_ROWS)
+    net_items = [
+        {"subShareCode": "A", "netValueDate": f"{day:%Y-%m-%d}", "shareNetVal": str(value)} for day, value in series
+    ]
+    date_strings = []
+    for index, (day, _) in enumerate(series):
+        if index % 3 == 0:
+            date_strings.append(f"{day:%Y%m%d}")
+        elif index % 3 == 1:
+            date_strings.append(f"{day:%Y-%m-%d} 00:00:00")
+        else:
+            date_strings.append(f"{day:%Y/%m/%d}")
+    returns = {"1m": 2.345678, "3m": None, "6m": 3.1}
+    nav_payload = codec.dumps({"code": "0000", "data": {"list": net_items * 4}})
+    products = [
+        {
+            "name": f"稳健理财{index}号",
+            "code": f"P{index:06d}",
+            "riskLevel": "R2",
+            "returns": {"1m": 2.3456, "3m": 3.21, "6m": None},
+            "banks": ["建设银行", "招商银行"],
+            "url": f"https://example.com/{index}",
+        }
+        for index in range(2000)
+    ]
+    models = [
+        Product(
+            name=item["name"],
+            code=item["code"],
+            issuer="建信理财",
+            banks=item["banks"],
+            currency="人民币",
+            min_hold_days=90,
+            risk_level=item["riskLevel"],
+            returns=Returns.from_values(item["returns"]),
+            url=item["url"],
+            id=f"w-{item['code']}",
+        )
+        for item in products
+    ]
+
+    def windows() -> None:
+        for days in (30, 90, 180):
+            compute_window_return_with_details(series, days)
+
+    return [
+        ("wealthccb.parse_html[1MB]", lambda: wealthccb.parse_html(page, "https://www.wealthccb.com/product/12.html")),
+        (
+            "wealthccb.parse_stream[1MB,64KB chunks]",
+            lambda: wealthccb.parse_stream(
+                (page[index : index + 65536] for index in range(0, len(page), 65536)),
+                "https://www.wealthccb.com/product/12.html",
+            ),
+        ),
+        ("wealthccb._extract_series[1MB,x3]", lambda: [wealthccb._extract_series(page, key) for key in ("week", "month", "byear")]),
+        ("chinawealth._build_nav_series[5000]", lambda: chinawealth._build_nav_series(net_items, sub_share_code="A")),
+        (f"codec.loads[nav 20000 rows,{codec.BACKEND}]", lambda: codec.loads(nav_payload)),
+        (f"codec.dumps[2000 products,indent,{codec.BACKEND}]", lambda: codec.dumps(products, indent=True)),
+        ("models.Product.to_dict[2000 products]", lambda: [product.to_dict() for product in models]),
+        ("utils.parse_date[5000]", lambda: [parse_date(value) for value in date_strings]),
+        ("utils.compute_window_return_with_details[5000,x3]", windows),
+        ("utils.normalize_returns[x1000]", lambda: [normalize_returns(returns) for _ in range(1000)]),
+    ]
+
+
+def measure(func: Callable[[], object], repeat: int = 5, min_time: float = 0.2) -> float:
+    """Best-of-repeat seconds per call, looping enough calls to exceed min_time."""
+    number = 1
+    while True:
+        started = time.perf_counter()
+        for _ in range(number):
+            func()
+        elapsed = time.perf_counter() - started
+        if elapsed >= min_time or number >= 1 << 16:
+            break
+        number *= 2
+    best = elapsed / number
+    for _ in range(repeat - 1):
+        started = time.perf_counter()
+        for _ in range(number):
+            func()
+        best = min(best, (time.perf_counter() - started) / number)
+    return best
+
+
+def run(only: List[str] | None = None, repeat: int = 5) -> Dict:
+    calibrations: List[float] = []
+    results: Dict[str, Dict[str, float]] = {}
+    for name, func in build_cases():
+        if only and not any(key in name for key in only):
+            continue
+        func()  # warm caches (regex compilation, allocator) before timing
+        # Re-calibrate next to each case so frequency drift on shared runners cancels out.
+        calibration = measure(_calibrate, repeat=repeat)
+        calibrations.append(calibration)
+        seconds = measure(func, repeat=repeat)
+        results[name] = {"seconds": seconds, "normalized": round(seconds / calibration, 4)}
+        print(f"[micro] {name}: {seconds * 1000:.3f} ms ({results[name]['normalized']}x calibration)", file=sys.stderr)
+    calibration = min(calibrations) if calibrations else 0.0
+    return {"calibrationSeconds": calibration, "python": sys.version.split()[0], "benchmarks": results}
+
+
+def merge_runs(reports: List[Dict]) -> Dict:
+    """Median of several runs per benchmark; keeps one noisy run from skewing the baseline."""
+    merged = dict(reports[0])
+    merged["calibrationSeconds"] = statistics.median(report["calibrationSeconds"] for report in reports)
+    merged["benchmarks"] = {}
+    for name in reports[0]["benchmarks"]:
+        samples = [report["benchmarks"][name] for report in reports]
+        merged["benchmarks"][name] = {
+            "seconds": statistics.median(sample["seconds"] for sample in samples),
+            "normalized": statistics.median(sample["normalized"] for sample in samples),
+        }
+    return merged
+
+
+def compare(report: Dict, baseline: Dict, threshold: float) -> List[str]:
+    regressions: List[str] = []
+    for name, current in report["benchmarks"].items():
+        base = (baseline.get("benchmarks") or {}).get(name)
+        if not base:
+            print(f"[micro] {name}: no baseline", file=sys.stderr)
+            continue
+        ratio = current["normalized"] / base["normalized"]
+        print(f"[micro] {name}: {ratio:.2f}x baseline", file=sys.stderr)
+        if ratio > 1 + threshold:
+            regressions.append(f"{name}: {ratio:.2f}x slower than baseline (limit {1 + threshold:.2f}x)")
+    return regressions
+
+
+def main(argv: List[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description="Parser/analytics micro-benchmarks with regression gates.")
+    parser.add_argument("--baseline", type=Path, default=DEFAULT_BASELINE, help="Baseline JSON path")
+    parser.add_argument("--save-baseline", action="store_true", help="Write results as the new baseline")
+    parser.add_argument("--threshold", type=float, default=0.3, help="Allowed slowdown fraction before failing")
+    parser.add_argument("--only", action="append", help="Run only benchmarks whose name contains this text")
+    parser.add_argument("--repeat", type=int, default=5, help="Repetitions per benchmark (best is kept)")
+    parser.add_argument("--runs", type=int, default=3, help="Full runs; the median per benchmark is reported")
+    args = parser.parse_args(argv)
+
+    report = merge_runs([run(args.only, args.repeat) for _ in range(max(1, args.runs))])
+    print(json.dumps(report, ensure_ascii=False, indent=2))
+
+    if args.save_baseline:
+        args.baseline.parent.mkdir(parents=True, exist_ok=True)
+        args.baseline.write_text(json.dumps(report, ensure_ascii=False, indent=2) + "\n", encoding="utf-8")
+        return 0
+    if not args.baseline.exists():
+        print(f"[micro] no baseline at {args.baseline}; run with --save-baseline", file=sys.stderr)
+        return 0
+    regressions = compare(report, json.loads(args.baseline.read_text(encoding="utf-8")), args.threshold)
+    for line in regressions:
+        print(f"[micro] REGRESSION {line}", file=sys.stderr)
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,343 @@
+"""Local stub HTTP servers that mimic each provider's endpoints.
+
+Every provider gets its own ThreadingHTTPServer on 127.0.0.1; ``StubFarm.host_overrides()``
+returns the mapping to hand to ``wealth_scraper.http.set_host_overrides`` so the real
+provider code talks to the stubs unchanged. Latency, error rate and payload size
+(NAV points per product and HTML padding) are configurable.
+"""
+
+from __future__ import annotations
+
+import datetime as dt
+import hashlib
+import json
+import random
+import subprocess
+import threading
+import time
+from dataclasses import dataclass, field
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Dict, List, Optional, Tuple
+from urllib.parse import parse_qs, unquote_plus, urlsplit
+
+PROVIDER_HOSTS = {
+    "wealthccb": "www.wealthccb.com",
+    "cibwm": "www.cibwm.com.cn",
+    "bocomm": "www.bocommwm.cn",
+    "spdb": "www.spdb-wm.com",
+    "chinawealth": "xinxipilu.chinawealth.com.cn",
+    "cmb": "cfweb.paas.cmbchina.com",
+}
+
+_END_DATE = dt.date(2026, 3, 6)
+
+
+@dataclass
+class StubConfig:
+    latency: float = 0.0
+    error_rate: float = 0.0
+    # Requests a host serves at once before answering 429 with Retry-After (0 = unlimited).
+    max_concurrency: int = 0
+    retry_after: int = 1
+    nav_points: int = 200
+    html_padding: int = 0
+    seed: int = 7
+    # Products the chinawealth issuer listing pages through (catalog indices 1..N).
+    listing_size: int = 2000
+
+
+def nav_series(key: str, points: int) -> List[Tuple[dt.date, float]]:
+    """Deterministic daily NAV history ending at a fixed date."""
+    rng = random.Random(int(hashlib.md5(key.encode("utf-8")).hexdigest()[:8], 16))
+    value = 1.0 + rng.random() * 0.1
+    series: List[Tuple[dt.date, float]] = []
+    day = _END_DATE - dt.timedelta(days=points - 1)
+    for _ in range(points):
+        value *= 1 + rng.uniform(-0.0004, 0.0006)
+        series.append((day, round(value, 4)))
+        day += dt.timedelta(days=1)
+    return series
+
+
+def wealthccb_html(product: str, series: List[Tuple[dt.date, float]], padding: int = 0) -> str:
+    """A wealthccb product page with week/month/byear chart blocks."""
+    blocks = []
+    for time_key, days in (("week", 30), ("month", 90), ("byear", 180)):
+        window = series[-days:]
+        dates = ",".join(f"'{d:%Y%m%d}'" for d, _ in window)
+        values = ",".join(str(v) for _, v in window)
+        blocks.append(
+            f"if(time == '{time_key}'){{\n  var xData = [{dates}];\n  var sData = [{values}];\n  draw(xData, sData);\n}}\n"
+        )
+    filler = "<!-- " + "x" * padding + " -->" if padding else ""
+    return (
+        "<html><head><title>product</title></head><body>"
+        f'<h4 class="cp-title">建信理财稳鑫{product}号(JXWX{product})</h4>'
+        '<p class="firtst">R2(中低风险)</p>\n<p class="second">风险等级</p>'
+        f"{filler}<script>\nfunction render(time){{\n{''.join(blocks)}}}\n</script></body></html>"
+    )
+
+
+def _generate_private_key() -> Optional[str]:
+    try:
+        result = subprocess.run(
+            ["openssl", "genpkey", "-algorithm", "RSA", "-pkeyopt", "rsa_keygen_bits:1024"],
+            capture_output=True,
+            check=True,
+        )
+    except (FileNotFoundError, subprocess.CalledProcessError):
+        return None
+    return result.stdout.decode("utf-8")
+
+
+class _Router:
+    """Per-provider request handling; returns (status, content_type, body)."""
+
+    def __init__(self, config: StubConfig) -> None:
+        self.config = config
+        self.private_key = _generate_private_key()
+
+    def wealthccb(self, path: str, query: Dict, body: bytes) -> Tuple[int, str, bytes]:
+        product = path.rsplit("/", 1)[-1].split(".")[0]
+        series = nav_series(f"wealthccb-{product}", self.config.nav_points)
+        html = wealthccb_html(product, series, self.config.html_padding)
+        return 200, "text/html; charset=utf-8", html.encode("utf-8")
+
+    def cibwm(self, path: str, query: Dict, body: bytes) -> Tuple[int, str, bytes]:
+        if "getProductDetailByProductId" in path:
+            product_id = path.rsplit("/", 1)[-1]
+            data = {
+                "productCode": f"CIB{product_id[:8]}",
+                "productName": f"兴银理财稳利{product_id[:6]}号",
+                "issuer": "兴银理财有限责任公司",
+                "distributionChannel": "兴业银行,兴银理财",
+                "productDate": "最短持有期90天",
+                "riskLevelOri": "R2",
+                "saleCurrency": "人民币",
+            }
+            return _json({"data": data})
+        payload = json.loads(body or b"{}")
+        if path.endswith("productPriceChange"):
+            return _json({"data": [{"timeRange": "近1月", "yarOfIncAndDcr": 2.31, "baseDt": "20260204", "effectDt": "20260306"}]})
+        series = nav_series(f"cibwm-{payload.get('productId')}", self.config.nav_points)
+        rows = [{"netvalDt": f"{d:%Y%m%d}", "effIopv": str(v)} for d, v in reversed(series)]
+        return _json({"data": {"list": rows[: payload.get("pageSize") or 200]}})
+
+    def bocomm(self, path: str, query: Dict, body: bytes) -> Tuple[int, str, bytes]:
+        form = parse_qs(body.decode("utf-8"))
+        message = json.loads(unquote_plus(form.get("REQ_MESSAGE", ["{}"])[0]) or "{}")
+        fund_code = (message.get("REQ_BODY") or {}).get("c_fundcode", "")
+        if path.endswith("queryJylcProductDetail.do"):
+            product = {
+                "c_fundname": f"交银理财稳享{fund_code[-4:]}号(最低持有90天)",
+                "c_productcode": f"Z{fund_code}",
+                "c_level": "较低风险",
+                "c_moneytype": "人民币",
+                "c_interestway": "0",
+            }
+            return _json({"RSP_BODY": {"result": {"jylcProductBo": product}}})
+        if path.endswith("queryAllHistoricalYieldByFundcode.do"):
+            return _json({"RSP_BODY": {"result": [{"yieldtimeinterval": "3", "yieldratio": "2.10%"}]}})
+        series = nav_series(f"bocomm-{fund_code}", self.config.nav_points)
+        rows = [{"d_cdate": f"{d:%Y%m%d}", "f_netvalue": str(v)} for d, v in series]
+        return _json({"RSP_BODY": {"result": {"profitList": rows}}})
+
+    def spdb(self, path: str, query: Dict, body: bytes) -> Tuple[int, str, bytes]:
+        payload = json.loads(body or b"{}")
+        code = payload.get("searchword", "").split("'")[1] if "'" in payload.get("searchword", "") else ""
+        if payload.get("chlid") == 1002:
+            item = {"PRDC_NM": f"浦银理财天添{code[-4:]}号", "PRDC_RGST_CD": f"Z{code}", "RISK_GRADE": "较低风险", "RS_CRRN": "人民币"}
+            return _json({"data": {"content": [item]}})
+        series = nav_series(f"spdb-{code}", self.config.nav_points)
+        page_size = payload.get("maxline") or 200
+        page = payload.get("page") or 1
+        rows = [{"ISS_DATE": f"{d:%Y%m%d}", "NAV": str(v)} for d, v in reversed(series)]
+        total_pages = max(1, -(-len(rows) // page_size))
+        chunk = rows[(page - 1) * page_size : page * page_size]
+        return _json({"data": {"content": chunk, "totalPages": total_pages}})
+
+    def chinawealth(self, path: str, query: Dict, body: bytes) -> Tuple[int, str, bytes]:
+        if path.endswith("getInitData"):
+            return _json({"data": self.private_key or ""})
+        payload = json.loads(body or b"{}")
+        reg_code = payload.get("prodRegCode", "")
+        if path.endswith("getProductList"):
+            if reg_code:
+                codes = [reg_code]
+            else:
+                page_size = payload.get("pageSize") or 10
+                start = ((payload.get("pageNum") or 1) - 1) * page_size
+                codes = [chinawealth_reg_code(index) for index in range(start + 1, min(start + page_size, self.config.listing_size) + 1)]
+            rows = [
+                {"prodId": f"P{code}", "prodRegCode": code, "prodName": f"理财产品{code}", "orgName": "工银理财有限责任公司"}
+                for code in codes
+            ]
+            return _json({"data": {"list": rows, "total": 1 if reg_code else self.config.listing_size}})
+        series = nav_series(f"chinawealth-{reg_code}", self.config.nav_points)
+        basic = {
+            "prodName": f"工银理财稳利{reg_code[-4:]}号(最低持有30天)",
+            "orgName": "工银理财有限责任公司",
+            "prodRiskLevelName": "二级(中低)",
+            "collCcyName": "人民币",
+            "prodSdate": f"{series[0][0]:%Y-%m-%d}",
+        }
+        net = {
+            "defaultSubShareCode": "A",
+            "netValueLine": [{"subShareCode": "A", "netValueDate": f"{d:%Y-%m-%d}", "shareNetVal": str(v)} for d, v in series],
+        }
+        return _json({"data": {"prodBasicInfoVo": basic, "productTypeNetValueVo": net}})
+
+    def cmb(self, path: str, query: Dict, body: bytes) -> Tuple[int, str, bytes]:
+        saa = (query.get("saaCod") or [""])[0]
+        fun = (query.get("funCod") or [""])[0]
+        if path.endswith("getSAProductDetail"):
+            return _json({"body": {"prdBrief": f"招银理财{fun}", "prdCode": fun, "regcode": f"Z{fun}"}})
+        if path.endswith("getSAProductDetailInfo"):
+            info = {"prdName": f"招银理财招睿{fun}号", "comNam": "招银理财有限责任公司", "risk": "R2", "regCode": f"Z{fun}", "currency": "人民币", "term": "最低持有7天"}
+            return _json({"body": info})
+        payload = json.loads(body or b"{}")
+        series = nav_series(f"cmb-{payload.get('saaCod')}-{payload.get('funCod')}", self.config.nav_points)
+        page_size = payload.get("pageSize") or 200
+        page = payload.get("pageNum") or 1
+        rows = [{"znavDat": f"{d:%Y%m%d}", "znavVal": str(v)} for d, v in reversed(series)]
+        chunk = rows[(page - 1) * page_size : page * page_size]
+        return _json({"body": {"data": chunk, "totalRecord": len(rows)}})
+
+
+def _json(payload: Dict) -> Tuple[int, str, bytes]:
+    return 200, "application/json;charset=UTF-8", json.dumps(payload, ensure_ascii=False).encode("utf-8")
+
+
+def _make_handler(route: Callable, config: StubConfig, counter: Dict[str, int], lock: threading.Lock, rng: random.Random):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+        # Head and body go out as two writes; on a kept-alive connection Nagle would hold
+        # the body back until the client's delayed ACK (~40 ms), which real servers avoid.
+        disable_nagle_algorithm = True
+
+        def log_message(self, format, *args):  # noqa: A002 - signature from BaseHTTPRequestHandler
+            pass
+
+        def _serve(self) -> None:
+            length = int(self.headers.get("Content-Length") or 0)
+            body = self.rfile.read(length) if length else b""
+            with lock:
+                counter["requests"] += 1
+                counter["inFlight"] += 1
+                overloaded = 0 < config.max_concurrency < counter["inFlight"]
+                fail = config.error_rate > 0 and rng.random() < config.error_rate
+            headers: Dict[str, str] = {}
+            try:
+                if config.latency:
+                    time.sleep(config.latency)
+                if overloaded:
+                    with lock:
+                        counter["throttled"] += 1
+                    status, content_type, payload = 429, "text/plain", b"stub throttled"
+                    headers["Retry-After"] = str(config.retry_after)
+                elif fail:
+                    with lock:
+                        counter["errors"] += 1
+                    status, content_type, payload = 503, "text/plain", b"stub overloaded"
+                else:
+                    parts = urlsplit(self.path)
+                    status, content_type, payload = route(parts.path, parse_qs(parts.query), body)
+            finally:
+                with lock:
+                    counter["inFlight"] -= 1
+            self.send_response(status)
+            for name, value in headers.items():
+                self.send_header(name, value)
+            self.send_header("Content-Type", content_type)
+            self.send_header("Content-Length", str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+
+        do_GET = _serve
+        do_POST = _serve
+
+    return Handler
+
+
+class _StubServer(ThreadingHTTPServer):
+    # The default backlog of 5 drops connections when hundreds of requests start at once.
+    request_queue_size = 1024
+    daemon_threads = True
+
+
+@dataclass
+class StubFarm:
+    config: StubConfig = field(default_factory=StubConfig)
+    servers: Dict[str, _StubServer] = field(default_factory=dict)
+    counters: Dict[str, Dict[str, int]] = field(default_factory=dict)
+
+    def start(self, providers: Optional[List[str]] = None) -> "StubFarm":
+        router = _Router(self.config)
+        lock = threading.Lock()
+        rng = random.Random(self.config.seed)
+        for name in providers or list(PROVIDER_HOSTS):
+            if name == "chinawealth" and not router.private_key:
+                continue
+            counter = {"requests": 0, "errors": 0, "throttled": 0, "inFlight": 0}
+            handler = _make_handler(getattr(router, name), self.config, counter, lock, rng)
+            server = _StubServer(("127.0.0.1", 0), handler)
+            threading.Thread(target=server.serve_forever, name=f"stub-{name}", daemon=True).start()
+            self.servers[name] = server
+            self.counters[name] = counter
+        return self
+
+    def stop(self) -> None:
+        for server in self.servers.values():
+            server.shutdown()
+            server.server_close()
+        self.servers.clear()
+
+    def host_overrides(self) -> Dict[str, str]:
+        return {PROVIDER_HOSTS[name]: f"http://127.0.0.1:{server.server_address[1]}" for name, server in self.servers.items()}
+
+    def reset_counters(self) -> None:
+        for counter in self.counters.values():
+            counter["requests"] = 0
+            counter["errors"] = 0
+            counter["throttled"] = 0
+
+    def __enter__(self) -> "StubFarm":
+        return self.start()
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        self.stop()
+
+
+def chinawealth_reg_code(index: int) -> str:
+    return f"Z70{index:011d}"
+
+
+def product_url(provider: str, index: int) -> str:
+    if provider == "wealthccb":
+        return f"https://www.wealthccb.com/product/{index}.html"
+    if provider == "cibwm":
+        return f"https://www.cibwm.com.cn/personal-products/detail/{hashlib.md5(str(index).encode()).hexdigest()}"
+    if provider == "bocomm":
+        return f"https://www.bocommwm.cn/BankCommSite/shtml/jylc/list.shtml?c_fundcode=58{index:08d}"
+    if provider == "spdb":
+        return f"https://www.spdb-wm.com/financialProducts/cpxq.shtml?REAL_PRD_CODE=25{index:08d}"
+    if provider == "chinawealth":
+        return f"https://xinxipilu.chinawealth.com.cn/queryMenu/prodType/prodTypeDetail?prodRegCode={chinawealth_reg_code(index)}"
+    if provider == "cmb":
+        return f"https://cfweb.paas.cmbchina.com/personal/saproductdetail.aspx?saaCod=D{index % 90 + 10:02d}&funCod=GY{index:06d}"
+    raise ValueError(provider)
+
+
+def build_catalog(size: int, providers: List[str]) -> Dict:
+    """A wealth_links.json-shaped catalog spreading size products round-robin over providers."""
+    sites: Dict[str, List[Dict]] = {name: [] for name in providers}
+    for index in range(size):
+        provider = providers[index % len(providers)]
+        sites[provider].append({"url": product_url(provider, index + 1)})
+    return {
+        "sites": [
+            {"site": name, "host": PROVIDER_HOSTS[name], "scraper": name, "products": products}
+            for name, products in sites.items()
+            if products
+        ]
+    }
@@ -0,0 +1,71 @@
+from __future__ import annotations
+
+import asyncio
+import os
+import tempfile
+import unittest
+from pathlib import Path
+from unittest import mock
+
+from python.wealth_scraper import cache
+
+
+class TTLCacheTests(unittest.TestCase):
+    def setUp(self) -> None:
+        self.addCleanup(cache.set_refresh, None)
+
+    def test_entries_persist_expire_and_can_be_refreshed(self) -> None:
+        with tempfile.TemporaryDirectory() as tmp:
+            store = cache.TTLCache("meta", ttl=60, directory=Path(tmp))
+            store.set("a", {"name": "x"})
+            store.save()
+
+            reloaded = cache.TTLCache("meta", ttl=60, directory=Path(tmp))
+            self.assertEqual(reloaded.get("a"), {"name": "x"})
+
+            cache.set_refresh(["meta"])
+            self.assertIsNone(reloaded.get("a"))
+            self.assertEqual(reloaded.get("a", allow_stale=True), {"name": "x"})
+            cache.set_refresh(None)
+
+            reloaded._entries["a"]["storedAt"] -= 120
+            self.assertIsNone(reloaded.get("a"))
+            self.assertEqual(reloaded.get("a", allow_stale=True), {"name": "x"})
+
+    def test_disabled_cache_neither_reads_nor_writes(self) -> None:
+        with tempfile.TemporaryDirectory() as tmp, mock.patch.dict(os.environ, {"WEALTH_CACHE": "0"}):
+            store = cache.TTLCache("meta", ttl=60, directory=Path(tmp))
+            store.set("a", 1)
+            store.save()
+            self.assertIsNone(store.get("a"))
+            self.assertFalse((Path(tmp) / "meta.json").exists())
+
+    def test_metadata_keeps_fields_and_skips_empty_records(self) -> None:
+        calls = []
+
+        async def load():
+            calls.append(1)
+            return {"name": "稳健1号", "nav": 1.02}
+
+        async def empty():
+            return {}
+
+        def metadata(key, load):
+            return asyncio.run(cache.metadata(key, load, ("name",)))
+
+        with tempfile.TemporaryDirectory() as tmp, mock.patch.dict(os.environ, {"WEALTH_STATE_DIR": tmp}):
+            self.addCleanup(cache.reset)
+            cache.reset()
+            self.assertEqual(metadata("p:1", load), {"name": "稳健1号"})
+            self.assertEqual(metadata("p:1", load), {"name": "稳健1号"})
+            self.assertEqual(len(calls), 1)
+            self.assertEqual(metadata("p:2", empty), {})
+            self.assertEqual(len(cache.get_cache("metadata", ttl=1)), 1)
+
+            cache.set_refresh(True)
+            metadata("p:1", load)
+            self.assertEqual(len(calls), 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
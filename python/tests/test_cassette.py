@@ -0,0 +1,43 @@
+from __future__ import annotations
+
+import tempfile
+import unittest
+from pathlib import Path
+
+from python.wealth_scraper.cassette import REPLAY, RECORD, Cassette, request_key
+
+
+class CassetteTests(unittest.TestCase):
+    def test_request_key_ignores_json_key_order(self) -> None:
+        self.assertEqual(
+            request_key("post", "https://a.example/x", b'{"b":1,"a":2}'),
+            request_key("POST", "https://a.example/x", b'{"a": 2, "b": 1}'),
+        )
+
+    def test_replay_serves_recorded_sequence_and_redacts_signatures(self) -> None:
+        with tempfile.TemporaryDirectory() as tmp:
+            recorder = Cassette(Path(tmp), RECORD)
+            for text in ("first", "second"):
+                recorder.record(
+                    "POST",
+                    "https://a.example/api",
+                    b"{}",
+                    {"signature": "secret", "Content-Type": "application/json"},
+                    status=200,
+                    text=text,
+                    elapsed=0.1,
+                )
+            recorder.save()
+            self.assertNotIn("secret", (Path(tmp) / "a.example.json").read_text(encoding="utf-8"))
+
+            player = Cassette(Path(tmp), REPLAY)
+            player.load()
+            served = [player.lookup("POST", "https://a.example/api", b"{}").text for _ in range(3)]
+
+        self.assertEqual(served, ["first", "second", "second"])
+        with self.assertRaises(RuntimeError):
+            player.lookup("GET", "https://a.example/other", None)
+
+
+if __name__ == "__main__":
+    unittest.main()
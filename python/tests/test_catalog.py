@@ -0,0 +1,72 @@
+from __future__ import annotations
+
+import os
+import tempfile
+import unittest
+from pathlib import Path
+from unittest import mock
+
+from python.wealth_scraper import cache, catalog
+from python.wealth_scraper.models import Target
+
+_JSONL = """# cmb products
+{"site": "cmb", "scraper": "CMB", "retries": 2, "salesChannels": ["招商银行"], "rps": 4}
+"https://cfweb.paas.cmbchina.com/a"
+{"url": "https://cfweb.paas.cmbchina.com/b", "banks": "中信银行"}
+
+{"scraper": "wealthccb", "products": ["https://www.wealthccb.com/1"]}
+"https://www.wealthccb.com/2"
+"""
+
+
+class CatalogTests(unittest.TestCase):
+    def setUp(self) -> None:
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.dir = Path(tmp.name)
+        patcher = mock.patch.dict(os.environ, {"WEALTH_STATE_DIR": tmp.name})
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        cache.set_refresh(None)
+
+    def test_jsonl_lines_take_defaults_from_the_site_before_them(self) -> None:
+        path = self.dir / "links.jsonl"
+        path.write_text(_JSONL, encoding="utf-8")
+
+        targets = catalog.load_targets(path)
+
+        self.assertEqual(
+            targets,
+            [
+                Target("https://cfweb.paas.cmbchina.com/a", "cmb", 2, ["招商银行"], {"rps": 4.0}),
+                Target("https://cfweb.paas.cmbchina.com/b", "cmb", 2, ["中信银行"], {"rps": 4.0}),
+                Target("https://www.wealthccb.com/1", "wealthccb"),
+                Target("https://www.wealthccb.com/2", "wealthccb"),
+            ],
+        )
+        path.write_text('"https://a.example/1"\n{"url": ""}\n', encoding="utf-8")
+        with self.assertRaisesRegex(ValueError, r"links\.jsonl:2: missing url"):
+            catalog.load_targets(path)
+
+    def test_compiled_catalog_is_reused_until_the_content_changes(self) -> None:
+        path = self.dir / "links.jsonl"
+        path.write_text(_JSONL, encoding="utf-8")
+        expected = catalog.load_targets(path)
+
+        with mock.patch.object(catalog, "_parse_jsonl", side_effect=AssertionError("parsed again")):
+            self.assertEqual(catalog.load_targets(path), expected)
+            # A touch changes the mtime but not the content.
+            os.utime(path, ns=(path.stat().st_atime_ns, path.stat().st_mtime_ns + 10**9))
+            self.assertEqual(catalog.load_targets(path), expected)
+
+        path.write_text(_JSONL.replace("/a", "/c"), encoding="utf-8")
+        self.assertEqual(catalog.load_targets(path)[0].url, "https://cfweb.paas.cmbchina.com/c")
+        cache.set_refresh(True)
+        self.addCleanup(cache.set_refresh, None)
+        with mock.patch.object(catalog, "_parse_jsonl", return_value=[]) as parse:
+            self.assertEqual(catalog.load_targets(path), [])
+        parse.assert_called_once()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,8 +1,14 @@
 from __future__ import annotations
 
+import asyncio
 import datetime as dt
+import os
+import tempfile
 import unittest
+from unittest import mock
 
+from python.wealth_scraper import cache
+from python.wealth_scraper.providers import chinawealth
 from python.wealth_scraper.providers.chinawealth import _build_nav_series, _parse_risk_level
 from python.wealth_scraper.utils import compute_window_return_with_details
 
@@ -58,5 +64,79 @@ class ChinawealthProviderTests(unittest.TestCase):
         self.assertLess(annualized, 3.0)
 
 
+class ChinawealthIndexTests(unittest.TestCase):
+    def setUp(self) -> None:
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        patcher = mock.patch.dict(os.environ, {"WEALTH_STATE_DIR": tmp.name, "WEALTH_CHINAWEALTH_PAGE_SIZE": "2"})
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        cache.reset()
+        self.addCleanup(cache.reset)
+        self.calls = []
+
+    def _fake_post(self, endpoint, payload):
+        self.calls.append(payload)
+        codes = [f"Z{index}" for index in range(1, 6)]
+        if payload["prodRegCode"]:
+            codes = [payload["prodRegCode"]]
+        else:
+            start = (payload["pageNum"] - 1) * payload["pageSize"]
+            codes = codes[start : start + payload["pageSize"]]
+        rows = [{"prodId": f"P{code}", "prodRegCode": code, "orgName": "工银理财有限责任公司"} for code in codes]
+        return {"data": {"list": rows, "total": 5}}
+
+    def test_prefetch_pages_known_issuers_and_lookups_skip_the_list_call(self) -> None:
+        urls = [f"https://x/detail?prodRegCode=Z{index}" for index in (1, 3, 4)]
+        index = chinawealth._product_index()
+        for url in urls:
+            index.set(chinawealth._reg_code(url), {"prodId": "old", "orgName": "工银理财有限责任公司"})
+        for entry in index._entries.values():
+            entry["storedAt"] -= 7 * 86400
+
+        with mock.patch.object(chinawealth, "_signed_post", new=mock.AsyncMock(side_effect=self._fake_post)):
+            asyncio.run(chinawealth.prefetch(urls))
+            self.assertEqual([call["pageNum"] for call in self.calls], [1, 2])
+            self.assertEqual(asyncio.run(chinawealth._lookup("Z3"))["prodId"], "PZ3")
+            self.assertEqual(len(self.calls), 2)
+            # Unknown products still go through the single-product lookup.
+            self.assertEqual(asyncio.run(chinawealth._lookup("Z9"))["prodId"], "PZ9")
+            self.assertEqual(len(self.calls), 3)
+
+
+class SigningKeyFileTests(unittest.TestCase):
+    def setUp(self) -> None:
+        chinawealth._remove_key_files()
+        self.addCleanup(chinawealth._remove_key_files)
+        patcher = mock.patch.object(chinawealth, "_MAX_KEY_FILES", 1)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_key_files_in_use_are_not_evicted(self) -> None:
+        async def openssl(*args: str, data: bytes) -> bytes:
+            if args[0] != "dgst":
+                return data
+            await asyncio.sleep(0.01)
+            # Other keys came and went meanwhile; this one must still be readable.
+            with open(args[-1], encoding="utf-8") as handle:
+                return handle.read().encode("utf-8")
+
+        async def run() -> list:
+            return await asyncio.gather(*(chinawealth._sign_sha256_rsa_base64(b"{}", f"key {index % 4}") for index in range(12)))
+
+        with mock.patch.object(chinawealth, "_openssl", openssl):
+            signatures = asyncio.run(run())
+        self.assertEqual(signatures, [f"key {index % 4}" for index in range(12)])
+        self.assertEqual(chinawealth.signing_keys(), 1)
+
+    def test_reused_key_keeps_its_file(self) -> None:
+        with chinawealth._key_file("key a") as first:
+            pass
+        with chinawealth._key_file("key a") as again:
+            self.assertEqual(again, first)
+        with chinawealth._key_file("key b"):
+            self.assertFalse(os.path.exists(first))
+
+
 if __name__ == "__main__":
     unittest.main()
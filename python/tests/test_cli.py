@@ -0,0 +1,76 @@
+from __future__ import annotations
+
+import io
+import json
+import os
+import tempfile
+import unittest
+from pathlib import Path
+from unittest import mock
+
+from python.wealth_scraper import cli, events, run, runtime, scraper
+from python.wealth_scraper.models import Product, Returns
+
+
+async def _fetch(url: str) -> Product:
+    return Product(
+        name="稳健1号",
+        code=url.rsplit("/", 1)[-1],
+        issuer="招银理财",
+        banks=["招商银行"],
+        currency="人民币",
+        min_hold_days=None,
+        risk_level="R2",
+        returns=Returns.from_values({"1m": 1.0}),
+        url=url,
+    )
+
+
+class MainTests(unittest.TestCase):
+    """``python -m wealth_scraper`` and the script share cli.main."""
+
+    def test_scrape_options_reach_run_scrape(self) -> None:
+        with mock.patch.object(cli, "run_scrape", return_value={"wealth": {}}) as run, mock.patch("builtins.print"):
+            self.assertEqual(cli.main(["--wealth-links", "w.json", "--changed-only", "--profile"]), 0)
+        self.assertEqual(run.call_args.kwargs["wealth_links"], Path("w.json"))
+        self.assertEqual((run.call_args.kwargs["changed_only"], run.call_args.kwargs["profile"]), (True, True))
+
+    def test_plan_subcommand(self) -> None:
+        with mock.patch.object(cli, "plan_run", return_value={"hosts": {}}) as plan, \
+                mock.patch.object(cli, "run_scrape") as run, mock.patch("builtins.print") as printed:
+            self.assertEqual(cli.main(["plan", "--fund-links", "f.txt", "--timeout", "30"]), 0)
+        run.assert_not_called()
+        self.assertEqual(plan.call_args.args[0][1], Path("f.txt"))
+        self.assertEqual(plan.call_args.kwargs["timeout"], 30.0)
+        self.assertIn('"hosts"', printed.call_args.args[0])
+
+    def test_events_on_stdout_leave_it_pure_jsonl(self) -> None:
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        root = Path(tmp.name)
+        (root / "wealth.jsonl").write_text('{"scraper": "fake"}\n"https://example.com/wealth/A1"\n', encoding="utf-8")
+        (root / "fund.txt").write_text("", encoding="utf-8")
+        self.addCleanup(events.configure, None)
+        self.addCleanup(runtime.current().reset)
+        stdout = io.TextIOWrapper(io.BytesIO(), encoding="utf-8")
+        stderr = io.StringIO()
+        argv = [
+            "--events", "-",
+            "--wealth-links", str(root / "wealth.jsonl"),
+            "--fund-links", str(root / "fund.txt"),
+            "--wealth-output", str(root / "out" / "wealth.json"),
+            "--fund-output", str(root / "out" / "fund.json"),
+        ]
+        env = {"WEALTH_STATE_DIR": str(root / "state"), "WEALTH_REPORT_DIR": str(root / "report")}
+        with mock.patch.dict(os.environ, env), mock.patch.dict(scraper._FETCHERS, {"fake": _fetch}), \
+                mock.patch.object(run, "publish_output"), mock.patch("sys.stdout", stdout), mock.patch("sys.stderr", stderr):
+            self.assertEqual(cli.main(argv), 0)
+            stdout.flush()
+
+        lines = stdout.buffer.getvalue().decode("utf-8").splitlines()
+        self.assertIn("scrape_finish", [json.loads(line)["event"] for line in lines])
+        self.assertEqual(json.loads(stderr.getvalue())["wealth"]["count"], 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
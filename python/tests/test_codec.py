@@ -0,0 +1,71 @@
+from __future__ import annotations
+
+import asyncio
+import json
+import unittest
+from unittest import mock
+from urllib.parse import quote
+
+from python.wealth_scraper import codec
+from python.wealth_scraper.providers import bocomm, cibwm, spdb
+
+
+class CodecTests(unittest.TestCase):
+    def setUp(self) -> None:
+        self.addCleanup(codec.set_backend, codec.BACKEND)
+
+    def test_output_matches_stdlib_for_every_backend(self) -> None:
+        payload = [
+            {"name": "稳健理财 \"1号\"", "returns": {"1m": 2.3456, "3m": None, "6m": -0.5}, "banks": ["建设银行"]},
+            {"tiny": 1e-05, "huge": 1e16, "big": 1 << 70, 3: "int key", "tuple": (1, 2)},
+            [],
+            {},
+        ]
+        expected_indent = json.dumps(payload, ensure_ascii=False, indent=2).encode("utf-8")
+        expected_compact = json.dumps(payload, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+        for backend in (codec.JSON, codec.ORJSON, codec.MSGSPEC):
+            codec.set_backend(backend)
+            with self.subTest(backend=codec.BACKEND):
+                self.assertEqual(codec.dumps(payload, indent=True), expected_indent)
+                self.assertEqual(codec.dumps(payload), expected_compact)
+                self.assertEqual(codec.dumps(payload[0]), json.dumps(payload[0], ensure_ascii=False, separators=(",", ":")).encode("utf-8"))
+
+    def test_loads_accepts_bytes_and_normalizes_errors(self) -> None:
+        self.assertEqual(codec.loads('{"a": [1, 2.5]}'.encode("utf-8")), {"a": [1, 2.5]})
+        with self.assertRaises(codec.JSONDecodeError):
+            codec.loads(b"{not json")
+
+    def test_bank_request_bodies_keep_json_dumps_spacing(self) -> None:
+        def body(module, call) -> bytes:
+            fetch = mock.AsyncMock(return_value={})
+            with mock.patch.object(module, "afetch_json", fetch):
+                asyncio.run(call())
+            return fetch.call_args.kwargs["data"]
+
+        for backend in (codec.JSON, codec.ORJSON, codec.MSGSPEC):
+            codec.set_backend(backend)
+            with self.subTest(backend=codec.BACKEND):
+                bocomm_payload = {"REQ_HEAD": {"TRAN_PROCESS": "", "TRAN_ID": ""}, "REQ_BODY": {"c_fundcode": "5811"}}
+                self.assertEqual(
+                    body(bocomm, lambda: bocomm._post("queryJylcProductDetail.do", {"c_fundcode": "5811"})),
+                    ("REQ_MESSAGE=" + quote(json.dumps(bocomm_payload, ensure_ascii=False))).encode("utf-8"),
+                )
+                spdb_payload = {
+                    "page": 1, "channel": 0, "sort_type": 0, "maxline": 200, "chlid": 1002, "pageflag": "true", "searchword": "浦银",
+                }
+                self.assertEqual(body(spdb, lambda: spdb._search(1002, "浦银")), json.dumps(spdb_payload, ensure_ascii=False).encode("utf-8"))
+                self.assertEqual(
+                    body(cibwm, lambda: cibwm._fetch_price_change("91234")),
+                    json.dumps({"intervalType": "阶段", "productCode": "91234"}, ensure_ascii=False).encode("utf-8"),
+                )
+                nav_payload = {"productId": "P1", "productCode": "91234", "pageNum": 1, "pageSize": 200}
+                self.assertEqual(body(cibwm, lambda: cibwm._fetch_nav("P1", "91234")), json.dumps(nav_payload, ensure_ascii=False).encode("utf-8"))
+
+    def test_unknown_separators_are_rejected(self) -> None:
+        with self.assertRaises(ValueError):
+            codec.dumps({}, separators="tight")
+
+
+if __name__ == "__main__":
+    unittest.main()
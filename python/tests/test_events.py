@@ -0,0 +1,78 @@
+from __future__ import annotations
+
+import json
+import os
+import socket
+import tempfile
+import unittest
+from pathlib import Path
+from unittest import mock
+
+from python.wealth_scraper import cache, events, scraper
+from python.wealth_scraper.models import Product, Returns
+
+
+async def _fetch(url: str) -> Product:
+    if url.endswith("/bad"):
+        raise RuntimeError("boom")
+    return Product(
+        name="稳健1号",
+        code=url.rsplit("/", 1)[-1],
+        issuer="招银理财",
+        banks=["招商银行"],
+        currency="人民币",
+        min_hold_days=None,
+        risk_level="R2",
+        returns=Returns.from_values({"1m": 1.0}),
+        url=url,
+    )
+
+
+class EventStreamTests(unittest.TestCase):
+    def setUp(self) -> None:
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.dir = Path(tmp.name)
+        patcher = mock.patch.dict(os.environ, {"WEALTH_STATE_DIR": tmp.name})
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        cache.reset()
+        self.addCleanup(cache.reset)
+
+    def test_scrape_streams_product_and_progress_events(self) -> None:
+        path = self.dir / "events.jsonl"
+        urls = ["https://example.com/A1", "https://example.com/bad"]
+        with mock.patch.dict(scraper._FETCHERS, {"fake": _fetch}), events.session(str(path)):
+            scraper.scrape_all([{"url": url, "scraper": "fake"} for url in urls], catalog="wealth")
+        self.assertFalse(events.enabled())
+
+        lines = [json.loads(line) for line in path.read_text(encoding="utf-8").splitlines()]
+        self.assertEqual(lines[0], dict(lines[0], event="scrape_start", catalog="wealth", total=2, carried=0))
+        finished = {line["url"]: line for line in lines if line["event"] == "product_finish"}
+        self.assertTrue(finished[urls[0]]["ok"])
+        self.assertEqual((finished[urls[1]]["ok"], finished[urls[1]]["error"]), (False, "boom"))
+        self.assertEqual(
+            {key: lines[-2][key] for key in ("event", "done", "failed", "total", "eta")},
+            {"event": "progress", "done": 2, "failed": 1, "total": 2, "eta": 0.0},
+        )
+        self.assertEqual(lines[-1]["event"], "scrape_finish")
+
+    def test_a_reader_that_goes_away_turns_the_stream_off(self) -> None:
+        address = str(self.dir / "events.sock")
+        server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.addCleanup(server.close)
+        server.bind(address)
+        server.listen(1)
+        with events.session(f"unix:{address}"):
+            conn, _ = server.accept()
+            conn.close()
+            with self.assertLogs("wealth_scraper.events", level="WARNING"):
+                for _ in range(50):
+                    events.emit("progress", done=1)
+                    if not events.enabled():
+                        break
+            self.assertFalse(events.enabled())
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,322 @@
+from __future__ import annotations
+
+import asyncio
+import base64
+import json
+import os
+import shutil
+import ssl
+import subprocess
+import tempfile
+import threading
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Tuple
+from unittest import mock
+from urllib.error import HTTPError, URLError
+
+from python.wealth_scraper import cache, http, metrics, proxies, throttle
+
+
+class _Handler(BaseHTTPRequestHandler):
+    def log_message(self, format, *args):  # noqa: A002 - signature from BaseHTTPRequestHandler
+        pass
+
+    def do_GET(self) -> None:
+        body = b'{"ok": true}'
+        self.send_response(200)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+def _self_signed(directory: Path) -> Tuple[Path, Path]:
+    cert, key = directory / "cert.pem", directory / "key.pem"
+    subprocess.run(
+        ["openssl", "req", "-x509", "-newkey", "rsa:2048", "-nodes", "-days", "1", "-subj", "/CN=localhost",
+         "-addext", "subjectAltName=DNS:localhost", "-keyout", str(key), "-out", str(cert)],
+        check=True,
+        capture_output=True,
+    )
+    return cert, key
+
+
+async def _read_request(reader: asyncio.StreamReader) -> Tuple[str, str, Dict[str, str], bytes]:
+    head = (await reader.readuntil(b"\r\n\r\n")).decode("latin-1")
+    lines = head.split("\r\n")
+    method, target, _ = lines[0].split(" ", 2)
+    headers = dict(line.split(": ", 1) for line in lines[1:] if line)
+    body = await reader.readexactly(int(headers.get("Content-Length") or 0))
+    return method, target, headers, body
+
+
+def _json_response(payload: Dict) -> bytes:
+    body = json.dumps(payload).encode("utf-8")
+    return b"HTTP/1.1 200 OK\r\nContent-Type: application/json\r\nContent-Length: %d\r\n\r\n%s" % (len(body), body)
+
+
+class _Server:
+    """asyncio.start_server answering with respond(method, target, headers, body) -> raw response.
+
+    Connections are closed after each response unless keep_alive, in which case
+    the server reads further requests from them."""
+
+    def __init__(self, respond: Callable[[str, str, Dict[str, str], bytes], bytes], keep_alive: bool = False) -> None:
+        self.respond = respond
+        self.keep_alive = keep_alive
+        self.requests: List[Tuple[str, str, Dict[str, str], bytes]] = []
+        self.connections = 0
+
+    async def __aenter__(self) -> "_Server":
+        self.server = await asyncio.start_server(self._handle, "127.0.0.1", 0)
+        self.url = f"http://127.0.0.1:{self.server.sockets[0].getsockname()[1]}"
+        return self
+
+    async def __aexit__(self, *exc_info) -> None:
+        self.server.close()
+        await self.server.wait_closed()
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        self.connections += 1
+        try:
+            while True:
+                request = await _read_request(reader)
+                self.requests.append(request)
+                writer.write(self.respond(*request))
+                await writer.drain()
+                if not self.keep_alive:
+                    break
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+
+
+class ClientTests(unittest.TestCase):
+    """The asyncio HTTP/1.1 client against scripted local servers."""
+
+    def setUp(self) -> None:
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.dir = Path(tmp.name)
+        patcher = mock.patch.dict(
+            os.environ,
+            {"WEALTH_STATE_DIR": tmp.name, "WEALTH_THROTTLE": "0", "WEALTH_HTTP_RETRIES": "0", "WEALTH_HTTP_RETRY_BACKOFF": "0"},
+        )
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        for reset in (cache.reset, metrics.reset, throttle.reset, proxies.reset, http._TLS_SESSIONS.clear):
+            reset()
+            self.addCleanup(reset)
+
+    def _fetch(self, respond, path: str = "/", keep_alive: bool = False, **kwargs) -> Tuple[http.FetchResult, _Server]:
+        async def run() -> Tuple[http.FetchResult, _Server]:
+            async with _Server(respond, keep_alive) as server:
+                try:
+                    return await http.ahttp_fetch(server.url + path, **kwargs), server
+                finally:
+                    await http.close_idle()
+
+        return asyncio.run(run())
+
+    def test_bodies_delimited_by_chunks_length_or_close(self) -> None:
+        responses = {
+            "chunked": (
+                b"HTTP/1.1 200 OK\r\nTransfer-Encoding: chunked\r\n\r\n"
+                b"5;name=value\r\nhello\r\n7\r\n, world\r\n0\r\nX-Checksum: 1234\r\nX-Other: yes\r\n\r\n"
+            ),
+            "length": b"HTTP/1.1 200 OK\r\nContent-Length: 12\r\n\r\nhello, worldNOT PART OF THE BODY",
+            "close": b"HTTP/1.0 200 OK\r\nContent-Type: text/plain\r\n\r\nhello, world",
+            "interim": b"HTTP/1.1 100 Continue\r\n\r\nHTTP/1.1 200 OK\r\nContent-Length: 12\r\n\r\nhello, world",
+        }
+        for name, raw in responses.items():
+            with self.subTest(name):
+                result, _ = self._fetch(lambda *request, raw=raw: raw)
+                self.assertEqual((result.status, result.content), (200, b"hello, world"))
+
+    def test_post_redirects_follow_urllib(self) -> None:
+        def respond(method: str, target: str, headers: Dict[str, str], body: bytes) -> bytes:
+            if target.startswith("/moved-"):
+                status = target.rsplit("-", 1)[1]
+                return f"HTTP/1.1 {status} Moved\r\nLocation: /landing\r\nContent-Length: 0\r\n\r\n".encode("latin-1")
+            return _json_response({"method": method, "body": body.decode(), "contentType": headers.get("Content-Type")})
+
+        for status in (301, 302, 303):
+            with self.subTest(status):
+                result, server = self._fetch(respond, f"/moved-{status}", method="POST", data=b"a=1")
+                self.assertEqual(json.loads(result.content), {"method": "GET", "body": "", "contentType": None})
+                self.assertEqual([request[:2] for request in server.requests], [("POST", f"/moved-{status}"), ("GET", "/landing")])
+        for status in (307, 308):
+            with self.subTest(status):
+                with self.assertRaises(HTTPError) as caught:
+                    self._fetch(respond, f"/moved-{status}", method="POST", data=b"a=1")
+                self.assertEqual(caught.exception.code, status)
+                result, _ = self._fetch(respond, f"/moved-{status}")
+                self.assertEqual(json.loads(result.content)["method"], "GET")
+
+    def test_redirect_loops_stop(self) -> None:
+        def respond(*request) -> bytes:
+            return b"HTTP/1.1 302 Found\r\nLocation: /loop\r\nContent-Length: 0\r\n\r\n"
+
+        with self.assertRaises(HTTPError) as caught:
+            self._fetch(respond, "/loop")
+        self.assertEqual(caught.exception.reason, "too many redirects")
+        self.assertEqual(len(metrics.records()), 1)
+
+    def test_silent_server_times_out_as_url_error(self) -> None:
+        async def run() -> None:
+            async def never_answer(reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+                await reader.read()
+                writer.close()
+
+            server = await asyncio.start_server(never_answer, "127.0.0.1", 0)
+            try:
+                await http.ahttp_fetch(f"http://127.0.0.1:{server.sockets[0].getsockname()[1]}/", timeout=0.2)
+            finally:
+                server.close()
+
+        with self.assertRaises(URLError) as caught:
+            asyncio.run(run())
+        self.assertIsInstance(caught.exception.reason, TimeoutError)
+
+    def test_over_long_response_lines_are_retried_connection_errors(self) -> None:
+        responses = {
+            "header": b"HTTP/1.1 200 OK\r\nX-Padding: " + b"a" * 70000 + b"\r\nContent-Length: 2\r\n\r\n{}",
+            "chunk": b"HTTP/1.1 200 OK\r\nTransfer-Encoding: chunked\r\n\r\n2;" + b"a" * 70000 + b"\r\n{}\r\n0\r\n\r\n",
+        }
+        for name, response in responses.items():
+            with self.subTest(name), mock.patch.dict(os.environ, {"WEALTH_HTTP_RETRIES": "1"}):
+                metrics.reset()
+                server = None
+
+                async def run() -> None:
+                    nonlocal server
+                    async with _Server(lambda *request: response) as server:
+                        await http.ahttp_fetch(server.url + "/")
+
+                with self.assertRaises(URLError) as caught:
+                    asyncio.run(run())
+                self.assertIn("too long", str(caught.exception.reason))
+                self.assertEqual(len(server.requests), 2)
+
+    def test_kept_alive_connection_is_reused(self) -> None:
+        async def run(keep_alive: bool) -> _Server:
+            async with _Server(lambda *request: _json_response({"ok": True}), keep_alive) as server:
+                for index in range(3):
+                    await http.afetch_json(f"{server.url}/nav/{index}")
+                await http.close_idle()
+            return server
+
+        server = asyncio.run(run(keep_alive=True))
+        self.assertEqual((server.connections, len(server.requests)), (1, 3))
+        self.assertEqual([timing.reused for timing in metrics.records()], [False, True, True])
+
+        # A server that drops the connection after each answer costs a reconnect, not an error.
+        metrics.reset()
+        server = asyncio.run(run(keep_alive=False))
+        self.assertEqual((server.connections, len(server.requests)), (3, 3))
+        self.assertFalse(any(timing.error for timing in metrics.records()))
+
+    @unittest.skipUnless(shutil.which("openssl"), "needs the openssl command")
+    def test_https_tunnels_through_an_authenticated_proxy(self) -> None:
+        cert, key = _self_signed(self.dir)
+        server_context = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+        server_context.load_cert_chain(cert, key)
+        with mock.patch.dict(os.environ, {"WEALTH_CA_BUNDLE": str(cert)}):
+            client_context = http._build_ssl_context(allow_legacy=False)
+        tunnels: List[Tuple[str, str, Optional[str]]] = []
+
+        async def proxy(reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+            try:
+                method, target, headers, _ = await _read_request(reader)
+                authorization = headers.get("Proxy-Authorization")
+                tunnels.append((method, target, authorization))
+                if authorization != "Basic " + base64.b64encode(b"scraper:s3cret").decode("ascii"):
+                    writer.write(b"HTTP/1.1 407 Proxy Authentication Required\r\nContent-Length: 0\r\n\r\n")
+                    await writer.drain()
+                    return
+                writer.write(b"HTTP/1.1 200 Connection established\r\n\r\n")
+                await writer.drain()
+                # Stand in for the site at the end of the tunnel.
+                await writer.start_tls(server_context)
+                method, target, headers, _ = await _read_request(reader)
+                writer.write(_json_response({"method": method, "target": target, "host": headers["Host"]}))
+                await writer.drain()
+            finally:
+                writer.close()
+
+        async def run(credentials: str) -> Dict:
+            server = await asyncio.start_server(proxy, "127.0.0.1", 0)
+            port = server.sockets[0].getsockname()[1]
+            try:
+                with mock.patch.object(http, "_PROXIES", {"https": f"http://{credentials}@127.0.0.1:{port}"}):
+                    return await http.afetch_json("https://localhost:8443/nav?page=1")
+            finally:
+                await http.close_idle()
+                server.close()
+
+        with mock.patch.object(http, "_SSL_CONTEXT", client_context), mock.patch.dict(os.environ, {"no_proxy": "", "NO_PROXY": ""}):
+            self.assertEqual(asyncio.run(run("scraper:s3cret")), {"method": "GET", "target": "/nav?page=1", "host": "localhost:8443"})
+            with self.assertRaises(URLError) as caught:
+                asyncio.run(run("scraper:wrong"))
+        self.assertIn("407", str(caught.exception.reason))
+        self.assertEqual([tunnel[:2] for tunnel in tunnels], [("CONNECT", "localhost:8443")] * 2)
+
+
+class TLSMemoryTests(unittest.TestCase):
+    def setUp(self) -> None:
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.dir = Path(tmp.name)
+        patcher = mock.patch.dict(os.environ, {"WEALTH_STATE_DIR": tmp.name, "WEALTH_THROTTLE": "0"})
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        for reset in (cache.reset, metrics.reset, throttle.reset, http._LEGACY_HOSTS.clear, http._TLS_SESSIONS.clear):
+            reset()
+            self.addCleanup(reset)
+
+    def test_legacy_hosts_are_remembered_in_process_and_on_disk(self) -> None:
+        contexts = []
+
+        async def handshake(url, method, data, headers, timeout, context, proxy=None):
+            contexts.append(context)
+            if context is http._SSL_CONTEXT:
+                raise URLError(ssl.SSLError(1, "[SSL: UNSAFE_LEGACY_RENEGOTIATION_DISABLED] unsafe legacy renegotiation disabled"))
+            return 200, b"{}"
+
+        with mock.patch.object(http, "_request", handshake):
+            http.http_fetch("https://old.bank.example/a")
+            http.http_fetch("https://old.bank.example/b")
+            self.assertEqual(contexts, [http._SSL_CONTEXT, http._SSL_CONTEXT_LEGACY, http._SSL_CONTEXT_LEGACY])
+            cache.flush()
+
+            # A later run starts from the file.
+            cache.reset()
+            http._LEGACY_HOSTS.clear()
+            contexts.clear()
+            http.http_fetch("https://old.bank.example/c")
+            self.assertEqual(contexts, [http._SSL_CONTEXT_LEGACY])
+        self.assertTrue(all(timing.legacy_ssl for timing in metrics.records()))
+
+    @unittest.skipUnless(shutil.which("openssl"), "needs the openssl command")
+    def test_later_connections_resume_the_tls_session(self) -> None:
+        cert, key = _self_signed(self.dir)
+        server_context = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+        server_context.load_cert_chain(cert, key)
+        server = ThreadingHTTPServer(("127.0.0.1", 0), _Handler)
+        server.socket = server_context.wrap_socket(server.socket, server_side=True)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        self.addCleanup(server.server_close)
+        self.addCleanup(server.shutdown)
+
+        with mock.patch.dict(os.environ, {"WEALTH_CA_BUNDLE": str(cert)}):
+            client_context = http._build_ssl_context(allow_legacy=False)
+        with mock.patch.object(http, "_SSL_CONTEXT", client_context):
+            for _ in range(3):
+                self.assertEqual(http.fetch_json(f"https://localhost:{server.server_address[1]}/nav"), {"ok": True})
+        self.assertEqual([timing.tls_resumed for timing in metrics.records()], [False, True, True])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,80 @@
+from __future__ import annotations
+
+import io
+import json
+import logging
+import os
+import unittest
+from typing import Dict
+from unittest import mock
+
+from python.wealth_scraper import logger
+
+
+class ConfigureTests(unittest.TestCase):
+    """configure() reads WEALTH_DEBUG/WEALTH_LOG_* from the environment."""
+
+    def setUp(self) -> None:
+        for name in ("cmb", "http"):
+            self.addCleanup(logging.getLogger(f"{logger.ROOT_NAME}.{name}").setLevel, logging.NOTSET)
+        # Back to the configuration of the real environment (and stderr) afterwards.
+        self.addCleanup(logger.configure, force=True)
+
+    def _configure(self, env: Dict[str, str]) -> io.StringIO:
+        names = ("WEALTH_DEBUG", "WEALTH_LOG_LEVEL", "WEALTH_LOG_LEVELS", "WEALTH_LOG_FORMAT", "WEALTH_LOG_SAMPLE")
+        clean = {name: value for name, value in os.environ.items() if name not in names}
+        stream = io.StringIO()
+        with mock.patch.dict(os.environ, {**clean, **env}, clear=True), mock.patch("sys.stderr", stream):
+            logger.configure(force=True)
+        return stream
+
+    def test_levels_from_the_environment(self) -> None:
+        root = logging.getLogger(logger.ROOT_NAME)
+        cases = [
+            ({}, logging.WARNING),
+            ({"WEALTH_DEBUG": "1"}, logging.DEBUG),
+            ({"WEALTH_LOG_LEVEL": "info"}, logging.INFO),
+            ({"WEALTH_LOG_LEVEL": "15"}, 15),
+            ({"WEALTH_LOG_LEVEL": "loud"}, logging.WARNING),
+            ({"WEALTH_DEBUG": "1", "WEALTH_LOG_LEVEL": "ERROR"}, logging.ERROR),
+        ]
+        for env, level in cases:
+            with self.subTest(env):
+                self._configure(env)
+                self.assertEqual(root.level, level)
+
+        self._configure({"WEALTH_LOG_LEVELS": "cmb=DEBUG, http=info,broken"})
+        self.assertEqual(logger.get_logger("cmb").getEffectiveLevel(), logging.DEBUG)
+        self.assertEqual(logger.get_logger("http").getEffectiveLevel(), logging.INFO)
+        self.assertEqual(logger.get_logger("spdb").getEffectiveLevel(), logging.WARNING)
+
+    def test_json_format(self) -> None:
+        stream = self._configure({"WEALTH_LOG_FORMAT": "JSON", "WEALTH_LOG_LEVEL": "INFO"})
+        logger.get_logger("cmb").info("fetched %d pages", 3, extra={"fields": {"product": "P1"}})
+        record = json.loads(stream.getvalue())
+        self.assertEqual(
+            {key: record[key] for key in ("level", "logger", "msg", "product")},
+            {"level": "info", "logger": "cmb", "msg": "fetched 3 pages", "product": "P1"},
+        )
+
+    def test_sampling_keeps_warnings(self) -> None:
+        stream = self._configure({"WEALTH_LOG_LEVEL": "DEBUG", "WEALTH_LOG_SAMPLE": "0"})
+        log = logger.get_logger("cmb")
+        log.debug("dropped")
+        log.info("dropped")
+        log.warning("kept")
+        self.assertEqual(stream.getvalue().splitlines(), ["kept"])
+
+    def test_bad_sample_rates_are_clamped_or_ignored_with_a_warning(self) -> None:
+        cases = [("0.25", 0.25, False), ("5", None, True), ("-1", 0.0, True), ("half", None, True), ("nan", None, True)]
+        for value, rate, warned in cases:
+            with self.subTest(value):
+                stream = self._configure({"WEALTH_LOG_SAMPLE": value})
+                handler = next(item for item in logging.getLogger(logger.ROOT_NAME).handlers if getattr(item, "_wealth_handler", False))
+                rates = [item.rate for item in handler.filters if isinstance(item, logger._SampleFilter)]
+                self.assertEqual(rates, [] if rate is None else [rate])
+                self.assertEqual("WEALTH_LOG_SAMPLE" in stream.getvalue(), warned)
+
+
+if __name__ == "__main__":
+    unittest.main()
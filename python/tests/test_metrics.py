@@ -0,0 +1,79 @@
+from __future__ import annotations
+
+import json
+import os
+import tempfile
+import unittest
+from pathlib import Path
+from unittest import mock
+
+from python.wealth_scraper import metrics
+
+
+class MetricsTests(unittest.TestCase):
+    def setUp(self) -> None:
+        metrics.reset()
+
+    def tearDown(self) -> None:
+        metrics.reset()
+
+    def test_percentile_uses_nearest_rank(self) -> None:
+        values = [0.1, 0.2, 0.3, 0.4, 0.5, 0.6, 0.7, 0.8, 0.9, 1.0]
+        self.assertEqual(metrics.percentile(values, 50), 0.5)
+        self.assertEqual(metrics.percentile(values, 95), 1.0)
+        self.assertEqual(metrics.percentile([], 95), 0.0)
+
+    def test_summarize_groups_by_host_and_provider(self) -> None:
+        with metrics.provider_scope("cmb"):
+            provider = metrics.current_provider()
+        metrics.record(metrics.RequestTiming(url="u1", host="a.example", method="GET", provider=provider, total=0.2, attempts=1))
+        metrics.record(
+            metrics.RequestTiming(url="u2", host="a.example", method="GET", provider=provider, total=0.4, attempts=3, error="HTTP 503")
+        )
+
+        summary = metrics.summarize()
+
+        host = summary["hosts"]["a.example"]
+        self.assertEqual(host["requests"], 2)
+        self.assertEqual(host["errors"], 1)
+        self.assertEqual(host["attempts"], 4)
+        self.assertEqual(host["p50"], 0.2)
+        self.assertEqual(host["p95"], 0.4)
+        self.assertIn("cmb", summary["providers"])
+        self.assertIn('wealth_scraper_http_requests_by_host_total{host="a.example"} 2', metrics.render_prometheus(summary))
+
+    def test_run_report_keeps_failures_and_the_slowest_requests(self) -> None:
+        for index in range(10):
+            metrics.record(
+                metrics.RequestTiming(
+                    url=f"u{index}",
+                    host="a.example",
+                    method="GET",
+                    provider="cmb",
+                    product=f"p{index % 2}",
+                    cache_ttl=86400.0 if index < 3 else 0.0,
+                    total=index / 10,
+                    error="HTTP 503" if index == 1 else None,
+                )
+            )
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+
+        for limit, urls in (("2", ["u1", "u8", "u9"]), ("all", [f"u{index}" for index in range(10)])):
+            with self.subTest(limit), mock.patch.dict(os.environ, {"WEALTH_REPORT_REQUESTS": limit}):
+                metrics.write_run_report(Path(tmp.name))
+                report = json.loads((Path(tmp.name) / metrics.RUN_REPORT_NAME).read_text(encoding="utf-8"))
+                self.assertEqual([item["url"] for item in report["requests"]], urls)
+                self.assertEqual(report["requestsOmitted"], 10 - len(urls))
+                self.assertEqual(report["hosts"]["a.example"]["requests"], 10)
+        self.assertEqual(
+            report["products"],
+            {
+                "p0": {"provider": "cmb", "requests": 5, "cached": {"86400": 2}},
+                "p1": {"provider": "cmb", "requests": 5, "cached": {"86400": 1}},
+            },
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,72 @@
+from __future__ import annotations
+
+import unittest
+
+from python.wealth_scraper.models import Product, Returns
+
+
+def _product(**overrides) -> Product:
+    fields = dict(
+        name="稳健理财1号",
+        code="Z7000925000252",
+        issuer="交银理财",
+        banks=["交通银行"],
+        currency="人民币",
+        min_hold_days=90,
+        risk_level="R2",
+        returns=Returns.from_values({"1m": 1.23456, "3m": None, "6m": 2}),
+        url="https://example.com/p",
+    )
+    fields.update(overrides)
+    return Product(**fields)
+
+
+class ProductModelTests(unittest.TestCase):
+    def test_to_dict_orders_keys_and_omits_missing_identifiers(self) -> None:
+        product = _product(
+            fund_code="5811225149",
+            registration_code="",
+            nav_date="2026-03-05",
+            id="w-1",
+            updated_at="2026-03-06T00:00:00+00:00",
+            last_checked_at="2026-03-06T06:00:00+00:00",
+        )
+
+        data = product.to_dict()
+
+        self.assertEqual(
+            list(data),
+            [
+                "name",
+                "code",
+                "registrationCode",
+                "fundCode",
+                "issuer",
+                "banks",
+                "currency",
+                "minHoldDays",
+                "riskLevel",
+                "returns",
+                "url",
+                "type",
+                "navDate",
+                "id",
+                "updatedAt",
+                "lastCheckedAt",
+            ],
+        )
+        self.assertEqual(data["returns"], {"1m": 1.2346, "3m": 0.0, "6m": 2.0})
+        self.assertEqual(Product.from_dict(data), product)
+
+    def test_validate_rejects_malformed_products(self) -> None:
+        _product().validate()
+        with self.assertRaises(ValueError):
+            _product(banks=[""]).validate()
+        with self.assertRaises(ValueError):
+            _product(min_hold_days=-1).validate()
+        with self.assertRaises(ValueError):
+            _product(returns=Returns(float("nan"), 0.0, 0.0)).validate()
+
+
+if __name__ == "__main__":
+    unittest.main()
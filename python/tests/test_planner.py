@@ -0,0 +1,61 @@
+from __future__ import annotations
+
+import json
+import os
+import tempfile
+import unittest
+from pathlib import Path
+from unittest import mock
+
+from python.wealth_scraper import cache, planner
+from python.wealth_scraper.models import Target
+
+_CMB = "https://cfweb.paas.cmbchina.com/p?saaCod=S&funCod="
+
+
+class PlannerTests(unittest.TestCase):
+    def setUp(self) -> None:
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.dir = Path(tmp.name)
+        patcher = mock.patch.dict(os.environ, {"WEALTH_STATE_DIR": tmp.name, "WEALTH_HOST_CONCURRENCY_MAX": "8"})
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        cache.reset()
+        self.addCleanup(cache.reset)
+
+    def test_history_counts_requests_per_product_except_still_cached_ones(self) -> None:
+        request = {"host": "cfweb.paas.cmbchina.com", "provider": "cmb", "product": _CMB + "1"}
+        reports = {
+            "products": {_CMB + "1": {"provider": "cmb", "requests": 4, "cached": {"86400": 2}}},
+            # Older reports list every request instead.
+            "requests": [dict(request, cache_ttl=86400.0), dict(request, cache_ttl=86400.0), request, request],
+        }
+        at = 1773014400.0  # the reports' generatedAt
+        for key, value in reports.items():
+            with self.subTest(key):
+                report = {"generatedAt": "2026-03-09T00:00:00+00:00", "hosts": {"cfweb.paas.cmbchina.com": {"p50": 0.2}}, key: value}
+                (self.dir / "run_report.json").write_text(json.dumps(report), encoding="utf-8")
+
+                self.assertEqual(planner.load_history(self.dir, now=at + 3600).product_requests, {_CMB + "1": 2})
+                self.assertEqual(planner.load_history(self.dir, now=at + 2 * 86400).product_requests, {_CMB + "1": 4})
+                self.assertEqual(planner.load_history(self.dir, now=at + 3600).provider_requests, {"cmb": 2})
+
+    def test_estimate_paces_hosts_by_rps_and_flags_timeouts(self) -> None:
+        history = planner.History({}, {}, {"cfweb.paas.cmbchina.com": 0.2}, {})
+        limits = {"rps": 2.0}
+        targets = [Target(_CMB + str(index), limits=limits) for index in range(100)]
+
+        plan = planner.estimate(targets, history, timeout=60)
+
+        host = plan["hosts"]["cfweb.paas.cmbchina.com"]
+        self.assertEqual((host["requests"], host["signingCalls"]), (300, 300))
+        self.assertAlmostEqual(host["serialSeconds"], 100 * (3 * 0.2 + 3 * 0.025), places=1)
+        # 300 requests at 2 per second outlast 100 products spread over 8 slots.
+        self.assertEqual(host["concurrentSeconds"], 150.0)
+        self.assertTrue(plan["providers"]["cmb"]["exceedsTimeout"])
+        self.assertTrue(plan["exceedsTimeout"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,49 @@
+from __future__ import annotations
+
+import tempfile
+import unittest
+from pathlib import Path
+
+from python.wealth_scraper import metrics, profiling
+
+
+def _busy() -> int:
+    return sum(i * i for i in range(20000))
+
+
+def _outer() -> int:
+    return _busy() + _busy()
+
+
+class ProfilingTests(unittest.TestCase):
+    def tearDown(self) -> None:
+        profiling.stop()
+
+    def test_product_is_noop_when_disabled(self) -> None:
+        with profiling.product("https://example.com/a"):
+            _outer()
+        self.assertEqual(profiling.summarize()["products"], [])
+
+    def test_profiles_products_per_provider_and_writes_collapsed_stacks(self) -> None:
+        with profiling.session(True):
+            with metrics.provider_scope("cmb"), profiling.product("https://example.com/a"):
+                _outer()
+            with self.assertRaises(RuntimeError):
+                with metrics.provider_scope("spdb"), profiling.product("https://example.com/b"):
+                    raise RuntimeError("boom")
+
+        with tempfile.TemporaryDirectory() as tmp:
+            summary = profiling.write_profiles(Path(tmp), top=5)
+            collapsed = (Path(tmp) / "profile" / "cmb.collapsed").read_text(encoding="utf-8")
+            combined = (Path(tmp) / "profile" / "all.collapsed").read_text(encoding="utf-8")
+
+        self.assertEqual(summary["providers"]["cmb"]["products"], 1)
+        self.assertEqual(summary["products"][0]["url"], "https://example.com/a")
+        self.assertEqual(summary["products"][1]["error"], "RuntimeError: boom")
+        self.assertEqual(summary["functions"][0]["provider"], "cmb")
+        self.assertRegex(collapsed, r"_outer \(test_profiling\.py:\d+\);_busy \(test_profiling\.py:\d+\)")
+        self.assertTrue(all(line.startswith(("cmb;", "spdb;")) for line in combined.splitlines()))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,113 @@
+from __future__ import annotations
+
+import asyncio
+import json
+import os
+import socket
+import threading
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest import mock
+
+from python.wealth_scraper import http, proxies, throttle
+
+
+class _StandIn(ThreadingHTTPServer):
+    """A local stand-in for an egress proxy: answers plain-HTTP proxy requests itself."""
+
+    daemon_threads = True
+
+    def __init__(self, status: int = 200) -> None:
+        self.status = status
+        self.seen: list = []
+        super().__init__(("127.0.0.1", 0), _Handler)
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self.server_address[1]}"
+
+
+class _Handler(BaseHTTPRequestHandler):
+    def log_message(self, format, *args):  # noqa: A002 - signature from BaseHTTPRequestHandler
+        pass
+
+    def do_GET(self) -> None:
+        self.server.seen.append(self.path)
+        body = json.dumps({"proxy": self.server.server_address[1], "target": self.path}).encode("utf-8")
+        self.send_response(self.server.status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+def _dead_url() -> str:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return f"http://127.0.0.1:{sock.getsockname()[1]}"
+
+
+class ProxyPoolTests(unittest.TestCase):
+    def setUp(self) -> None:
+        patcher = mock.patch.dict(os.environ, {"WEALTH_HTTP_RETRY_BACKOFF": "0", "WEALTH_THROTTLE": "0"})
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.addCleanup(proxies.reset)
+        self.addCleanup(throttle.reset)
+        self.standins = [_StandIn(), _StandIn()]
+        for server in self.standins:
+            self.addCleanup(server.server_close)
+            self.addCleanup(server.shutdown)
+
+    def _fetch_many(self, count: int, scoped: bool = False) -> list:
+        async def one(index: int) -> int:
+            if scoped:
+                with proxies.affinity_scope():
+                    return [await one_request(index, step) for step in range(3)][0]
+            return await one_request(index, 0)
+
+        async def one_request(index: int, step: int) -> int:
+            result = await http.afetch_json(f"http://bank.example/p/{index}?step={step}")
+            return result["proxy"]
+
+        async def run() -> list:
+            return await asyncio.gather(*(one(index) for index in range(count)))
+
+        return asyncio.run(run())
+
+    def test_requests_spread_over_the_pool_in_absolute_form(self) -> None:
+        proxies.configure([server.url for server in self.standins])
+        used = self._fetch_many(8)
+        self.assertEqual(sorted(len(server.seen) for server in self.standins), [4, 4])
+        self.assertEqual(set(used), {server.server_address[1] for server in self.standins})
+        self.assertTrue(all(path.startswith("http://bank.example/p/") for server in self.standins for path in server.seen))
+        self.assertEqual(sum(item["requests"] for item in proxies.summary().values()), 8)
+
+    def test_failing_proxy_is_ejected_and_retries_move_on(self) -> None:
+        throttled = _StandIn(status=503)
+        self.addCleanup(throttled.server_close)
+        self.addCleanup(throttled.shutdown)
+        dead = _dead_url()
+        proxies.configure([dead, throttled.url, self.standins[0].url], strategy="round-robin")
+        for index in range(6):
+            self.assertEqual(http.fetch_json(f"http://bank.example/p/{index}")["proxy"], self.standins[0].server_address[1])
+        report = proxies.summary()
+        self.assertEqual(report[dead.split("://")[1]]["ejections"], 1)
+        self.assertEqual(report[f"127.0.0.1:{throttled.server_address[1]}"]["ejections"], 1)
+        self.assertEqual(report[f"127.0.0.1:{self.standins[0].server_address[1]}"]["errors"], 0)
+
+    def test_affinity_pins_a_products_calls_to_one_proxy(self) -> None:
+        proxies.configure([server.url for server in self.standins], strategy="round-robin", affinity=["bank.example"])
+        self._fetch_many(4, scoped=True)
+        products: dict = {}
+        for server in self.standins:
+            for path in server.seen:
+                products.setdefault(path.split("?")[0], set()).add(server.server_address[1])
+        self.assertEqual(len(products), 4)
+        self.assertTrue(all(len(ports) == 1 for ports in products.values()))
+        self.assertEqual(len({next(iter(ports)) for ports in products.values()}), 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
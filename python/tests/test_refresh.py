@@ -0,0 +1,100 @@
+from __future__ import annotations
+
+import datetime as dt
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+from python.wealth_scraper import cache, refresh, scraper
+from python.wealth_scraper.models import Product, Returns
+
+
+def _at(day: int, hour: int) -> float:
+    return dt.datetime(2026, 3, day, hour, tzinfo=dt.timezone(dt.timedelta(hours=8))).timestamp()
+
+
+def _fetched(url: str) -> Product:
+    return Product(
+        name="fresh",
+        code="B1",
+        issuer="招银理财",
+        banks=["招商银行"],
+        currency="人民币",
+        min_hold_days=None,
+        risk_level="R2",
+        returns=Returns.from_values({"1m": 1.0}),
+        url=url,
+        nav_date="2026-03-09",
+    )
+
+
+class RefreshScheduleTests(unittest.TestCase):
+    def setUp(self) -> None:
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        patcher = mock.patch.dict(os.environ, {"WEALTH_STATE_DIR": tmp.name})
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        cache.reset()
+        self.addCleanup(cache.reset)
+
+    def test_daily_product_waits_for_next_nav_plus_lag_and_backs_off_when_stale(self) -> None:
+        url = "https://example.com/daily"
+        refresh.record(url, "2026-03-05", now=_at(6, 9))
+        self.assertTrue(refresh.is_due(url, now=_at(6, 15)))
+        refresh.record(url, "2026-03-06", now=_at(9, 9))
+
+        # Thu/Fri NAVs each showed up one business day later, so Monday's NAV is expected on Tuesday.
+        self.assertFalse(refresh.is_due(url, now=_at(9, 20)))
+        self.assertTrue(refresh.is_due(url, now=_at(10, 9)))
+
+        refresh.record(url, "2026-03-06", now=_at(10, 9))
+        self.assertFalse(refresh.is_due(url, now=_at(10, 15)))
+        self.assertTrue(refresh.is_due(url, now=_at(10, 22)))
+
+    def test_scrape_all_carries_forward_products_that_are_not_due(self) -> None:
+        previous = {
+            "https://example.com/a": {
+                "name": "kept",
+                "code": "A1",
+                "issuer": "招银理财",
+                "banks": ["招商银行"],
+                "currency": "人民币",
+                "minHoldDays": 30,
+                "riskLevel": "R2",
+                "returns": {"1m": 2.5, "3m": 0.0, "6m": 1.0},
+                "url": "https://example.com/a",
+                "type": "wealth",
+                "navDate": "2026-03-06",
+                "updatedAt": "2026-03-06T01:00:00+00:00",
+                "lastCheckedAt": "2026-03-07T01:00:00+00:00",
+            }
+        }
+        fetch = mock.Mock(side_effect=_fetched)
+        with mock.patch.dict(scraper._FETCHERS, {"fake": fetch}), mock.patch.object(
+            refresh, "is_due", side_effect=lambda url: url != "https://example.com/a"
+        ):
+            products, failures = scraper.scrape_all(
+                [
+                    {"url": "https://example.com/a", "scraper": "fake", "salesChannels": ["招商银行", "中信银行"]},
+                    {"url": "https://example.com/b", "scraper": "fake"},
+                ],
+                previous=previous,
+            )
+
+        self.assertEqual(failures, [])
+        fetch.assert_called_once_with("https://example.com/b")
+        kept, fresh = products
+        self.assertEqual(kept.name, "kept")
+        self.assertEqual(kept.banks, ["招商银行", "中信银行"])
+        self.assertEqual(kept.updated_at, "2026-03-06T01:00:00+00:00")
+        self.assertEqual(kept.last_checked_at, "2026-03-07T01:00:00+00:00")
+        self.assertNotEqual(fresh.last_checked_at, kept.last_checked_at)
+        self.assertEqual(fresh.updated_at, fresh.last_checked_at)
+        self.assertEqual(kept.to_dict()["returns"], previous["https://example.com/a"]["returns"])
+        self.assertEqual(cache.get_cache("refresh", ttl=3600).get("https://example.com/b")["seen"][0][0], "2026-03-09")
+
+
+if __name__ == "__main__":
+    unittest.main()
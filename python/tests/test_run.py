@@ -0,0 +1,198 @@
+from __future__ import annotations
+
+import asyncio
+import os
+import tempfile
+import threading
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from unittest import mock
+
+from python.wealth_scraper import cache, handler, http, run, runtime, scraper
+from python.wealth_scraper.models import Product, Returns
+
+
+async def _fetch(url: str) -> Product:
+    await asyncio.sleep(0.3 if "fund" in url else 0.2)
+    return Product(
+        name="稳健1号",
+        code=url.rsplit("/", 1)[-1],
+        issuer="招银理财",
+        banks=["招商银行"],
+        currency="人民币",
+        min_hold_days=None,
+        risk_level="R2",
+        returns=Returns.from_values({"1m": 1.0}),
+        url=url,
+    )
+
+
+class _KeepAliveHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):  # noqa: A002 - signature from BaseHTTPRequestHandler
+        pass
+
+    def do_GET(self) -> None:
+        self.send_response(200)
+        self.send_header("Content-Length", "2")
+        self.end_headers()
+        self.wfile.write(b"{}")
+
+
+class RunScrapeTests(unittest.TestCase):
+    def test_catalogs_are_written_and_published_as_each_finishes(self) -> None:
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        root = Path(tmp.name)
+        (root / "wealth.txt").write_text("https://example.com/wealth/A1\n", encoding="utf-8")
+        (root / "fund.txt").write_text("https://example.com/fund/F1\n", encoding="utf-8")
+        events = []
+
+        def publish(name: str, path: Path) -> None:
+            events.append((name, path.exists()))
+
+        env = {"WEALTH_STATE_DIR": str(root / "state"), "WEALTH_REPORT_DIR": str(root / "report")}
+        with mock.patch.dict(os.environ, env), mock.patch.object(scraper, "_detect_scraper", return_value="fake"), \
+                mock.patch.dict(scraper._FETCHERS, {"fake": _fetch}), mock.patch.object(run, "publish_output", side_effect=publish):
+            cache.reset()
+            self.addCleanup(cache.reset)
+            summary = run.run_scrape(
+                wealth_links=root / "wealth.txt",
+                fund_links=root / "fund.txt",
+                wealth_output=root / "out" / "wealth.json",
+                fund_output=root / "out" / "fund.json",
+            )
+
+        self.assertEqual(events, [("wealth", True), ("fund", True)])
+        self.assertEqual((summary["wealth"]["count"], summary["fund"]["count"]), (1, 1))
+        self.assertEqual(set(summary["wealth"]["stages"]), {"scrape", "write", "publish"})
+        # The catalogs overlapped: the run took less than scraping them back to back.
+        self.assertLess(summary["stages"]["total"], summary["wealth"]["stages"]["scrape"] + summary["fund"]["stages"]["scrape"])
+
+    def test_changed_only_scrapes_new_targets_and_drops_removed_ones(self) -> None:
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        root = Path(tmp.name)
+        links = root / "wealth.jsonl"
+        (root / "fund.txt").write_text("", encoding="utf-8")
+        fetched = []
+        published = []
+
+        async def fetch(url: str) -> Product:
+            fetched.append(url)
+            return await _fetch(url)
+
+        def scrape(catalog: str, changed_only: bool) -> dict:
+            links.write_text(catalog, encoding="utf-8")
+            fetched.clear()
+            published.clear()
+            return run.run_scrape(
+                wealth_links=links,
+                fund_links=root / "fund.txt",
+                wealth_output=root / "out" / "wealth.json",
+                fund_output=root / "out" / "fund.json",
+                changed_only=changed_only,
+            )["wealth"]
+
+        env = {"WEALTH_STATE_DIR": str(root / "state"), "WEALTH_REPORT_DIR": str(root / "report"), "WEALTH_REFRESH": "0"}
+        with mock.patch.dict(os.environ, env), mock.patch.dict(scraper._FETCHERS, {"fake": fetch}), \
+                mock.patch.object(run, "publish_output", side_effect=lambda name, path: published.append(name)):
+            cache.reset()
+            self.addCleanup(cache.reset)
+            scrape('{"scraper": "fake"}\n"https://example.com/wealth/A1"\n"https://example.com/wealth/A2"\n', False)
+            summary = scrape(
+                '{"scraper": "fake"}\n"https://example.com/wealth/A1"\n"https://example.com/wealth/A3"\n'
+                '{"url": "https://example.com/wealth/A2", "salesChannels": ["中信银行"]}\n',
+                True,
+            )
+            self.assertEqual(fetched, ["https://example.com/wealth/A3", "https://example.com/wealth/A2"])
+            self.assertEqual(summary["changes"], {"scraped": 2, "kept": 1, "removed": 0})
+            records = run.refresh.load_previous(root / "out" / "wealth.json")
+            self.assertEqual([record["code"] for record in records.values()], ["A1", "A3", "A2"])
+
+            summary = scrape('{"scraper": "fake"}\n"https://example.com/wealth/A3"\n', True)
+            self.assertEqual((fetched, summary["changes"]["removed"], summary["count"]), ([], 2, 1))
+            self.assertEqual(published, ["wealth"])
+
+            # Nothing changed: nothing to scrape, write or publish.
+            summary = scrape('{"scraper": "fake"}\n"https://example.com/wealth/A3"\n', True)
+            self.assertEqual((fetched, published), ([], []))
+            self.assertEqual(set(summary["stages"]), {"scrape"})
+
+    def test_warm_invocations_reuse_the_parsed_catalogs(self) -> None:
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        root = Path(tmp.name)
+        links = root / "wealth.jsonl"
+        links.write_text('{"scraper": "fake"}\n"https://example.com/wealth/A1"\n', encoding="utf-8")
+        (root / "fund.txt").write_text("", encoding="utf-8")
+        runtime.current().reset()
+        self.addCleanup(runtime.current().reset)
+
+        env = {
+            "WEALTH_STATE_DIR": str(root / "state"),
+            "WEALTH_REPORT_DIR": str(root / "report"),
+            "WEALTH_LINKS_PATH": str(links),
+            "FUND_LINKS_PATH": str(root / "fund.txt"),
+            "WEALTH_OUTPUT_PATH": str(root / "out" / "wealth.json"),
+            "FUND_OUTPUT_PATH": str(root / "out" / "fund.json"),
+        }
+        with mock.patch.dict(os.environ, env), mock.patch.dict(scraper._FETCHERS, {"fake": _fetch}), \
+                mock.patch.object(run, "publish_output"), mock.patch.object(run.runtime, "_parse_targets", wraps=run.runtime._parse_targets) as parse:
+            cache.reset()
+            self.addCleanup(cache.reset)
+            cold = handler.lambda_handler({}, None)["runtime"]
+            warm = handler.lambda_handler({}, None)["runtime"]
+            self.assertEqual(parse.call_count, 2)
+            links.write_text('{"scraper": "fake"}\n"https://example.com/wealth/A2"\n"https://example.com/wealth/A3"\n', encoding="utf-8")
+            edited = handler.lambda_handler({}, None)
+
+        self.assertEqual((cold["invocation"], cold["warm"], cold["catalogsLoaded"]), (1, False, 2))
+        self.assertEqual((warm["invocation"], warm["warm"], warm["catalogsReused"], warm["catalogsLoaded"]), (2, True, 2, 0))
+        self.assertGreater(warm["cachesLoaded"], 0)
+        self.assertEqual((edited["runtime"]["catalogsReused"], edited["wealth"]["count"]), (1, 2))
+        self.assertEqual(parse.call_count, 3)
+
+    def test_warm_invocations_reuse_kept_alive_connections(self) -> None:
+        server = ThreadingHTTPServer(("127.0.0.1", 0), _KeepAliveHandler)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        self.addCleanup(server.server_close)
+        self.addCleanup(server.shutdown)
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        root = Path(tmp.name)
+        (root / "wealth.jsonl").write_text('{"scraper": "remote"}\n"https://example.com/wealth/A1"\n', encoding="utf-8")
+        (root / "fund.txt").write_text("", encoding="utf-8")
+        runtime.current().reset()
+        self.addCleanup(runtime.current().reset)
+
+        async def fetch(url: str) -> Product:
+            await http.ahttp_fetch(f"http://127.0.0.1:{server.server_port}/nav")
+            return await _fetch(url)
+
+        env = {
+            "WEALTH_STATE_DIR": str(root / "state"),
+            "WEALTH_REPORT_DIR": str(root / "report"),
+            "WEALTH_LINKS_PATH": str(root / "wealth.jsonl"),
+            "FUND_LINKS_PATH": str(root / "fund.txt"),
+            "WEALTH_OUTPUT_PATH": str(root / "out" / "wealth.json"),
+            "FUND_OUTPUT_PATH": str(root / "out" / "fund.json"),
+            "WEALTH_THROTTLE": "0",
+            "WEALTH_HTTP_KEEPALIVE": "60",
+        }
+        with mock.patch.dict(os.environ, env), mock.patch.dict(scraper._FETCHERS, {"remote": fetch}), \
+                mock.patch.object(run, "publish_output"), mock.patch.object(http, "_PROXIES", {}):
+            cache.reset()
+            self.addCleanup(cache.reset)
+            cold = handler.lambda_handler({}, None)["runtime"]
+            warm = handler.lambda_handler({}, None)["runtime"]
+
+        counts = ("idleConnections", "connectionsOpened", "connectionsReused")
+        self.assertEqual([cold[name] for name in counts], [0, 1, 0])
+        self.assertEqual([warm[name] for name in counts], [1, 0, 1])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,92 @@
+from __future__ import annotations
+
+import asyncio
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+from python.wealth_scraper import cache, scheduler, throttle
+
+
+class SchedulerTests(unittest.TestCase):
+    def setUp(self) -> None:
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        patcher = mock.patch.dict(os.environ, {"WEALTH_STATE_DIR": tmp.name})
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        cache.reset()
+        self.addCleanup(cache.reset)
+
+    def test_plan_orders_longest_first_and_estimates_unknown_products_per_host(self) -> None:
+        scheduler.record_duration("https://a.example/1", 1.0)
+        scheduler.record_duration("https://a.example/2", 5.0)
+        scheduler.record_duration("https://b.example/1", 3.0)
+        jobs = [
+            scheduler.Job(1, "https://a.example/1"),
+            scheduler.Job(2, "https://b.example/new"),
+            scheduler.Job(3, "https://a.example/2"),
+            scheduler.Job(4, "https://b.example/1"),
+        ]
+
+        ordered = scheduler.plan(jobs)
+
+        self.assertEqual([job.index for job in ordered], [3, 2, 4, 1])
+        self.assertEqual(ordered[1].estimate, 3.0)
+
+    def test_run_caps_each_host_and_records_durations(self) -> None:
+        running = {"a.example": 0, "b.example": 0}
+        peak = dict(running)
+        done = []
+
+        async def work(job: scheduler.Job) -> None:
+            running[job.host] += 1
+            peak[job.host] = max(peak[job.host], running[job.host])
+            await asyncio.sleep(0.02)
+            running[job.host] -= 1
+            done.append(job.index)
+
+        jobs = [scheduler.Job(index, f"https://{'a' if index % 3 else 'b'}.example/{index}") for index in range(1, 13)]
+        asyncio.run(scheduler.run(jobs, work, max_workers=6, per_host=2))
+
+        self.assertEqual(sorted(done), list(range(1, 13)))
+        self.assertEqual(peak, {"a.example": 2, "b.example": 2})
+        self.assertEqual(len(cache.get_cache("timings", ttl=60)), 12)
+
+    def test_only_successful_work_is_timed_without_throttle_waits(self) -> None:
+        bucket = throttle.TokenBucket("a.example", rps=5, burst=1)
+
+        async def work(job: scheduler.Job) -> bool:
+            if job.index == 3:
+                return False
+            if job.index == 4:
+                raise RuntimeError("boom")
+            await bucket.acquire()
+            try:
+                await asyncio.sleep(0.02)
+            finally:
+                bucket.release()
+            return True
+
+        jobs = [scheduler.Job(index, f"https://a.example/{index}") for index in range(1, 5)]
+        with self.assertRaises(RuntimeError):
+            asyncio.run(scheduler.run(jobs, work, max_workers=1))
+
+        timings = cache.get_cache("timings", ttl=60)
+        self.assertGreater(bucket.waited, 0.1)
+        self.assertLess(timings.get("https://a.example/2"), 0.1)
+        self.assertIsNone(timings.get("https://a.example/3"))
+        self.assertIsNone(timings.get("https://a.example/4"))
+
+    def test_run_reraises_worker_errors(self) -> None:
+        async def work(job: scheduler.Job) -> None:
+            raise RuntimeError(f"boom {job.index}")
+
+        jobs = [scheduler.Job(1, "https://a.example/1"), scheduler.Job(2, "https://b.example/2")]
+        with self.assertRaises(RuntimeError):
+            asyncio.run(scheduler.run(jobs, work, max_workers=2))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,124 @@
+from __future__ import annotations
+
+import asyncio
+import json
+import os
+import tempfile
+import time
+import unittest
+from pathlib import Path
+from unittest import mock
+
+from python.wealth_scraper import throttle
+from python.wealth_scraper.catalog import load_targets
+
+
+def _acquire(limiter: throttle.HostLimiter) -> float:
+    return asyncio.run(limiter.acquire())
+
+
+class HostLimiterTests(unittest.TestCase):
+    def test_grows_while_stable_and_halves_once_per_burst_of_429s(self) -> None:
+        limiter = throttle.HostLimiter("bank.example", start=2, maximum=4)
+        for _ in range(40):
+            _acquire(limiter)
+            limiter.release(0.05, 200)
+        self.assertEqual(limiter.capacity(), 4)
+
+        for _ in range(3):
+            _acquire(limiter)
+        for _ in range(3):
+            limiter.release(0.05, 429)
+        self.assertEqual(limiter.capacity(), 2)
+        self.assertEqual(limiter.throttled, 3)
+
+        # The throttled level is not probed again right away.
+        for _ in range(40):
+            _acquire(limiter)
+            limiter.release(0.05, 200)
+        self.assertEqual(limiter.capacity(), 3)
+
+    def test_slow_responses_hold_the_limit(self) -> None:
+        limiter = throttle.HostLimiter("bank.example", start=2, maximum=8)
+        _acquire(limiter)
+        limiter.release(0.05, 200)
+        grown = limiter.limit
+        _acquire(limiter)
+        limiter.release(1.0, 200)
+        self.assertEqual(limiter.limit, grown)
+
+    def test_retry_after_pauses_the_host(self) -> None:
+        limiter = throttle.HostLimiter("bank.example", start=2, maximum=8)
+        _acquire(limiter)
+        limiter.release(0.01, 429, retry_after=0.2)
+        started = time.monotonic()
+        _acquire(limiter)
+        self.assertGreaterEqual(time.monotonic() - started, 0.15)
+
+    def test_parse_retry_after(self) -> None:
+        self.assertEqual(throttle.parse_retry_after("3"), 3.0)
+        self.assertEqual(throttle.parse_retry_after("Fri, 06 Mar 2026 00:00:10 GMT", now=1772755200.0), 10.0)
+        self.assertEqual(throttle.parse_retry_after("3600"), 60.0)
+        self.assertIsNone(throttle.parse_retry_after("soon"))
+
+
+class SiteLimitTests(unittest.TestCase):
+    def setUp(self) -> None:
+        throttle.reset()
+        self.addCleanup(throttle.reset)
+
+    def test_bucket_paces_requests_and_caps_concurrency(self) -> None:
+        async def paced() -> float:
+            bucket = throttle.TokenBucket("bank.example", rps=20, burst=2)
+            started = time.monotonic()
+            for _ in range(6):
+                await bucket.acquire()
+                bucket.release()
+            return time.monotonic() - started
+
+        async def capped() -> float:
+            bucket = throttle.TokenBucket("bank.example", max_concurrency=1)
+            await bucket.acquire()
+            asyncio.get_running_loop().call_later(0.1, bucket.release)
+            return await bucket.acquire()
+
+        self.assertGreaterEqual(asyncio.run(paced()), 0.18)
+        self.assertGreaterEqual(asyncio.run(capped()), 0.08)
+
+    def test_site_limits_cover_other_hosts_requested_for_the_site(self) -> None:
+        bucket = throttle.configure_site("www.bank.example", rps=5, max_concurrency=2)
+        self.assertIsNone(throttle.site_bucket("api.bank.cn"))
+        with throttle.site_scope("www.bank.example"):
+            self.assertIs(throttle.site_bucket("api.bank.cn"), bucket)
+        self.assertIsNone(throttle.site_bucket("api.bank.cn"))
+        self.assertEqual(throttle.capacity("www.bank.example", default=8), 2)
+
+    def test_shared_hosts_follow_the_site_asking_without_keeping_its_limits(self) -> None:
+        first = throttle.configure_site("a.bank.example", rps=2)
+        second = throttle.configure_site("b.bank.example", rps=50, max_concurrency=4)
+        with throttle.site_scope("a.bank.example"):
+            self.assertIs(throttle.site_bucket("cdn.shared.example"), first)
+        with throttle.site_scope("b.bank.example"):
+            self.assertIs(throttle.site_bucket("cdn.shared.example"), second)
+        with throttle.site_scope("c.bank.example"):
+            self.assertIsNone(throttle.site_bucket("cdn.shared.example"))
+        self.assertIsNone(throttle.site_bucket("cdn.shared.example"))
+        self.assertNotIn("cdn.shared.example", throttle.summary())
+
+    def test_load_targets_validates_site_limits(self) -> None:
+        def load(site: dict) -> list:
+            with tempfile.TemporaryDirectory() as tmp, mock.patch.dict(os.environ, {"WEALTH_STATE_DIR": tmp}):
+                path = Path(tmp) / "links.json"
+                path.write_text(json.dumps({"sites": [dict(site, products=["https://www.bank.example/p/1"])]}), encoding="utf-8")
+                return load_targets(path)
+
+        target = load({"rps": "2.5", "burst": 5, "maxConcurrency": 3})[0]
+        self.assertEqual(target.limits, {"rps": 2.5, "burst": 5.0, "maxConcurrency": 3})
+        self.assertIsNone(load({})[0].limits)
+        for bad in ({"rps": 0}, {"rps": "fast"}, {"burst": 2}, {"rps": 1, "burst": 0.5}, {"maxConcurrency": 1.5}, {"maxConcurrency": 0}):
+            with self.assertRaises(ValueError, msg=bad):
+                load(bad)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,98 @@
+from __future__ import annotations
+
+import asyncio
+import json
+import tempfile
+import threading
+import unittest
+from pathlib import Path
+
+from python.wealth_scraper import metrics, tracing
+
+
+class TracingTests(unittest.TestCase):
+    def setUp(self) -> None:
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.dir = Path(tmp.name)
+        # start() drops events left by earlier tests.
+        tracing.start()
+        tracing.stop()
+        self.addCleanup(tracing.stop)
+
+    def test_nothing_is_recorded_while_disabled(self) -> None:
+        @tracing.traced("parse")
+        def parse() -> int:
+            return 1
+
+        @tracing.traced("fetch")
+        async def fetch() -> int:
+            return 2
+
+        self.assertIs(tracing.span("fetch", url="x"), tracing._NULL_SPAN)
+        with tracing.span("fetch") as span:
+            span.set(status=200)
+        self.assertEqual((parse(), asyncio.run(fetch())), (1, 2))
+        self.assertEqual(tracing.stop(), [])
+
+    def test_spans_and_traced_functions_record_complete_events(self) -> None:
+        @tracing.traced("parse")
+        def parse(text: str) -> int:
+            return len(text)
+
+        @tracing.traced("fetch")
+        async def fetch() -> str:
+            await asyncio.sleep(0)
+            return "body"
+
+        @tracing.traced("compute")
+        def fail() -> None:
+            raise ValueError("bad nav")
+
+        tracing.start()
+        with metrics.provider_scope("cmb"):
+            with tracing.span("sign", endpoint="/nav") as span:
+                span.set(bytes=10)
+            self.assertEqual(parse("abc"), 3)
+            self.assertEqual(asyncio.run(fetch()), "body")
+            with self.assertRaises(ValueError):
+                fail()
+        events = tracing.stop()
+
+        self.assertEqual([event["name"] for event in events], ["cmb.sign", "cmb.parse", "cmb.fetch", "cmb.compute"])
+        self.assertEqual(events[0]["args"], {"endpoint": "/nav", "bytes": 10})
+        self.assertEqual(events[1]["args"], {"func": "parse"})
+        self.assertEqual(events[3]["args"]["error"], "ValueError: bad nav")
+        self.assertTrue(all(event["ph"] == "X" and event["dur"] >= 0 and event["ts"] >= 0 for event in events))
+
+    def test_session_writes_chrome_trace_with_a_lane_per_task(self) -> None:
+        async def product(name: str) -> None:
+            with tracing.span("fetch", product=name):
+                await asyncio.sleep(0.01)
+
+        async def run() -> None:
+            await asyncio.gather(product("a"), product("b"))
+
+        path = self.dir / "trace" / "run.json"
+        with tracing.session(path):
+            asyncio.run(run())
+            with tracing.span("publish"):
+                pass
+        self.assertFalse(tracing.enabled())
+
+        payload = json.loads(path.read_text(encoding="utf-8"))
+        self.assertEqual(payload["displayTimeUnit"], "ms")
+        events = {event["args"].get("product", event["name"]): event for event in payload["traceEvents"]}
+        self.assertEqual(set(events), {"a", "b", "publish"})
+        # Concurrent products get their own rows; code outside a task uses the thread's.
+        self.assertNotEqual(events["a"]["tid"], events["b"]["tid"])
+        self.assertEqual(events["publish"]["tid"], threading.get_ident())
+
+    def test_session_without_path_does_not_trace(self) -> None:
+        with tracing.session(None):
+            self.assertFalse(tracing.enabled())
+            self.assertIs(tracing.span("fetch"), tracing._NULL_SPAN)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,41 @@
+from __future__ import annotations
+
+import datetime as dt
+import unittest
+
+from python.wealth_scraper.providers.wealthccb import parse_html, parse_stream, scan_page
+
+PAGE = """
+<h4 class="cp-title">稳健<b>理财</b>(ABC123)</h4>
+<p class="firtst">R2 中低风险</p> <p class="second"> 风险等级</p>
+<script>
+if(time == 'week') { xData = []; xData = ['20260201','20260301']; sData = [1.0000,1.0100]; }
+if(time == 'week') { xData = ['20250101']; sData = [9]; }
+if(time=='month') { xData = ['20251201','20260301']; sData = [1.0, 1.02]; }
+if(time == 'byear') { xData = ['20250901','20260301']; sData = [1.0,-2]; }
+</script>
+"""
+
+
+class WealthccbProviderTests(unittest.TestCase):
+    def test_scan_page_keeps_first_block_per_key_and_longest_array(self) -> None:
+        scanner = scan_page(PAGE)
+
+        self.assertEqual(scanner.risk_text, "R2 中低风险")
+        self.assertEqual(
+            scanner.series("week"),
+            [(dt.date(2026, 2, 1), 1.0), (dt.date(2026, 3, 1), 1.01)],
+        )
+        self.assertEqual(scanner.series("quarter"), [])
+
+    def test_parse_stream_matches_parse_html_for_any_chunking(self) -> None:
+        expected = parse_html(PAGE, "https://example.com/p.html")
+        self.assertEqual(expected.code, "ABC123")
+
+        for size in (1, 7, 64):
+            chunks = [PAGE[index : index + size] for index in range(0, len(PAGE), size)]
+            self.assertEqual(parse_stream(chunks, "https://example.com/p.html"), expected)
+
+
+if __name__ == "__main__":
+    unittest.main()
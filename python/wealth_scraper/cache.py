@@ -0,0 +1,204 @@
+"""Small persisted key/value caches with a per-entry TTL.
+
+Each cache is one JSON file under the state directory (``WEALTH_STATE_DIR``,
+default ``<tmp>/wealth_scraper``), loaded on first use and written back by
+``flush()`` at the end of a run. Writes are best-effort: a read-only or missing
+state directory only costs the cache, never the run.
+
+``WEALTH_CACHE=0`` turns every cache off. ``WEALTH_CACHE_REFRESH=1`` (or a comma
+list of cache names) ignores stored entries for this run while still storing
+fresh ones.
+"""
+
+from __future__ import annotations
+
+import atexit
+import os
+import tempfile
+import threading
+import time
+from pathlib import Path
+from typing import Any, Awaitable, Callable, Dict, Iterable, Optional, Sequence
+
+from . import codec, metrics
+from .logger import get_logger
+
+_log = get_logger("cache")
+
+_FORMAT_VERSION = 1
+_STALE_KEEP_SECONDS = 30 * 86400
+
+
+def state_dir() -> Path:
+    return Path(os.environ.get("WEALTH_STATE_DIR") or Path(tempfile.gettempdir()) / "wealth_scraper")
+
+
+def enabled() -> bool:
+    return os.environ.get("WEALTH_CACHE", "1").strip().lower() not in ("0", "false", "no", "off")
+
+
+_REFRESH_OVERRIDE: Optional[set] = None
+
+
+def set_refresh(names: Iterable[str] | bool | None) -> None:
+    """Force a refresh for these caches (True = all, None = back to WEALTH_CACHE_REFRESH)."""
+    global _REFRESH_OVERRIDE
+    if names is None:
+        _REFRESH_OVERRIDE = None
+    elif names is True:
+        _REFRESH_OVERRIDE = {"*"}
+    elif names is False:
+        _REFRESH_OVERRIDE = set()
+    else:
+        _REFRESH_OVERRIDE = {name.strip() for name in names if name.strip()}
+
+
+def refresh_requested(name: str) -> bool:
+    if _REFRESH_OVERRIDE is not None:
+        names = _REFRESH_OVERRIDE
+    else:
+        raw = os.environ.get("WEALTH_CACHE_REFRESH", "").strip().lower()
+        names = {"*"} if raw in ("1", "true", "yes", "all") else {item.strip() for item in raw.split(",") if item.strip()}
+    return "*" in names or name in names
+
+
+class TTLCache:
+    def __init__(self, name: str, ttl: float, directory: Optional[Path] = None) -> None:
+        self.name = name
+        self.ttl = ttl
+        self._directory = directory
+        self._entries: Dict[str, Dict[str, Any]] = {}
+        self._loaded = False
+        self._dirty = False
+        self._lock = threading.Lock()
+
+    @property
+    def path(self) -> Path:
+        return (self._directory or state_dir()) / f"{self.name}.json"
+
+    def _load(self) -> None:
+        if self._loaded:
+            return
+        self._loaded = True
+        if not enabled():
+            return
+        try:
+            payload = codec.loads(self.path.read_bytes())
+        except FileNotFoundError:
+            return
+        except (OSError, codec.JSONDecodeError) as exc:
+            _log.warning("[cache] ignoring unreadable %s: %s", self.path, exc)
+            return
+        if isinstance(payload, dict) and payload.get("version") == _FORMAT_VERSION:
+            self._entries = payload.get("entries") or {}
+
+    def get(self, key: str, *, allow_stale: bool = False) -> Optional[Any]:
+        """Cached value, or None when missing, expired or being refreshed.
+
+        ``allow_stale`` returns whatever is stored regardless of age or refresh,
+        for callers that only need a hint (e.g. which issuer a product belongs to).
+        """
+        with self._lock:
+            self._load()
+            entry = self._entries.get(key)
+        if entry is None:
+            return None
+        if allow_stale:
+            return entry["value"]
+        if refresh_requested(self.name) or time.time() - entry["storedAt"] > self.ttl:
+            return None
+        return entry["value"]
+
+    def set(self, key: str, value: Any) -> None:
+        if not enabled():
+            return
+        with self._lock:
+            self._load()
+            self._entries[key] = {"storedAt": round(time.time(), 3), "value": value}
+            self._dirty = True
+
+    def delete(self, key: str) -> None:
+        with self._lock:
+            self._load()
+            if self._entries.pop(key, None) is not None:
+                self._dirty = True
+
+    def __len__(self) -> int:
+        with self._lock:
+            self._load()
+            return len(self._entries)
+
+    def save(self) -> None:
+        with self._lock:
+            if not self._dirty:
+                return
+            path = self.path
+            # Expired entries still serve as hints (allow_stale), but not forever.
+            cutoff = time.time() - max(self.ttl * 10, _STALE_KEEP_SECONDS)
+            entries = {key: entry for key, entry in self._entries.items() if entry["storedAt"] >= cutoff}
+            try:
+                path.parent.mkdir(parents=True, exist_ok=True)
+                tmp_path = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+                tmp_path.write_bytes(codec.dumps({"version": _FORMAT_VERSION, "entries": entries}))
+                os.replace(tmp_path, path)
+            except OSError as exc:
+                _log.warning("[cache] could not write %s: %s", path, exc)
+                return
+            self._entries = entries
+            self._dirty = False
+
+
+_CACHES: Dict[str, TTLCache] = {}
+_REGISTRY_LOCK = threading.Lock()
+
+
+def get_cache(name: str, ttl: float) -> TTLCache:
+    """The process-wide cache called name (created on first use with this TTL)."""
+    with _REGISTRY_LOCK:
+        cache = _CACHES.get(name)
+        if cache is None:
+            cache = _CACHES[name] = TTLCache(name, ttl)
+        cache.ttl = ttl
+        return cache
+
+
+async def metadata(key: str, load: Callable[[], Awaitable[Optional[Dict]]], fields: Sequence[str]) -> Dict:
+    """Static product metadata (name, issuer, risk, ...) for key, cached for days.
+
+    ``load`` is a coroutine function fetching the full detail record; only ``fields`` are kept. Empty records
+    are not stored, so a product that failed to resolve is retried next run. The TTL
+    is ``WEALTH_METADATA_TTL_DAYS`` (default 7).
+    """
+    days = float(os.environ.get("WEALTH_METADATA_TTL_DAYS") or 7)
+    store = get_cache("metadata", ttl=days * 86400)
+    cached = store.get(key)
+    if cached is not None:
+        return cached
+    with metrics.cached_scope(store.ttl):
+        record = await load() or {}
+    value = {field: record[field] for field in fields if field in record}
+    if value:
+        store.set(key, value)
+    return value
+
+
+def loaded() -> int:
+    """Number of caches this process has opened (kept until reset())."""
+    with _REGISTRY_LOCK:
+        return len(_CACHES)
+
+
+def flush() -> None:
+    with _REGISTRY_LOCK:
+        caches = list(_CACHES.values())
+    for cache in caches:
+        cache.save()
+
+
+def reset() -> None:
+    """Forget all loaded caches without saving (the next get_cache reloads from disk)."""
+    with _REGISTRY_LOCK:
+        _CACHES.clear()
+
+
+atexit.register(flush)
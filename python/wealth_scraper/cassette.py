@@ -0,0 +1,187 @@
+"""Record/replay of HTTP traffic so scrapes can run offline and deterministically.
+
+Recording stores one cassette file per host under the cassette directory. Request
+signatures and other per-call headers (timestamps, trace ids) are dropped from the
+match key and redacted on disk, so a replay matches on method, URL and body only.
+Repeated identical requests are served back in recorded order; once a sequence is
+exhausted its last response is repeated.
+
+Enable with ``WEALTH_CASSETTE_MODE=record|replay`` and ``WEALTH_CASSETTE_DIR``, or the
+``--record-cassettes``/``--replay-cassettes`` CLI flags. ``WEALTH_CASSETTE_LATENCY``
+injects latency on replay: a number of seconds, or ``recorded`` to reuse the
+recorded request durations.
+"""
+
+from __future__ import annotations
+
+import atexit
+import hashlib
+import json
+import os
+import re
+import threading
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, List, Optional
+from urllib.parse import urlsplit
+
+RECORD = "record"
+REPLAY = "replay"
+
+_VOLATILE_HEADERS = {"signature", "timespan", "x-b3-businessid", "user-agent"}
+
+
+def _normalize_body(data: Optional[bytes]) -> str:
+    if not data:
+        return ""
+    text = data.decode("utf-8", errors="replace")
+    try:
+        return json.dumps(json.loads(text), ensure_ascii=False, sort_keys=True, separators=(",", ":"))
+    except ValueError:
+        return text
+
+
+def request_key(method: str, url: str, data: Optional[bytes]) -> str:
+    raw = f"{method.upper()} {url}\n{_normalize_body(data)}"
+    return hashlib.sha1(raw.encode("utf-8")).hexdigest()
+
+
+def _cassette_name(host: str) -> str:
+    return re.sub(r"[^A-Za-z0-9.-]+", "_", host or "unknown") + ".json"
+
+
+@dataclass
+class Interaction:
+    method: str
+    url: str
+    body: str
+    headers: Dict[str, str]
+    status: int
+    text: str
+    elapsed: float
+    error: Optional[str] = None
+
+
+@dataclass
+class Cassette:
+    directory: Path
+    mode: str
+    latency: Optional[str] = None
+    _tapes: Dict[str, List[Interaction]] = field(default_factory=dict)
+    _cursor: Dict[str, int] = field(default_factory=dict)
+    _dirty: bool = False
+    _lock: threading.Lock = field(default_factory=threading.Lock)
+
+    def load(self) -> None:
+        for path in sorted(self.directory.glob("*.json")):
+            payload = json.loads(path.read_text(encoding="utf-8"))
+            for item in payload.get("interactions") or []:
+                key = item.pop("key")
+                self._tapes.setdefault(key, []).append(Interaction(**item))
+
+    def lookup(self, method: str, url: str, data: Optional[bytes]) -> Interaction:
+        """The next recorded response for the request, without the injected latency."""
+        key = request_key(method, url, data)
+        with self._lock:
+            tape = self._tapes.get(key)
+            if not tape:
+                raise RuntimeError(f"cassette miss for {method} {url} in {self.directory}")
+            index = self._cursor.get(key, 0)
+            self._cursor[key] = index + 1
+            return tape[min(index, len(tape) - 1)]
+
+    def delay(self, interaction: Interaction) -> float:
+        """Seconds of latency to inject before serving interaction on replay."""
+        if not self.latency:
+            return 0.0
+        if self.latency == "recorded":
+            return interaction.elapsed
+        return float(self.latency)
+
+    def record(
+        self,
+        method: str,
+        url: str,
+        data: Optional[bytes],
+        headers: Optional[Dict[str, str]],
+        *,
+        status: int,
+        text: str,
+        elapsed: float,
+        error: Optional[str] = None,
+    ) -> None:
+        redacted = {
+            name: ("<redacted>" if name.lower() in _VOLATILE_HEADERS else value)
+            for name, value in (headers or {}).items()
+        }
+        interaction = Interaction(
+            method=method.upper(),
+            url=url,
+            body=_normalize_body(data),
+            headers=redacted,
+            status=status,
+            text=text,
+            elapsed=round(elapsed, 4),
+            error=error,
+        )
+        with self._lock:
+            self._tapes.setdefault(request_key(method, url, data), []).append(interaction)
+            self._dirty = True
+
+    def save(self) -> None:
+        with self._lock:
+            if not self._dirty:
+                return
+            by_host: Dict[str, List[Dict]] = {}
+            for key, tape in self._tapes.items():
+                for interaction in tape:
+                    item = {"key": key, **interaction.__dict__}
+                    by_host.setdefault(urlsplit(interaction.url).hostname or "", []).append(item)
+            self.directory.mkdir(parents=True, exist_ok=True)
+            for host, items in by_host.items():
+                (self.directory / _cassette_name(host)).write_text(
+                    json.dumps({"host": host, "interactions": items}, ensure_ascii=False, indent=2),
+                    encoding="utf-8",
+                )
+            self._dirty = False
+
+
+_ACTIVE: Optional[Cassette] = None
+_FROM_ENV = False
+
+
+def configure(mode: Optional[str], directory: Path | str | None, latency: Optional[str] = None) -> Optional[Cassette]:
+    """Activate record/replay (or turn it off with mode=None)."""
+    global _ACTIVE, _FROM_ENV
+    _FROM_ENV = True
+    if _ACTIVE is not None and _ACTIVE.mode == RECORD:
+        _ACTIVE.save()
+    if not mode:
+        _ACTIVE = None
+        return None
+    mode = mode.lower()
+    if mode not in (RECORD, REPLAY):
+        raise ValueError(f"cassette mode must be {RECORD!r} or {REPLAY!r}, got {mode!r}")
+    if not directory:
+        raise ValueError("cassette directory is required")
+    cassette = Cassette(Path(directory), mode, latency or os.environ.get("WEALTH_CASSETTE_LATENCY"))
+    if mode == REPLAY:
+        if not cassette.directory.exists():
+            raise FileNotFoundError(cassette.directory)
+        cassette.load()
+    _ACTIVE = cassette
+    return cassette
+
+
+def active() -> Optional[Cassette]:
+    if not _FROM_ENV:
+        configure(os.environ.get("WEALTH_CASSETTE_MODE"), os.environ.get("WEALTH_CASSETTE_DIR"))
+    return _ACTIVE
+
+
+def flush() -> None:
+    if _ACTIVE is not None and _ACTIVE.mode == RECORD:
+        _ACTIVE.save()
+
+
+atexit.register(flush)
@@ -0,0 +1,330 @@
+"""Product catalogs (``*_links.json``/``.jsonl``/``.txt``) read into ``Target`` records.
+
+Formats:
+
+- ``.json``: ``{"sites": [{...site defaults, "products": [...]}]}``,
+  ``{"products": [...]}`` or a plain list.
+- ``.jsonl``: one JSON value per line, read as a stream. A string, or an object
+  with ``url``, is a product. An object without ``url`` is a site: its
+  ``scraper``/``retries``/``salesChannels``/``rps``/``burst``/``maxConcurrency``
+  apply to its own ``products`` (if any) and to the product lines after it, up to
+  the next site. Blank lines and lines starting with ``#`` are skipped.
+- anything else: one url per line.
+
+Every entry is normalized and validated once, into a slotted ``Target``. A parsed
+JSON/JSONL catalog is also compiled to ``<state dir>/catalogs/`` together with the
+file's size, mtime and SHA-256; later loads of the unchanged file (same mtime, or
+same content after a touch or checkout) read the compiled rows instead of parsing
+and validating again. ``WEALTH_CACHE=0`` turns this off and
+``WEALTH_CACHE_REFRESH=catalog`` (or ``--refresh-cache``) recompiles.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import math
+import os
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from . import cache, codec
+from .logger import get_logger
+from .models import Target
+
+_log = get_logger("catalog")
+
+_COMPILED_VERSION = 1
+_HASH_CHUNK = 1 << 20
+
+
+def _normalize_channels(value: Any, context: str) -> Optional[List[str]]:
+    if value is None:
+        return None
+    if isinstance(value, str):
+        channel = value.strip()
+        return [channel] if channel else None
+    if not isinstance(value, list):
+        raise ValueError(f"{context}: salesChannels/banks must be string or list")
+
+    channels: List[str] = []
+    for idx, item in enumerate(value, start=1):
+        channel = str(item).strip()
+        if not channel:
+            raise ValueError(f"{context}: empty channel at index {idx}")
+        if channel not in channels:
+            channels.append(channel)
+    return channels or None
+
+
+def _normalize_retries(value: Any, context: str) -> Optional[int]:
+    if value is None or value == "":
+        return None
+    retries = int(value)
+    if retries < 0:
+        raise ValueError(f"{context}: retries must be >= 0")
+    return retries
+
+
+def _normalize_limits(site: Dict[str, Any], context: str) -> Optional[Dict[str, Any]]:
+    """A site's rps/burst/maxConcurrency, or None when it declares none."""
+    limits: Dict[str, Any] = {}
+    for key in ("rps", "burst"):
+        value = site.get(key)
+        if value is None or value == "":
+            continue
+        if isinstance(value, bool):
+            raise ValueError(f"{context}: {key} must be a number")
+        try:
+            number = float(value)
+        except (TypeError, ValueError):
+            raise ValueError(f"{context}: {key} must be a number") from None
+        if not math.isfinite(number) or number <= 0:
+            raise ValueError(f"{context}: {key} must be > 0")
+        limits[key] = number
+    if "burst" in limits:
+        if "rps" not in limits:
+            raise ValueError(f"{context}: burst requires rps")
+        if limits["burst"] < 1:
+            raise ValueError(f"{context}: burst must be >= 1")
+
+    value = site.get("maxConcurrency")
+    if value is not None and value != "":
+        if isinstance(value, bool) or not str(value).strip().isdigit():
+            raise ValueError(f"{context}: maxConcurrency must be a positive integer")
+        if int(value) < 1:
+            raise ValueError(f"{context}: maxConcurrency must be >= 1")
+        limits["maxConcurrency"] = int(value)
+    return limits or None
+
+
+def _site_defaults(site: Dict[str, Any], context: str) -> Dict[str, Any]:
+    scraper = site.get("scraper")
+    channels = _normalize_channels(site.get("salesChannels"), context)
+    if channels is None:
+        channels = _normalize_channels(site.get("banks"), context)
+    return {
+        "default_scraper": str(scraper).strip().lower() if scraper else None,
+        "default_retries": _normalize_retries(site.get("retries"), context),
+        "default_channels": channels,
+        "default_limits": _normalize_limits(site, context),
+    }
+
+
+def normalize_target(
+    raw: Any,
+    *,
+    context: str,
+    default_scraper: str | None = None,
+    default_retries: int | None = None,
+    default_channels: List[str] | None = None,
+    default_limits: Dict[str, Any] | None = None,
+) -> Target:
+    """A Target for a catalog entry (a url string or product object); Targets pass through as-is."""
+    if isinstance(raw, Target):
+        return raw
+    if isinstance(raw, str):
+        url = raw.strip()
+        if not url:
+            raise ValueError(f"{context}: empty url")
+        return Target(url, default_scraper, default_retries, default_channels, default_limits)
+    if not isinstance(raw, dict):
+        raise ValueError(f"{context}: item must be string or object")
+
+    url = str(raw.get("url") or "").strip()
+    if not url:
+        raise ValueError(f"{context}: missing url")
+
+    scraper = raw.get("scraper")
+    if scraper is None:
+        scraper = default_scraper
+    else:
+        scraper = str(scraper).strip().lower() or None
+
+    retries = _normalize_retries(raw.get("retries"), context)
+    if retries is None:
+        retries = default_retries
+
+    channels = _normalize_channels(raw.get("salesChannels"), context)
+    if channels is None:
+        channels = _normalize_channels(raw.get("banks"), context)
+    if channels is None:
+        channels = default_channels
+
+    return Target(url, scraper, retries, channels, default_limits)
+
+
+def _site_targets(site: Dict[str, Any], context: str, defaults: Dict[str, Any]) -> List[Target]:
+    products = site.get("products") or []
+    if not isinstance(products, list):
+        raise ValueError(f"{context}: products must be an array")
+    return [
+        normalize_target(product, context=f"{context}:products[{idx}]", **defaults)
+        for idx, product in enumerate(products, start=1)
+    ]
+
+
+def _parse_json(path: Path, digest: Any) -> List[Target]:
+    data = path.read_bytes()
+    digest.update(data)
+    try:
+        raw = codec.loads(data)
+    except codec.JSONDecodeError as exc:
+        raise ValueError(f"Invalid JSON in {path}: {exc}") from exc
+
+    if isinstance(raw, list):
+        return [normalize_target(item, context=f"{path}:items[{idx}]") for idx, item in enumerate(raw, start=1)]
+
+    if not isinstance(raw, dict):
+        raise ValueError(f"{path}: root must be object or list")
+
+    if "sites" in raw:
+        sites = raw.get("sites") or []
+        if not isinstance(sites, list):
+            raise ValueError(f"{path}: sites must be an array")
+        targets: List[Target] = []
+        for site_idx, site in enumerate(sites, start=1):
+            context = f"{path}:sites[{site_idx}]"
+            if not isinstance(site, dict):
+                raise ValueError(f"{context}: site must be object")
+            targets.extend(_site_targets(site, context, _site_defaults(site, context)))
+        return targets
+
+    products = raw.get("products")
+    if isinstance(products, list):
+        return [normalize_target(item, context=f"{path}:products[{idx}]") for idx, item in enumerate(products, start=1)]
+
+    raise ValueError(f"{path}: expected sites[] or products[]")
+
+
+def _parse_jsonl(path: Path, digest: Any) -> List[Target]:
+    targets: List[Target] = []
+    defaults: Dict[str, Any] = {}
+    with path.open("rb") as handle:
+        for lineno, line in enumerate(handle, start=1):
+            digest.update(line)
+            line = line.strip()
+            if not line or line.startswith(b"#"):
+                continue
+            context = f"{path}:{lineno}"
+            try:
+                raw = codec.loads(line)
+            except codec.JSONDecodeError as exc:
+                raise ValueError(f"Invalid JSON in {context}: {exc}") from exc
+            if isinstance(raw, dict) and "url" not in raw:
+                defaults = _site_defaults(raw, context)
+                targets.extend(_site_targets(raw, context, defaults))
+                continue
+            targets.append(normalize_target(raw, context=context, **defaults))
+    return targets
+
+
+def _file_sha256(path: Path) -> str:
+    digest = hashlib.sha256()
+    with path.open("rb") as handle:
+        for chunk in iter(lambda: handle.read(_HASH_CHUNK), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _compact(targets: List[Target]) -> List[List[Any]]:
+    """Consecutive targets sharing scraper/retries/channels/limits as [scraper, retries, channels, limits, urls]."""
+    runs: List[List[Any]] = []
+    for target in targets:
+        shared = [target.scraper, target.retries, target.sales_channels, target.limits]
+        if runs and runs[-1][:4] == shared:
+            runs[-1][4].append(target.url)
+        else:
+            runs.append(shared + [[target.url]])
+    return runs
+
+
+def _expand(runs: List[List[Any]]) -> List[Target]:
+    targets: List[Target] = []
+    for scraper, retries, channels, limits, urls in runs:
+        # Targets of one run share their channels list and limits, as they do after parsing.
+        targets.extend([Target(url, scraper, retries, channels, limits) for url in urls])
+    return targets
+
+
+def _compiled_path(path: Path) -> Path:
+    key = hashlib.sha1(str(path.resolve()).encode("utf-8")).hexdigest()[:16]
+    return cache.state_dir() / "catalogs" / f"{path.name}.{key}.json"
+
+
+def _write_compiled(compiled: Path, payload: Dict[str, Any]) -> None:
+    try:
+        compiled.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = compiled.with_name(f".{compiled.name}.{os.getpid()}.tmp")
+        tmp_path.write_bytes(codec.dumps(payload))
+        os.replace(tmp_path, compiled)
+    except OSError as exc:
+        _log.warning("[catalog] could not write %s: %s", compiled, exc)
+
+
+def _load_compiled(path: Path, compiled: Path, stat: os.stat_result) -> Optional[List[Target]]:
+    if not cache.enabled() or cache.refresh_requested("catalog"):
+        return None
+    try:
+        payload = codec.loads(compiled.read_bytes())
+    except FileNotFoundError:
+        return None
+    except (OSError, codec.JSONDecodeError) as exc:
+        _log.warning("[catalog] ignoring unreadable %s: %s", compiled, exc)
+        return None
+    if not isinstance(payload, dict) or payload.get("version") != _COMPILED_VERSION or payload.get("size") != stat.st_size:
+        return None
+    if payload.get("mtimeNs") != stat.st_mtime_ns:
+        if payload.get("sha256") != _file_sha256(path):
+            return None
+        # Same content under a new mtime: remember it so the next load skips the hash.
+        payload["mtimeNs"] = stat.st_mtime_ns
+        _write_compiled(compiled, payload)
+    try:
+        return _expand(payload["runs"])
+    except (KeyError, TypeError, ValueError) as exc:
+        _log.warning("[catalog] ignoring malformed %s: %s", compiled, exc)
+        return None
+
+
+def load_targets(path: Path) -> List[Target]:
+    if not path.exists():
+        raise FileNotFoundError(path)
+    suffix = path.suffix.lower()
+    if suffix not in (".json", ".jsonl"):
+        return [normalize_target(url, context=f"{path}") for url in load_links(path)]
+
+    stat = path.stat()
+    compiled = _compiled_path(path)
+    targets = _load_compiled(path, compiled, stat)
+    if targets is not None:
+        return targets
+
+    digest = hashlib.sha256()
+    targets = _parse_jsonl(path, digest) if suffix == ".jsonl" else _parse_json(path, digest)
+    if cache.enabled():
+        _write_compiled(
+            compiled,
+            {
+                "version": _COMPILED_VERSION,
+                "size": stat.st_size,
+                "mtimeNs": stat.st_mtime_ns,
+                "sha256": digest.hexdigest(),
+                "runs": _compact(targets),
+            },
+        )
+    return targets
+
+
+def load_links(path: Path) -> List[str]:
+    if not path.exists():
+        raise FileNotFoundError(path)
+    if path.suffix.lower() in (".json", ".jsonl"):
+        return [target.url for target in load_targets(path)]
+
+    urls: List[str] = []
+    for line in path.read_text(encoding="utf-8").splitlines():
+        line = line.strip()
+        if not line or line.startswith("#"):
+            continue
+        urls.append(line)
+    return urls
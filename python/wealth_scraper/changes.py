@@ -0,0 +1,112 @@
+"""Catalog diffs for ``--changed-only`` runs.
+
+Every run that writes an output also records which catalog entries it holds
+(url -> scraper and sales channels) under ``<state dir>/snapshots/``. A
+changed-only run compares the current catalog with that snapshot, scrapes only
+the targets that are new or whose scraper or channels changed, and merges them
+into the previous output: records of urls no longer in the catalog are dropped
+and everything else is kept as published. Without a snapshot the run scrapes
+everything; so does a missing previous output, as none of its records are left.
+
+Targets that fail to scrape are left out of the output and the snapshot, so the
+next changed-only run tries them again.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import os
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from . import cache, codec
+from .logger import get_logger
+from .models import Product, Target
+from .scraper import build_product_id
+
+_log = get_logger("changes")
+
+_SNAPSHOT_VERSION = 1
+
+
+@dataclass
+class Selection:
+    """What a changed-only run scrapes (changed) and keeps from the previous output (kept)."""
+
+    changed: List[Target] = field(default_factory=list)
+    kept: Dict[str, Dict] = field(default_factory=dict)
+    removed: int = 0
+
+
+def _fingerprint(target: Target) -> List[Any]:
+    return [target.scraper, target.sales_channels]
+
+
+def _snapshot_path(output: Path) -> Path:
+    key = hashlib.sha1(str(output.resolve()).encode("utf-8")).hexdigest()[:16]
+    return cache.state_dir() / "snapshots" / f"{output.name}.{key}.json"
+
+
+def load_snapshot(output: Path) -> Optional[Dict[str, List[Any]]]:
+    """url -> fingerprint of the catalog behind output, or None when unknown."""
+    path = _snapshot_path(output)
+    try:
+        payload = codec.loads(path.read_bytes())
+    except FileNotFoundError:
+        return None
+    except (OSError, codec.JSONDecodeError) as exc:
+        _log.warning("[changes] ignoring unreadable %s: %s", path, exc)
+        return None
+    if not isinstance(payload, dict) or payload.get("version") != _SNAPSHOT_VERSION:
+        return None
+    targets = payload.get("targets")
+    return targets if isinstance(targets, dict) else None
+
+
+def save_snapshot(output: Path, targets: List[Target], published: List[Dict]) -> None:
+    """Record the targets of catalog that made it into output (best-effort)."""
+    urls = {record.get("url") for record in published}
+    payload = {
+        "version": _SNAPSHOT_VERSION,
+        "targets": {target.url: _fingerprint(target) for target in targets if target.url in urls},
+    }
+    path = _snapshot_path(output)
+    try:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+        tmp_path.write_bytes(codec.dumps(payload))
+        os.replace(tmp_path, path)
+    except OSError as exc:
+        _log.warning("[changes] could not write %s: %s", path, exc)
+
+
+def select(targets: List[Target], previous: Dict[str, Dict], snapshot: Optional[Dict[str, List[Any]]]) -> Optional[Selection]:
+    """Split targets into changed and kept ones, or None when a full run is needed."""
+    if snapshot is None:
+        return None
+    selection = Selection()
+    for target in targets:
+        record = previous.get(target.url)
+        if record is not None and snapshot.get(target.url) == _fingerprint(target):
+            selection.kept[target.url] = record
+        else:
+            selection.changed.append(target)
+    current = {target.url for target in targets}
+    selection.removed = sum(1 for url in previous if url not in current)
+    return selection
+
+
+def merge(targets: List[Target], selection: Selection, products: List[Product]) -> List[Dict]:
+    """Output records in catalog order: fresh products for changed targets, kept records otherwise."""
+    fresh = {product.url: product for product in products}
+    records: List[Dict] = []
+    for index, target in enumerate(targets, start=1):
+        product = fresh.get(target.url)
+        if product is not None:
+            # ids fall back to the catalog position, which the subset scrape did not know.
+            product.id = build_product_id(product, index)
+            records.append(product.to_dict())
+        elif target.url in selection.kept:
+            records.append(selection.kept[target.url])
+    return records
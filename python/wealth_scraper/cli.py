@@ -1,44 +1,83 @@
 from __future__ import annotations
 
 import argparse
+import os
+import sys
 from pathlib import Path
 
+from . import cache, cassette, events
 from .config import (
     DEFAULT_FUND_LINKS,
     DEFAULT_FUND_OUTPUT,
     DEFAULT_WEALTH_LINKS,
     DEFAULT_WEALTH_OUTPUT,
 )
-from .scraper import load_links, load_targets, scrape_all, write_json
+from .planner import DEFAULT_TIMEOUT, plan_run
+from .run import run_scrape, to_json
 
 
-def _scrape_one(label: str, links_path: Path, output_path: Path) -> None:
-    items = load_targets(links_path) if links_path.suffix.lower() == ".json" else load_links(links_path)
-    if not items:
-        print(f"[{label}] no urls in {links_path}, skip")
-        return
-    products, failures = scrape_all(items)
-    write_json(output_path, products)
-    total = len(items)
-    success = len(products)
-    failed = len(failures)
-    print(f"[{label}] wrote {success} products to {output_path}")
-    print(f"[{label}] summary: {success}/{total} succeeded, {failed} failed")
-    if failures:
-        for url, reason in failures:
-            print(f"- FAIL {url} :: {reason}")
-
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description="Scrape wealth/fund products and write JSON outputs.")
+    parser.add_argument("--wealth-links", type=Path, default=DEFAULT_WEALTH_LINKS, help="Path to wealth_links.json (or .jsonl)")
+    parser.add_argument("--fund-links", type=Path, default=DEFAULT_FUND_LINKS, help="Path to fund_links.txt")
+    parser.add_argument("--wealth-output", type=Path, default=DEFAULT_WEALTH_OUTPUT, help="Output JSON path for wealth products")
+    parser.add_argument("--fund-output", type=Path, default=DEFAULT_FUND_OUTPUT, help="Output JSON path for fund products")
+    cassettes = parser.add_mutually_exclusive_group()
+    cassettes.add_argument("--record-cassettes", type=Path, metavar="DIR", help="Record all HTTP traffic into DIR")
+    cassettes.add_argument("--replay-cassettes", type=Path, metavar="DIR", help="Serve HTTP traffic from cassettes in DIR")
+    parser.add_argument("--profile", action="store_true", help="Profile CPU/memory per provider and product into the report dir")
+    parser.add_argument("--refresh-cache", action="store_true", help="Ignore cached product metadata and indexes for this run")
+    parser.add_argument("--events", metavar="DEST", help="Stream JSONL progress events to DEST (-, a file or unix:/path)")
+    parser.add_argument(
+        "--changed-only",
+        action="store_true",
+        help="Scrape only targets added or changed since the last output and merge them into it",
+    )
+    return parser
 
-def main() -> int:
-    parser = argparse.ArgumentParser(description="Scrape wealth/fund product data.")
 
+def build_plan_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(
+        prog=f"{Path(sys.argv[0]).name} plan",
+        description="Predict the HTTP calls and wall time of a run from the catalogs and the last run report.",
+    )
     parser.add_argument("--wealth-links", type=Path, default=DEFAULT_WEALTH_LINKS, help="Path to wealth_links.json")
-    parser.add_argument("--wealth-output", type=Path, default=DEFAULT_WEALTH_OUTPUT, help="Output JSON path for wealth products")
     parser.add_argument("--fund-links", type=Path, default=DEFAULT_FUND_LINKS, help="Path to fund_links.txt")
-    parser.add_argument("--fund-output", type=Path, default=DEFAULT_FUND_OUTPUT, help="Output JSON path for fund products")
+    parser.add_argument(
+        "--report-dir",
+        type=Path,
+        default=Path(os.environ.get("WEALTH_REPORT_DIR") or DEFAULT_WEALTH_OUTPUT.parent),
+        help="Directory holding the last run_report.json",
+    )
+    parser.add_argument("--timeout", type=float, default=DEFAULT_TIMEOUT, help="Function timeout in seconds to check against")
+    return parser
 
-    args = parser.parse_args()
 
-    _scrape_one("wealth", args.wealth_links, args.wealth_output)
-    _scrape_one("fund", args.fund_links, args.fund_output)
+def main(argv: list[str] | None = None) -> int:
+    """Entry point of ``python -m wealth_scraper`` and ``scripts/wealth_scraper.py``."""
+    argv = sys.argv[1:] if argv is None else argv
+    if argv[:1] == ["plan"]:
+        args = build_plan_parser().parse_args(argv[1:])
+        print(to_json(plan_run([args.wealth_links, args.fund_links], args.report_dir, timeout=args.timeout)))
+        return 0
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    if args.record_cassettes:
+        cassette.configure(cassette.RECORD, args.record_cassettes)
+    elif args.replay_cassettes:
+        cassette.configure(cassette.REPLAY, args.replay_cassettes)
+    if args.refresh_cache:
+        cache.set_refresh(True)
+    if args.events:
+        events.configure(args.events)
+    summary = run_scrape(
+        wealth_links=args.wealth_links,
+        fund_links=args.fund_links,
+        wealth_output=args.wealth_output,
+        fund_output=args.fund_output,
+        profile=args.profile or None,
+        changed_only=args.changed_only,
+    )
+    # With events on stdout, stdout stays pure JSONL and the summary goes to stderr.
+    print(to_json(summary), file=sys.stderr if events.destination() == "-" else sys.stdout)
     return 0
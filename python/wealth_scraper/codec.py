@@ -0,0 +1,153 @@
+"""JSON encoding/decoding with an optional fast backend.
+
+``orjson`` is used when installed, then ``msgspec``, otherwise the stdlib ``json``
+module; ``WEALTH_JSON_BACKEND=orjson|msgspec|json`` forces a choice. Decoding works
+straight from response bytes. Encoding always produces the same bytes as
+``json.dumps(obj, ensure_ascii=False, ...)`` with compact separators, or with
+``indent=2`` for pretty output. ``separators="stdlib"`` keeps the default
+``", "``/``": "`` of ``json.dumps`` for request bodies that were always sent that
+way (bank endpoints are not assumed to accept other bytes). Values a fast backend would format differently (floats
+printed in exponent form, non-finite floats, non-string keys, big ints, other types)
+go through the stdlib instead.
+"""
+
+from __future__ import annotations
+
+import json
+import math
+import os
+from typing import Any, Callable, Optional, Tuple
+
+JSON = "json"
+ORJSON = "orjson"
+MSGSPEC = "msgspec"
+
+
+class JSONDecodeError(ValueError):
+    """Raised for undecodable JSON whatever the backend."""
+
+
+def _stdlib_loads(data: bytes | str) -> Any:
+    return json.loads(data)
+
+
+def _stdlib_dumps(obj: Any, indent: bool) -> bytes:
+    if indent:
+        return json.dumps(obj, ensure_ascii=False, indent=2).encode("utf-8")
+    return json.dumps(obj, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+def _load_backend(name: str) -> Optional[Tuple[Callable[[bytes | str], Any], Callable[[Any, bool], bytes], Tuple[type, ...]]]:
+    if name == ORJSON:
+        try:
+            import orjson  # type: ignore
+        except ImportError:
+            return None
+
+        def orjson_dumps(obj: Any, indent: bool) -> bytes:
+            return orjson.dumps(obj, option=orjson.OPT_INDENT_2 if indent else 0)
+
+        return orjson.loads, orjson_dumps, (orjson.JSONDecodeError,)
+    if name == MSGSPEC:
+        try:
+            import msgspec  # type: ignore
+        except ImportError:
+            return None
+
+        def msgspec_dumps(obj: Any, indent: bool) -> bytes:
+            encoded = msgspec.json.encode(obj)
+            return msgspec.json.format(encoded, indent=2) if indent else encoded
+
+        return msgspec.json.decode, msgspec_dumps, (msgspec.DecodeError,)
+    return None
+
+
+# Cheap check that a backend really matches the stdlib byte for byte before trusting it.
+_PROBE = {
+    "name": "稳健理财 \"1号\"\\/\t\u007f",
+    "returns": {"1m": 2.3456, "3m": -0.0001, "6m": None},
+    "values": [0, -1, 1.0, 0.1, 123456789012345.67, True, False, [], {}],
+}
+
+
+def _select(preferred: str | None) -> Tuple[str, Callable[[bytes | str], Any], Callable[[Any, bool], bytes] | None, Tuple[type, ...]]:
+    names = [preferred] if preferred else [ORJSON, MSGSPEC]
+    for name in names:
+        backend = _load_backend(name)
+        if backend is None:
+            continue
+        loads, dumps, errors = backend
+        try:
+            consistent = all(dumps(_PROBE, indent) == _stdlib_dumps(_PROBE, indent) for indent in (False, True))
+        except Exception:
+            consistent = False
+        return name, loads, dumps if consistent else None, errors
+    return JSON, _stdlib_loads, None, ()
+
+
+BACKEND = JSON
+_LOADS: Callable[[bytes | str], Any] = _stdlib_loads
+_FAST_DUMPS: Callable[[Any, bool], bytes] | None = None
+_DECODE_ERRORS: Tuple[type, ...] = ()
+
+
+def set_backend(name: str | None = None) -> str:
+    """Pick the backend (None = best installed); returns the name in use."""
+    global BACKEND, _LOADS, _FAST_DUMPS, _DECODE_ERRORS
+    name = (name or "").strip().lower() or None
+    if name == JSON:
+        BACKEND, _LOADS, _FAST_DUMPS, _DECODE_ERRORS = JSON, _stdlib_loads, None, ()
+    else:
+        BACKEND, _LOADS, _FAST_DUMPS, _DECODE_ERRORS = _select(name)
+    return BACKEND
+
+
+set_backend(os.environ.get("WEALTH_JSON_BACKEND"))
+
+
+def loads(data: bytes | str) -> Any:
+    try:
+        return _LOADS(data)
+    except (ValueError, *_DECODE_ERRORS) as exc:
+        raise JSONDecodeError(str(exc)) from exc
+
+
+_INT_LIMIT = 1 << 63
+
+
+def _fast_safe(obj: Any) -> bool:
+    """True when the fast encoder is known to print obj exactly like the stdlib."""
+    kind = type(obj)
+    if kind is str or kind is bool or obj is None:
+        return True
+    if kind is int:
+        return -_INT_LIMIT <= obj < _INT_LIMIT
+    if kind is float:
+        # repr() switches to exponent form outside [1e-4, 1e16); fast encoders spell it differently.
+        magnitude = abs(obj)
+        return math.isfinite(obj) and (magnitude == 0.0 or 1e-4 <= magnitude < 1e16)
+    if kind is dict:
+        return all(type(key) is str and _fast_safe(value) for key, value in obj.items())
+    if kind is list or kind is tuple:
+        return all(_fast_safe(item) for item in obj)
+    return False
+
+
+COMPACT = "compact"
+STDLIB = "stdlib"
+
+
+def dumps(obj: Any, *, indent: bool = False, separators: str = COMPACT) -> bytes:
+    """UTF-8 JSON bytes, compact or indented by two spaces; separators="stdlib" spaces
+    them as plain ``json.dumps(obj, ensure_ascii=False)`` does."""
+    if separators == STDLIB and not indent:
+        return json.dumps(obj, ensure_ascii=False).encode("utf-8")
+    if separators not in (COMPACT, STDLIB):
+        raise ValueError(f"unknown separators {separators!r} (expected {COMPACT!r} or {STDLIB!r})")
+    if _FAST_DUMPS is not None and _fast_safe(obj):
+        return _FAST_DUMPS(obj, indent)
+    return _stdlib_dumps(obj, indent)
+
+
+def dumps_text(obj: Any, *, indent: bool = False) -> str:
+    return dumps(obj, indent=indent).decode("utf-8")
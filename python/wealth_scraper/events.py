@@ -0,0 +1,192 @@
+"""Live JSONL progress events, for dashboards that tail a long run.
+
+``WEALTH_EVENTS`` (or ``--events``) names the destination: ``-`` for stdout,
+``unix:/path`` to connect to a Unix socket someone is listening on, anything
+else a file to append to. Every line is one JSON object with ``event`` and
+``ts`` (unix seconds):
+
+- ``scrape_start``: ``catalog`` (wealth/fund in ``run_scrape``), ``total``
+  products to fetch, ``carried`` forward unchanged
+- ``product_start`` / ``product_finish``: ``url``, ``provider``; finish adds
+  ``seconds`` and ``ok`` (or ``error``)
+- ``retry``: ``url`` requested for ``product``, ``attempt``, ``error`` and the
+  ``backoff`` seconds before the next attempt
+- ``progress`` every ``WEALTH_EVENTS_INTERVAL`` seconds (default 2) and at the
+  end of the scrape: ``catalog``, ``done``, ``failed``, ``total``, ``elapsed``,
+  ``rate`` (products/s) and ``eta`` (seconds)
+- ``scrape_finish``: ``catalog``, ``succeeded``, ``failed``, ``seconds``
+
+Without a destination ``emit`` returns at once. Lines are buffered and written
+at most every 0.25 seconds (and on every progress event); a reader that goes
+away turns the stream off for the rest of the run instead of failing it.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import os
+import socket
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, BinaryIO, Iterator, List, Optional
+
+from . import codec
+from .logger import get_logger
+
+_log = get_logger("events")
+
+_FLUSH_SECONDS = 0.25
+
+_DESTINATION: Optional[str] = None
+_LOCK = threading.Lock()
+_SINK: Optional["_Sink"] = None
+
+
+class _Sink:
+    def __init__(self, destination: str) -> None:
+        self.destination = destination
+        self._file: Optional[BinaryIO] = None
+        self._socket: Optional[socket.socket] = None
+        self._owned = True
+        if destination == "-":
+            self._file, self._owned = sys.stdout.buffer, False
+        elif destination.startswith("unix:"):
+            self._socket = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            try:
+                self._socket.connect(destination[len("unix:"):])
+            except OSError:
+                self._socket.close()
+                raise
+            # A reader that stops reading must not stall the run.
+            self._socket.settimeout(1.0)
+        else:
+            self._file = open(destination, "ab")
+        self._buffer: List[bytes] = []
+        self._flushed = time.monotonic()
+
+    def write(self, line: bytes, flush: bool) -> None:
+        self._buffer.append(line)
+        now = time.monotonic()
+        if flush or now - self._flushed >= _FLUSH_SECONDS:
+            self.flush()
+            self._flushed = now
+
+    def flush(self) -> None:
+        if not self._buffer:
+            return
+        data, self._buffer = b"".join(self._buffer), []
+        if self._socket is not None:
+            self._socket.sendall(data)
+        elif self._file is not None:
+            self._file.write(data)
+            self._file.flush()
+
+    def close(self) -> None:
+        try:
+            self.flush()
+        finally:
+            if self._socket is not None:
+                self._socket.close()
+            elif self._file is not None and self._owned:
+                self._file.close()
+
+
+def configure(destination: Optional[str]) -> None:
+    """Send events to destination (None = back to WEALTH_EVENTS)."""
+    global _DESTINATION
+    _DESTINATION = destination
+
+
+def destination() -> Optional[str]:
+    return _DESTINATION or os.environ.get("WEALTH_EVENTS") or None
+
+
+def enabled() -> bool:
+    return _SINK is not None
+
+
+def _drop(exc: OSError) -> None:
+    global _SINK
+    _log.warning("[events] stream to %s closed: %s", _SINK.destination if _SINK else "?", exc)
+    _SINK = None
+
+
+def emit(event: str, **fields: Any) -> None:
+    if _SINK is None:
+        return
+    line = codec.dumps({"event": event, "ts": round(time.time(), 3), **fields}) + b"\n"
+    with _LOCK:
+        if _SINK is None:
+            return
+        try:
+            _SINK.write(line, flush=event == "progress")
+        except OSError as exc:
+            _drop(exc)
+
+
+@contextmanager
+def session(target: Optional[str] = None) -> Iterator[None]:
+    """Stream events of the enclosed block to target (or the configured destination)."""
+    global _SINK
+    target = target or destination()
+    if not target or _SINK is not None:
+        yield
+        return
+    try:
+        sink = _Sink(target)
+    except OSError as exc:
+        _log.warning("[events] cannot open %s: %s", target, exc)
+        yield
+        return
+    with _LOCK:
+        _SINK = sink
+    try:
+        yield
+    finally:
+        with _LOCK:
+            current, _SINK = _SINK, None
+        if current is not None:
+            try:
+                current.close()
+            except OSError as exc:
+                _log.warning("[events] closing %s: %s", target, exc)
+
+
+class Progress:
+    """Counts finished products of one scrape and reports throughput and ETA."""
+
+    def __init__(self, total: int, catalog: str = "") -> None:
+        self.catalog = catalog
+        self.total = total
+        self.done = 0
+        self.failed = 0
+        self.started = time.monotonic()
+
+    def finish(self, ok: bool) -> None:
+        self.done += 1
+        if not ok:
+            self.failed += 1
+
+    def report(self) -> None:
+        elapsed = time.monotonic() - self.started
+        rate = self.done / elapsed if elapsed > 0 else 0.0
+        remaining = self.total - self.done
+        emit(
+            "progress",
+            catalog=self.catalog,
+            done=self.done,
+            failed=self.failed,
+            total=self.total,
+            elapsed=round(elapsed, 3),
+            rate=round(rate, 3),
+            eta=round(remaining / rate, 1) if rate else None,
+        )
+
+    async def run(self) -> None:
+        """Report every WEALTH_EVENTS_INTERVAL seconds until cancelled."""
+        interval = float(os.environ.get("WEALTH_EVENTS_INTERVAL") or 2)
+        while True:
+            await asyncio.sleep(interval)
+            self.report()
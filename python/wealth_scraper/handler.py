@@ -1,4 +1,9 @@
-"""Backward-compatible Lambda entry point (uses env paths)."""
+"""Backward-compatible Lambda entry point (uses env paths).
+
+Warm invocations reuse the process state kept by ``runtime`` (catalogs, TLS
+sessions, caches, signing keys, the event loop and its kept-alive connections);
+each summary reports it under ``runtime``.
+"""
 
 from __future__ import annotations
 
@@ -18,10 +23,12 @@ def lambda_handler(event, context):
     fund_links = evt.get("fund_links") or os.environ.get("FUND_LINKS_PATH") or DEFAULT_FUND_LINKS
     wealth_output = evt.get("wealth_output") or os.environ.get("WEALTH_OUTPUT_PATH") or DEFAULT_WEALTH_OUTPUT
     fund_output = evt.get("fund_output") or os.environ.get("FUND_OUTPUT_PATH") or DEFAULT_FUND_OUTPUT
+    changed_only = bool(evt.get("changed_only"))
 
     return run_scrape(
         wealth_links=wealth_links,
         fund_links=fund_links,
         wealth_output=wealth_output,
         fund_output=fund_output,
+        changed_only=changed_only,
     )
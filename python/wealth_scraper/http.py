@@ -1,40 +1,101 @@
+"""HTTP for the providers: a small asyncio HTTP/1.1 client on the standard library.
+
+``ahttp_fetch``/``afetch_json`` are the native coroutines; ``http_fetch`` and
+``fetch_json`` run them to completion for synchronous callers. Connections are
+kept alive and reused by later requests to the same host in the same event loop
+for ``WEALTH_HTTP_KEEPALIVE`` seconds of idleness (default 15; 0 sends
+``Connection: close`` and opens one per request); ``run_sync`` closes them with
+its loop, the runtime's loop keeps them across warm invocations. Requests go through the proxy pool
+(``proxies``) or else the proxy environment variables, follows redirects and raises
+``HTTPError`` for non-2xx responses and ``URLError`` for connection failures
+and timeouts, as urllib does. Retries, backoff sleeps and throttling waits all yield to the
+event loop instead of blocking a thread.
+
+Hosts that turn out to need the legacy TLS context (``UNSAFE_LEGACY_RENEGOTIATION_DISABLED``
+with the strict one) are remembered for the process and, in the ``tls_hosts``
+state cache, for ``WEALTH_TLS_MEMORY_DAYS`` (default 30); their requests go
+straight to the legacy context. TLS sessions are kept per host and resumed by
+later connections in the process (Python cannot serialize them, so they do not
+outlive it).
+"""
+
 from __future__ import annotations
 
-import json
+import asyncio
+import base64
+import errno
+import functools
+import io
 import os
+import socket
 import ssl
+import threading
 import time
+import weakref
+from contextlib import contextmanager
+from contextvars import ContextVar
 from dataclasses import dataclass
-from typing import Dict, Optional
+from email.message import Message
+from email.parser import BytesHeaderParser
+from typing import Dict, Iterator, List, Optional, Tuple
 from urllib.error import HTTPError, URLError
-from urllib.request import Request, urlopen
+from urllib.parse import SplitResult, unquote, urljoin, urlsplit, urlunsplit
+from urllib.request import getproxies, proxy_bypass
 
+from . import cache, cassette, codec, events, metrics, proxies, throttle
 from .config import USER_AGENT
-from .logger import debug_log
+from .logger import get_logger
+from .utils import on_loop_exit, run_sync
+
+_log = get_logger("http")
+
+_MAX_REDIRECTS = 10
+_REDIRECT_STATUSES = frozenset({301, 302, 303, 307, 308})
+_MAX_HEAD = 65536
+_MAX_IDLE_PER_HOST = 16
 
 
 @dataclass
 class FetchResult:
-    text: str
+    content: bytes
     url: str
+    status: int = 200
+
+    @functools.cached_property
+    def text(self) -> str:
+        return self.content.decode("utf-8", errors="ignore")
+
+
+class _TLSContext(ssl.SSLContext):
+    """Client context that resumes the TLS session remembered for the host being connected."""
+
+    def wrap_bio(self, incoming, outgoing, server_side=False, server_hostname=None, session=None):
+        # asyncio creates the SSL object itself, without a way to pass a session.
+        if session is None and not server_side:
+            session = _RESUME.get()
+        try:
+            return super().wrap_bio(incoming, outgoing, server_side, server_hostname, session)
+        except ValueError:
+            # A session of another context (rebuilt since): start a fresh one.
+            return super().wrap_bio(incoming, outgoing, server_side, server_hostname)
 
 
 def _build_ssl_context(allow_legacy: bool) -> ssl.SSLContext:
+    context = _TLSContext(ssl.PROTOCOL_TLS_CLIENT)
     if os.environ.get("WEALTH_SSL_NO_VERIFY") == "1":
-        context = ssl.create_default_context()
         context.check_hostname = False
         context.verify_mode = ssl.CERT_NONE
     else:
         ca_bundle = os.environ.get("WEALTH_CA_BUNDLE")
         if ca_bundle:
-            context = ssl.create_default_context(cafile=ca_bundle)
+            context.load_verify_locations(cafile=ca_bundle)
         else:
             try:
                 import certifi
 
-                context = ssl.create_default_context(cafile=certifi.where())
+                context.load_verify_locations(cafile=certifi.where())
             except Exception:
-                context = ssl.create_default_context()
+                context.load_default_certs()
 
     if allow_legacy:
         legacy_flag = getattr(ssl, "OP_LEGACY_SERVER_CONNECT", 0)
@@ -45,6 +106,551 @@ def _build_ssl_context(allow_legacy: bool) -> ssl.SSLContext:
 
 _SSL_CONTEXT = _build_ssl_context(allow_legacy=False)
 _SSL_CONTEXT_LEGACY = _build_ssl_context(allow_legacy=True)
+_PROXIES = getproxies()
+
+# Session to resume for the connection being opened (read by _TLSContext.wrap_bio).
+_RESUME: ContextVar[Optional[ssl.SSLSession]] = ContextVar("wealth_tls_resume", default=None)
+# Latest TLS session per (host, port, context), for resumption by later connections.
+_TLS_SESSIONS: Dict[Tuple[str, int, ssl.SSLContext], ssl.SSLSession] = {}
+# Hosts that needed the legacy context in this process.
+_LEGACY_HOSTS: set = set()
+_TLS_LOCK = threading.Lock()
+
+# Phase timings of the attempt currently in flight; written by the timed connections below.
+_PHASES: ContextVar[Optional[Dict[str, float]]] = ContextVar("wealth_http_phases", default=None)
+
+
+@dataclass
+class _Connection:
+    reader: asyncio.StreamReader
+    writer: asyncio.StreamWriter
+    idle_since: float = 0.0
+
+
+# Idle keep-alive connections per event loop and (scheme, host, port, TLS context, proxy).
+_IDLE: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, Dict[tuple, List[_Connection]]]" = (
+    weakref.WeakKeyDictionary()
+)
+# Connections opened and kept-alive connections reused by this process.
+_CONNECTIONS = {"opened": 0, "reused": 0}
+
+
+class _StaleConnection(Exception):
+    """A reused connection the server had already closed; the request goes out again on a fresh one."""
+
+
+def _keepalive_seconds() -> float:
+    return float(os.environ.get("WEALTH_HTTP_KEEPALIVE") or 15)
+
+
+def _checkout(key: tuple, keepalive: float) -> Optional[_Connection]:
+    idle = _IDLE.get(asyncio.get_running_loop(), {}).get(key)
+    now = time.monotonic()
+    while idle:
+        connection = idle.pop()
+        if now - connection.idle_since < keepalive and not connection.writer.is_closing() and not connection.reader.at_eof():
+            return connection
+        connection.writer.close()
+    return None
+
+
+def _checkin(key: tuple, connection: _Connection) -> None:
+    idle = _IDLE.setdefault(asyncio.get_running_loop(), {}).setdefault(key, [])
+    if len(idle) >= _MAX_IDLE_PER_HOST:
+        connection.writer.close()
+        return
+    connection.idle_since = time.monotonic()
+    idle.append(connection)
+
+
+@on_loop_exit
+async def close_idle() -> None:
+    """Close the kept-alive connections of the running event loop."""
+    for idle in _IDLE.pop(asyncio.get_running_loop(), {}).values():
+        for connection in idle:
+            connection.writer.close()
+            try:
+                await asyncio.wait_for(connection.writer.wait_closed(), 1)
+            except (OSError, asyncio.TimeoutError):
+                pass
+
+
+# Per-product retry budget (``retries`` in wealth_links.json); None means WEALTH_HTTP_RETRIES.
+_RETRIES: ContextVar[Optional[int]] = ContextVar("wealth_http_retries", default=None)
+
+
+@contextmanager
+def retries_override(retries: int | None) -> Iterator[None]:
+    token = _RETRIES.set(retries)
+    try:
+        yield
+    finally:
+        _RETRIES.reset(token)
+
+
+def _add_phase(name: str, seconds: float) -> None:
+    phases = _PHASES.get()
+    if phases is not None:
+        phases[name] = phases.get(name, 0.0) + seconds
+
+
+def _tls_memory() -> cache.TTLCache:
+    days = float(os.environ.get("WEALTH_TLS_MEMORY_DAYS") or 30)
+    return cache.get_cache("tls_hosts", ttl=days * 86400)
+
+
+def needs_legacy_ssl(host: str) -> bool:
+    """Whether host needed ``OP_LEGACY_SERVER_CONNECT`` earlier in this process or a recent run."""
+    host = host.lower()
+    with _TLS_LOCK:
+        if host in _LEGACY_HOSTS:
+            return True
+    if not (_tls_memory().get(host) or {}).get("legacy"):
+        return False
+    with _TLS_LOCK:
+        _LEGACY_HOSTS.add(host)
+    return True
+
+
+def _remember_legacy(host: str) -> None:
+    host = host.lower()
+    with _TLS_LOCK:
+        _LEGACY_HOSTS.add(host)
+    _tls_memory().set(host, {"legacy": True})
+
+
+def tls_state() -> Dict[str, int]:
+    """How much TLS state this process holds: resumable sessions and known legacy hosts."""
+    with _TLS_LOCK:
+        return {"sessions": len(_TLS_SESSIONS), "legacyHosts": len(_LEGACY_HOSTS)}
+
+
+def connection_state() -> Dict[str, int]:
+    """How many connections this process has opened and reused, and how many sit idle now."""
+    with _TLS_LOCK:
+        counts = dict(_CONNECTIONS)
+    counts["idle"] = sum(len(idle) for pool in list(_IDLE.values()) for idle in pool.values())
+    return counts
+
+
+def _count_connection(kind: str) -> None:
+    with _TLS_LOCK:
+        _CONNECTIONS[kind] += 1
+
+
+def _resumable(key: Tuple[str, int, ssl.SSLContext]) -> Optional[ssl.SSLSession]:
+    with _TLS_LOCK:
+        session = _TLS_SESSIONS.get(key)
+        if session is not None and time.time() >= session.time + session.timeout:
+            del _TLS_SESSIONS[key]
+            return None
+        return session
+
+
+def _keep_session(key: Tuple[str, int, ssl.SSLContext], ssl_object: ssl.SSLObject) -> None:
+    # Read after the response: TLS 1.3 tickets arrive after the handshake.
+    session = ssl_object.session
+    if session is not None:
+        with _TLS_LOCK:
+            _TLS_SESSIONS[key] = session
+
+
+def _proxy_for(scheme: str, host: str) -> Optional[SplitResult]:
+    """The environment proxy (http_proxy/https_proxy/no_proxy) to use for host, if any."""
+    proxy = _PROXIES.get(scheme)
+    if not proxy or proxy_bypass(host):
+        return None
+    return urlsplit(proxy if "://" in proxy else f"http://{proxy}")
+
+
+def _proxy_authorization(proxy: SplitResult) -> Optional[str]:
+    if proxy.username is None:
+        return None
+    credentials = f"{unquote(proxy.username)}:{unquote(proxy.password or '')}"
+    return "Basic " + base64.b64encode(credentials.encode("utf-8")).decode("ascii")
+
+
+async def _open_socket(host: str, port: int) -> socket.socket:
+    """A connected non-blocking socket, with DNS and TCP connect timed separately."""
+    loop = asyncio.get_running_loop()
+    started = time.perf_counter()
+    try:
+        infos = await loop.getaddrinfo(host, port, type=socket.SOCK_STREAM)
+    finally:
+        resolved = time.perf_counter()
+        _add_phase("dns", resolved - started)
+
+    last_exc: Optional[OSError] = None
+    try:
+        for family, socktype, proto, _, address in infos:
+            sock = socket.socket(family, socktype, proto)
+            try:
+                sock.setblocking(False)
+                await loop.sock_connect(sock, address)
+            except OSError as exc:
+                last_exc = exc
+                sock.close()
+                continue
+            except BaseException:
+                sock.close()
+                raise
+            try:
+                sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            except OSError as exc:
+                if exc.errno != errno.ENOPROTOOPT:
+                    sock.close()
+                    raise
+            return sock
+    finally:
+        _add_phase("connect", time.perf_counter() - resolved)
+    raise last_exc or OSError(f"getaddrinfo returned no addresses for {host}")
+
+
+async def _tunnel(sock: socket.socket, host: str, port: int, authorization: Optional[str]) -> None:
+    """Open a CONNECT tunnel through the proxy sock is connected to."""
+    loop = asyncio.get_running_loop()
+    lines = [f"CONNECT {host}:{port} HTTP/1.1", f"Host: {host}:{port}"]
+    if authorization:
+        lines.append(f"Proxy-Authorization: {authorization}")
+    await loop.sock_sendall(sock, ("\r\n".join(lines) + "\r\n\r\n").encode("latin-1"))
+    response = b""
+    while b"\r\n\r\n" not in response:
+        chunk = await loop.sock_recv(sock, 4096)
+        if not chunk or len(response) > _MAX_HEAD:
+            raise OSError("Tunnel connection failed: proxy closed the connection")
+        response += chunk
+    status_line = response.split(b"\r\n", 1)[0].decode("latin-1")
+    parts = status_line.split(" ", 2)
+    if len(parts) < 2 or parts[1] != "200":
+        raise OSError(f"Tunnel connection failed: {status_line}")
+
+
+async def _readline(reader: asyncio.StreamReader) -> bytes:
+    try:
+        return await reader.readline()
+    except (ValueError, asyncio.LimitOverrunError):
+        # A line over the reader's limit (64 KiB): a broken response, retried as any other.
+        raise ConnectionError("response line too long") from None
+
+
+async def _read_head(reader: asyncio.StreamReader) -> Tuple[str, int, str, Message]:
+    """HTTP version, status, reason and headers of the response, skipping interim 1xx responses."""
+    while True:
+        line = await _readline(reader)
+        if not line:
+            raise ConnectionResetError("Remote end closed connection without response")
+        version, _, rest = line.decode("latin-1").strip().partition(" ")
+        code, _, reason = rest.partition(" ")
+        if not version.startswith("HTTP/") or not code.isdigit():
+            raise ConnectionError(f"bad status line {line!r}")
+        raw = b""
+        while True:
+            header = await _readline(reader)
+            if header in (b"\r\n", b"\n", b""):
+                break
+            raw += header
+            if len(raw) > _MAX_HEAD:
+                raise ConnectionError("response headers too long")
+        status = int(code)
+        if 100 <= status < 200:
+            continue
+        return version, status, reason, BytesHeaderParser().parsebytes(raw)
+
+
+async def _read_body(reader: asyncio.StreamReader, method: str, status: int, headers: Message) -> bytes:
+    if method == "HEAD" or status in (204, 304):
+        return b""
+    try:
+        if "chunked" in (headers.get("Transfer-Encoding") or "").lower():
+            chunks = []
+            while True:
+                size_line = await _readline(reader)
+                try:
+                    size = int(size_line.split(b";", 1)[0].strip(), 16)
+                except ValueError:
+                    raise ConnectionError(f"bad chunk size {size_line!r}") from None
+                if size == 0:
+                    while await _readline(reader) not in (b"\r\n", b"\n", b""):
+                        pass
+                    return b"".join(chunks)
+                chunks.append(await reader.readexactly(size))
+                await reader.readexactly(2)
+        length = headers.get("Content-Length")
+        if length and length.strip().isdigit():
+            return await reader.readexactly(int(length))
+        return await reader.read()
+    except asyncio.IncompleteReadError as exc:
+        raise ConnectionError(f"incomplete read ({len(exc.partial)} bytes)") from None
+
+
+def _reusable(version: str, method: str, status: int, headers: Message) -> bool:
+    """Whether the connection can carry another request once this response is read."""
+    tokens = {token.strip().lower() for token in (headers.get("Connection") or "").split(",")}
+    if version == "HTTP/1.0" or "close" in tokens:
+        return False
+    length = headers.get("Content-Length")
+    return (
+        method == "HEAD"
+        or status in (204, 304)
+        or "chunked" in (headers.get("Transfer-Encoding") or "").lower()
+        or bool(length and length.strip().isdigit())
+    )
+
+
+async def _connect(
+    scheme: str, host: str, port: int, timeout: float, context: ssl.SSLContext, proxy: Optional[SplitResult], authorization: Optional[str]
+) -> _Connection:
+    if proxy is not None:
+        sock = await asyncio.wait_for(_open_socket(proxy.hostname or "", proxy.port or 80), timeout)
+    else:
+        sock = await asyncio.wait_for(_open_socket(host, port), timeout)
+    try:
+        if proxy is not None and scheme == "https":
+            await asyncio.wait_for(_tunnel(sock, host, port, authorization), timeout)
+        if scheme != "https":
+            return _Connection(*await asyncio.open_connection(sock=sock))
+        started = time.perf_counter()
+        resume = _RESUME.set(_resumable((host.lower(), port, context)))
+        try:
+            reader, writer = await asyncio.wait_for(
+                asyncio.open_connection(sock=sock, ssl=context, server_hostname=host), timeout
+            )
+        finally:
+            _RESUME.reset(resume)
+        _add_phase("tls", time.perf_counter() - started)
+        if writer.get_extra_info("ssl_object").session_reused:
+            _add_phase("tls_resumed", 1.0)
+        return _Connection(reader, writer)
+    except BaseException:
+        sock.close()
+        raise
+
+
+async def _exchange(
+    url: str,
+    method: str,
+    data: Optional[bytes],
+    headers: Dict[str, str],
+    timeout: float,
+    context: ssl.SSLContext,
+    proxy: Optional[SplitResult] = None,
+) -> Tuple[int, str, Message, bytes]:
+    """One request/response on an idle kept-alive connection or a new one, through
+    proxy (default: the environment proxy for the url); timeout applies to each phase."""
+    parts = urlsplit(url)
+    scheme = parts.scheme.lower()
+    if scheme not in ("http", "https"):
+        raise URLError(f"unknown url type: {scheme}")
+    host = parts.hostname
+    if not host:
+        raise URLError("no host given")
+    port = parts.port or (443 if scheme == "https" else 80)
+    target = urlunsplit(("", "", parts.path or "/", parts.query, ""))
+    head = {"Host": parts.netloc.rpartition("@")[2], "User-Agent": USER_AGENT, "Accept-Encoding": "identity"}
+    head.update(headers)
+    if data is not None:
+        head.setdefault("Content-Type", "application/x-www-form-urlencoded")
+        head["Content-Length"] = str(len(data))
+    keepalive = _keepalive_seconds()
+    if keepalive <= 0:
+        head["Connection"] = "close"
+
+    if proxy is None:
+        proxy = _proxy_for(scheme, host)
+    authorization = _proxy_authorization(proxy) if proxy is not None else None
+    if proxy is not None and scheme == "http":
+        # Plain HTTP goes to the proxy in absolute form; HTTPS is tunnelled below.
+        target = urlunsplit((scheme, parts.netloc, parts.path or "/", parts.query, ""))
+        if authorization:
+            head["Proxy-Authorization"] = authorization
+    lines = [f"{method} {target} HTTP/1.1"] + [f"{name}: {value}" for name, value in head.items()]
+    request = ("\r\n".join(lines) + "\r\n\r\n").encode("latin-1") + (data or b"")
+    key = (scheme, host.lower(), port, context if scheme == "https" else None, proxy.geturl() if proxy is not None else None)
+
+    connection = _checkout(key, keepalive) if keepalive > 0 else None
+    if connection is not None:
+        try:
+            return await _send(connection, request, method, timeout, key, keepalive, reused=True)
+        except _StaleConnection:
+            _log.debug("[http] kept-alive connection to %s was closed; reconnecting", host)
+    connection = await _connect(scheme, host, port, timeout, context, proxy, authorization)
+    _count_connection("opened")
+    return await _send(connection, request, method, timeout, key, keepalive, reused=False)
+
+
+async def _send(
+    connection: _Connection, request: bytes, method: str, timeout: float, key: tuple, keepalive: float, reused: bool
+) -> Tuple[int, str, Message, bytes]:
+    """Write request on connection and read the response; the connection goes back
+    to the idle pool when the server keeps it open, and is closed otherwise."""
+    reader, writer = connection.reader, connection.writer
+    keep = False
+    try:
+        sent = time.perf_counter()
+        try:
+            writer.write(request)
+            await asyncio.wait_for(writer.drain(), timeout)
+            version, status, reason, response_headers = await asyncio.wait_for(_read_head(reader), timeout)
+        except (ConnectionResetError, BrokenPipeError) as exc:
+            # Servers drop idle connections when they like; nothing was answered yet.
+            if reused:
+                raise _StaleConnection() from exc
+            raise
+        received = time.perf_counter()
+        _add_phase("ttfb", received - sent)
+        body = await asyncio.wait_for(_read_body(reader, method, status, response_headers), timeout)
+        _add_phase("download", time.perf_counter() - received)
+        if reused:
+            _add_phase("reused", 1.0)
+            _count_connection("reused")
+        ssl_object = writer.get_extra_info("ssl_object")
+        if ssl_object is not None and not reused:
+            _keep_session(key[1:4], ssl_object)
+        keep = keepalive > 0 and _reusable(version, method, status, response_headers)
+        return status, reason, response_headers, body
+    finally:
+        if keep:
+            _checkin(key, connection)
+        else:
+            writer.close()
+            try:
+                await asyncio.wait_for(writer.wait_closed(), 1)
+            except (OSError, asyncio.TimeoutError):
+                pass
+
+
+async def _request(
+    url: str,
+    method: str,
+    data: Optional[bytes],
+    headers: Dict[str, str],
+    timeout: float,
+    context: ssl.SSLContext,
+    proxy: Optional[SplitResult] = None,
+) -> Tuple[int, bytes]:
+    """Send the request following redirects like urllib; non-2xx raises HTTPError,
+    connection failures and timeouts raise URLError."""
+    try:
+        for _ in range(_MAX_REDIRECTS + 1):
+            status, reason, response_headers, body = await _exchange(url, method, data, headers, timeout, context, proxy)
+            location = response_headers.get("Location") or response_headers.get("URI")
+            follow = method in ("GET", "HEAD") or (method == "POST" and status in (301, 302, 303))
+            if status in _REDIRECT_STATUSES and location and follow:
+                redirected = urljoin(url, location)
+                if urlsplit(redirected).scheme.lower() not in ("http", "https"):
+                    raise HTTPError(url, status, f"redirect to {redirected} not allowed", response_headers, io.BytesIO(body))
+                if status in (301, 302, 303) and method == "POST":
+                    method, data = "GET", None
+                    headers = {
+                        name: value
+                        for name, value in headers.items()
+                        if name.lower() not in ("content-type", "content-length")
+                    }
+                url = redirected
+                continue
+            if not 200 <= status < 300:
+                raise HTTPError(url, status, reason, response_headers, io.BytesIO(body))
+            return status, body
+        raise HTTPError(url, status, "too many redirects", response_headers, io.BytesIO(body))
+    except URLError:
+        raise
+    except asyncio.TimeoutError:
+        raise URLError(TimeoutError("timed out")) from None
+    except OSError as exc:
+        raise URLError(exc) from exc
+
+
+def _parse_host_overrides(raw: str) -> Dict[str, str]:
+    overrides: Dict[str, str] = {}
+    for item in raw.split(","):
+        host, _, target = item.partition("=")
+        if host.strip() and target.strip():
+            overrides[host.strip().lower()] = target.strip().rstrip("/")
+    return overrides
+
+
+# host -> "scheme://host:port" replacement, e.g. to point providers at local stub servers.
+_HOST_OVERRIDES = _parse_host_overrides(os.environ.get("WEALTH_HTTP_HOST_OVERRIDES", ""))
+
+
+def set_host_overrides(overrides: Optional[Dict[str, str]]) -> None:
+    _HOST_OVERRIDES.clear()
+    for host, target in (overrides or {}).items():
+        _HOST_OVERRIDES[host.lower()] = target.rstrip("/")
+
+
+def _rewrite_url(url: str) -> str:
+    if not _HOST_OVERRIDES:
+        return url
+    parts = urlsplit(url)
+    target = _HOST_OVERRIDES.get((parts.hostname or "").lower())
+    if not target:
+        return url
+    scheme, _, netloc = target.partition("://")
+    return urlunsplit((scheme, netloc, parts.path, parts.query, parts.fragment))
+
+
+async def _replay(tape: cassette.Cassette, url: str, method: str, data: Optional[bytes]) -> FetchResult:
+    started = time.perf_counter()
+    timing = metrics.RequestTiming(
+        url=url,
+        host=urlsplit(url).hostname or "",
+        method=method,
+        provider=metrics.current_provider(),
+        product=metrics.current_product(),
+        cache_ttl=metrics.current_cache_ttl(),
+        attempts=1,
+    )
+    try:
+        interaction = tape.lookup(method, url, data)
+        delay = tape.delay(interaction)
+        if delay > 0:
+            await asyncio.sleep(delay)
+        timing.status = interaction.status or None
+        content = interaction.text.encode("utf-8")
+        timing.bytes = len(content)
+        if interaction.error:
+            timing.error = interaction.error
+            if interaction.status:
+                raise HTTPError(url, interaction.status, interaction.error, hdrs=Message(), fp=None)
+            raise URLError(interaction.error)
+        return FetchResult(content=content, url=url, status=interaction.status)
+    except RuntimeError as exc:
+        timing.error = str(exc)
+        raise
+    finally:
+        timing.total = time.perf_counter() - started
+        metrics.record(timing)
+
+
+async def ahttp_fetch(
+    url: str,
+    *,
+    method: str = "GET",
+    data: Optional[bytes] = None,
+    headers: Optional[Dict[str, str]] = None,
+    timeout: int = 30,
+) -> FetchResult:
+    tape = cassette.active()
+    if tape is None:
+        return await _fetch_live(url, method=method, data=data, headers=headers, timeout=timeout)
+    if tape.mode == cassette.REPLAY:
+        return await _replay(tape, url, method, data)
+
+    started = time.perf_counter()
+    try:
+        result = await _fetch_live(url, method=method, data=data, headers=headers, timeout=timeout)
+    except HTTPError as exc:
+        elapsed = time.perf_counter() - started
+        tape.record(method, url, data, headers, status=exc.code, text="", elapsed=elapsed, error=str(exc.reason))
+        raise
+    except URLError as exc:
+        elapsed = time.perf_counter() - started
+        tape.record(method, url, data, headers, status=0, text="", elapsed=elapsed, error=str(exc.reason))
+        raise
+    elapsed = time.perf_counter() - started
+    tape.record(method, url, data, headers, status=result.status, text=result.text, elapsed=elapsed)
+    return result
 
 
 def http_fetch(
@@ -55,50 +661,147 @@ def http_fetch(
     headers: Optional[Dict[str, str]] = None,
     timeout: int = 30,
 ) -> FetchResult:
-    req_headers = {"User-Agent": USER_AGENT}
-    if headers:
-        req_headers.update(headers)
-    req = Request(url, data=data, headers=req_headers, method=method)
-    prefer_legacy = os.environ.get("WEALTH_SSL_ALLOW_LEGACY") == "1"
+    return run_sync(ahttp_fetch(url, method=method, data=data, headers=headers, timeout=timeout))
+
+
+async def _fetch_live(
+    url: str,
+    *,
+    method: str,
+    data: Optional[bytes],
+    headers: Optional[Dict[str, str]],
+    timeout: int,
+) -> FetchResult:
+    target = _rewrite_url(url)
+    method = method.upper()
+    target_host = urlsplit(target).hostname or ""
+    prefer_legacy = os.environ.get("WEALTH_SSL_ALLOW_LEGACY") == "1" or (
+        target.startswith("https:") and needs_legacy_ssl(target_host)
+    )
     context = _SSL_CONTEXT_LEGACY if prefer_legacy else _SSL_CONTEXT
-    retries = int(os.environ.get("WEALTH_HTTP_RETRIES", "3"))
+    retries = _RETRIES.get()
+    if retries is None:
+        retries = int(os.environ.get("WEALTH_HTTP_RETRIES", "3"))
     backoff = float(os.environ.get("WEALTH_HTTP_RETRY_BACKOFF", "0.8"))
     retry_statuses = {404, 408, 429, 500, 502, 503, 504}
 
-    for attempt in range(retries + 1):
-        debug_log(f"[http] {method} {url} attempt {attempt + 1}/{retries + 1} legacy={prefer_legacy}")
-        try:
-            with urlopen(req, timeout=timeout, context=context) as resp:
-                raw = resp.read()
-            return FetchResult(text=raw.decode("utf-8", errors="ignore"), url=url)
-        except ssl.SSLError as exc:
-            if not prefer_legacy and "UNSAFE_LEGACY_RENEGOTIATION_DISABLED" in str(exc):
-                prefer_legacy = True
-                context = _SSL_CONTEXT_LEGACY
-                debug_log(f"[http] legacy renegotiation enabled for {url}")
+    timing = metrics.RequestTiming(
+        url=url,
+        host=urlsplit(url).hostname or "",
+        method=method,
+        provider=metrics.current_provider(),
+        product=metrics.current_product(),
+        cache_ttl=metrics.current_cache_ttl(),
+    )
+    site = throttle.site_bucket(timing.host)
+    limiter = throttle.limiter(timing.host)
+    bypass = proxies.pool() is not None and proxy_bypass(target_host)
+    started = time.perf_counter()
+
+    async def sleep_backoff(attempt: int, retry_after: Optional[float] = None) -> None:
+        delay = max(backoff * (2 ** attempt), retry_after or 0.0)
+        events.emit("retry", url=url, product=timing.product, attempt=attempt + 1, error=timing.error, backoff=round(delay, 3))
+        await asyncio.sleep(delay)
+        timing.backoff += delay
+
+    try:
+        for attempt in range(retries + 1):
+            _log.debug("[http] %s %s attempt %d/%d legacy=%s", method, url, attempt + 1, retries + 1, prefer_legacy)
+            timing.attempts = attempt + 1
+            timing.legacy_ssl = prefer_legacy
+            phases: Dict[str, float] = {}
+            status: Optional[int] = None
+            retry_after: Optional[float] = None
+            if site is not None:
+                timing.queued += await site.acquire()
+            if limiter is not None:
+                timing.queued += await limiter.acquire()
+            # Picked per attempt, so a retry can move off a failing proxy.
+            proxy = None if bypass else proxies.acquire(timing.host)
+            proxy_ok: Optional[bool] = None
+            timing.proxy = proxy.name if proxy is not None else ""
+            attempt_started = time.perf_counter()
+            token = _PHASES.set(phases)
+            try:
+                status, raw = await _request(
+                    target, method, data, dict(headers or {}), timeout, context, proxy.url if proxy is not None else None
+                )
+                proxy_ok = True
+                timing.status = status
+                timing.bytes = len(raw)
+                timing.error = None
+                return FetchResult(content=raw, url=url, status=status)
+            except HTTPError as exc:
+                timing.status = status = exc.code
+                timing.error = f"HTTP {exc.code}"
+                # Throttling is per IP: another proxy may get through.
+                proxy_ok = exc.code not in throttle.THROTTLE_STATUSES
+                if exc.code in throttle.THROTTLE_STATUSES and exc.headers is not None:
+                    retry_after = throttle.parse_retry_after(exc.headers.get("Retry-After"))
+                _log.debug("[http] HTTP %s %s for %s", exc.code, exc.reason, url)
+                if exc.code in retry_statuses and attempt < retries:
+                    await sleep_backoff(attempt, retry_after)
+                    continue
+                raise
+            except URLError as exc:
+                reason = getattr(exc, "reason", None)
+                timing.error = f"URLError: {reason}"
+                # A TLS failure comes from the site at the end of a working tunnel.
+                proxy_ok = isinstance(reason, ssl.SSLError)
+                if isinstance(reason, ssl.SSLError) and "UNSAFE_LEGACY_RENEGOTIATION_DISABLED" in str(reason):
+                    if not prefer_legacy:
+                        prefer_legacy = True
+                        context = _SSL_CONTEXT_LEGACY
+                        _remember_legacy(target_host)
+                        _log.debug("[http] legacy renegotiation enabled for %s", url)
+                        if attempt < retries:
+                            continue
+                _log.debug("[http] URLError for %s: %s", url, reason)
                 if attempt < retries:
+                    await sleep_backoff(attempt)
                     continue
-            raise
-        except HTTPError as exc:
-            debug_log(f"[http] HTTP {exc.code} {exc.reason} for {url}")
-            if exc.code in retry_statuses and attempt < retries:
-                time.sleep(backoff * (2 ** attempt))
-                continue
-            raise
-        except URLError as exc:
-            reason = getattr(exc, "reason", None)
-            if isinstance(reason, ssl.SSLError) and "UNSAFE_LEGACY_RENEGOTIATION_DISABLED" in str(reason):
-                if not prefer_legacy:
-                    prefer_legacy = True
-                    context = _SSL_CONTEXT_LEGACY
-                    debug_log(f"[http] legacy renegotiation enabled for {url} via URLError")
-                    if attempt < retries:
-                        continue
-            debug_log(f"[http] URLError for {url}: {reason}")
-            if attempt < retries:
-                time.sleep(backoff * (2 ** attempt))
-                continue
-            raise
+                raise
+            finally:
+                elapsed = time.perf_counter() - attempt_started
+                proxies.release(proxy, proxy_ok, elapsed)
+                if limiter is not None:
+                    limiter.release(elapsed, status, retry_after)
+                if site is not None:
+                    site.release()
+                _PHASES.reset(token)
+                for name in ("dns", "connect", "tls", "ttfb", "download"):
+                    setattr(timing, name, phases.get(name, 0.0))
+                timing.tls_resumed = bool(phases.get("tls_resumed"))
+                timing.reused = bool(phases.get("reused"))
+    except Exception as exc:
+        if not timing.error:
+            timing.error = f"{type(exc).__name__}: {exc}"
+        raise
+    finally:
+        timing.total = time.perf_counter() - started
+        metrics.record(timing)
+
+
+def _decode_json(url: str, result: FetchResult) -> Dict:
+    try:
+        return codec.loads(result.content)
+    except codec.JSONDecodeError as exc:
+        error = exc
+    try:
+        # Bodies with stray invalid UTF-8 used to be decoded leniently; keep accepting them.
+        return codec.loads(result.text)
+    except codec.JSONDecodeError:
+        raise RuntimeError(f"JSON decode failed for {url}: {error}") from error
+
+
+async def afetch_json(
+    url: str,
+    *,
+    method: str = "GET",
+    data: Optional[bytes] = None,
+    headers: Optional[Dict[str, str]] = None,
+) -> Dict:
+    return _decode_json(url, await ahttp_fetch(url, method=method, data=data, headers=headers))
 
 
 def fetch_json(
@@ -108,8 +811,4 @@ def fetch_json(
     data: Optional[bytes] = None,
     headers: Optional[Dict[str, str]] = None,
 ) -> Dict:
-    result = http_fetch(url, method=method, data=data, headers=headers)
-    try:
-        return json.loads(result.text)
-    except json.JSONDecodeError as exc:
-        raise RuntimeError(f"JSON decode failed for {url}: {exc}") from exc
+    return run_sync(afetch_json(url, method=method, data=data, headers=headers))
@@ -1,9 +1,137 @@
+"""Levelled, lazily formatted logging for the scraper.
+
+Loggers live under the ``wealth_scraper`` namespace, one per provider or component
+(``get_logger("cmb")``, ``get_logger("http")``). Messages use %-style arguments so
+nothing is formatted unless the record is actually emitted. Configuration is read
+from the environment once:
+
+- ``WEALTH_DEBUG=1``: shorthand for ``WEALTH_LOG_LEVEL=DEBUG``.
+- ``WEALTH_LOG_LEVEL``: base level (default ``WARNING``).
+- ``WEALTH_LOG_LEVELS``: per-provider overrides, e.g. ``cmb=DEBUG,http=INFO``.
+- ``WEALTH_LOG_FORMAT=json``: one JSON object per line instead of plain text.
+- ``WEALTH_LOG_SAMPLE``: keep this fraction (0-1) of DEBUG/INFO records. Values
+  outside the range are clamped; anything else is reported and ignored.
+"""
+
 from __future__ import annotations
 
+import datetime as dt
+import json
+import logging
 import os
+import random
 import sys
+import threading
+from typing import Tuple
+
+from .metrics import current_provider
+
+ROOT_NAME = "wealth_scraper"
+
+_CONFIGURED = False
+_CONFIG_LOCK = threading.Lock()
+
+
+class _SampleFilter(logging.Filter):
+    def __init__(self, rate: float) -> None:
+        super().__init__()
+        self.rate = rate
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno >= logging.WARNING:
+            return True
+        return random.random() < self.rate
+
+
+class _TextFormatter(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        message = record.getMessage()
+        if record.exc_info:
+            message = f"{message}\n{self.formatException(record.exc_info)}"
+        return message
+
+
+class _JsonFormatter(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        payload = {
+            "ts": dt.datetime.fromtimestamp(record.created, dt.timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname.lower(),
+            "logger": record.name[len(ROOT_NAME) + 1 :] or ROOT_NAME,
+            "msg": record.getMessage(),
+        }
+        provider = current_provider()
+        if provider:
+            payload["provider"] = provider
+        fields = getattr(record, "fields", None)
+        if fields:
+            payload.update(fields)
+        if record.exc_info:
+            payload["exc"] = self.formatException(record.exc_info)
+        return json.dumps(payload, ensure_ascii=False, default=str)
+
+
+def _parse_level(value: str, default: int) -> int:
+    value = (value or "").strip().upper()
+    if not value:
+        return default
+    if value.isdigit():
+        return int(value)
+    level = logging.getLevelName(value)
+    return level if isinstance(level, int) else default
+
+
+def _parse_sample(value: str) -> Tuple[float, bool]:
+    """The sampling rate clamped to [0, 1], and whether value was usable as given."""
+    try:
+        rate = float(value)
+    except ValueError:
+        return 1.0, False
+    if rate != rate:  # NaN
+        return 1.0, False
+    clamped = min(1.0, max(0.0, rate))
+    return clamped, clamped == rate
+
+
+def configure(force: bool = False) -> None:
+    """Attach the stderr handler and apply env levels; safe to call repeatedly."""
+    global _CONFIGURED
+    if _CONFIGURED and not force:
+        return
+    with _CONFIG_LOCK:
+        if _CONFIGURED and not force:
+            return
+        root = logging.getLogger(ROOT_NAME)
+        for handler in list(root.handlers):
+            if getattr(handler, "_wealth_handler", False):
+                root.removeHandler(handler)
+
+        default_level = logging.DEBUG if os.environ.get("WEALTH_DEBUG") == "1" else logging.WARNING
+        root.setLevel(_parse_level(os.environ.get("WEALTH_LOG_LEVEL", ""), default_level))
+        root.propagate = False
+
+        for item in (os.environ.get("WEALTH_LOG_LEVELS") or "").split(","):
+            name, _, level = item.partition("=")
+            if name.strip() and level.strip():
+                logging.getLogger(f"{ROOT_NAME}.{name.strip()}").setLevel(_parse_level(level, logging.NOTSET))
+
+        handler = logging.StreamHandler(sys.stderr)
+        handler._wealth_handler = True  # type: ignore[attr-defined]
+        if os.environ.get("WEALTH_LOG_FORMAT", "").lower() == "json":
+            handler.setFormatter(_JsonFormatter())
+        else:
+            handler.setFormatter(_TextFormatter())
+        sample = (os.environ.get("WEALTH_LOG_SAMPLE") or "").strip()
+        rate, valid = _parse_sample(sample) if sample else (1.0, True)
+        if rate < 1:
+            handler.addFilter(_SampleFilter(rate))
+        root.addHandler(handler)
+        _CONFIGURED = True
+        if not valid:
+            logging.getLogger(f"{ROOT_NAME}.logger").warning(
+                "[logger] WEALTH_LOG_SAMPLE=%r is not a fraction between 0 and 1; sampling at %s", sample, rate
+            )
 
 
-def debug_log(message: str) -> None:
-    if os.environ.get("WEALTH_DEBUG") == "1":
-        print(message, file=sys.stderr, flush=True)
+def get_logger(name: str) -> logging.Logger:
+    configure()
+    return logging.getLogger(f"{ROOT_NAME}.{name}")
@@ -0,0 +1,277 @@
+"""Per-request HTTP timings aggregated into run reports.
+
+``run_report.json`` summarizes them per host and provider and counts them per
+product (for the planner). Of the requests themselves it keeps every failure
+and the ``WEALTH_REPORT_REQUESTS`` slowest (default 100; ``all`` keeps every one).
+"""
+
+from __future__ import annotations
+
+import datetime as dt
+import heapq
+import os
+import threading
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional
+
+from . import codec
+
+RUN_REPORT_NAME = "run_report.json"
+PROMETHEUS_NAME = "wealth_scraper.prom"
+_REPORT_REQUESTS = 100
+
+_CURRENT_PROVIDER: ContextVar[str] = ContextVar("wealth_current_provider", default="")
+_CURRENT_PRODUCT: ContextVar[str] = ContextVar("wealth_current_product", default="")
+_CACHE_TTL: ContextVar[float] = ContextVar("wealth_cache_ttl", default=0.0)
+
+
+@dataclass
+class RequestTiming:
+    url: str
+    host: str
+    method: str
+    provider: str = ""
+    product: str = ""
+    # Seconds the response is kept in a state cache, so later runs skip this request.
+    cache_ttl: float = 0.0
+    status: Optional[int] = None
+    attempts: int = 0
+    dns: float = 0.0
+    connect: float = 0.0
+    tls: float = 0.0
+    ttfb: float = 0.0
+    download: float = 0.0
+    total: float = 0.0
+    bytes: int = 0
+    backoff: float = 0.0
+    queued: float = 0.0
+    legacy_ssl: bool = False
+    # The TLS handshake resumed an earlier session instead of a full handshake.
+    tls_resumed: bool = False
+    # Sent on a kept-alive connection of an earlier request (no DNS, connect or TLS).
+    reused: bool = False
+    # Pool proxy of the last attempt (host:port), empty without WEALTH_PROXIES.
+    proxy: str = ""
+    error: Optional[str] = None
+
+
+@dataclass
+class _Aggregate:
+    requests: int = 0
+    errors: int = 0
+    attempts: int = 0
+    bytes: int = 0
+    backoff: float = 0.0
+    queued: float = 0.0
+    legacy_ssl: int = 0
+    tls_resumed: int = 0
+    reused: int = 0
+    latencies: List[float] = field(default_factory=list)
+
+    def add(self, timing: RequestTiming) -> None:
+        self.requests += 1
+        self.attempts += timing.attempts
+        self.bytes += timing.bytes
+        self.backoff += timing.backoff
+        self.queued += timing.queued
+        self.latencies.append(timing.total)
+        if timing.error:
+            self.errors += 1
+        if timing.legacy_ssl:
+            self.legacy_ssl += 1
+        if timing.tls_resumed:
+            self.tls_resumed += 1
+        if timing.reused:
+            self.reused += 1
+
+    def to_dict(self) -> Dict:
+        ordered = sorted(self.latencies)
+        return {
+            "requests": self.requests,
+            "errors": self.errors,
+            "attempts": self.attempts,
+            "bytes": self.bytes,
+            "backoffSeconds": round(self.backoff, 3),
+            "queuedSeconds": round(self.queued, 3),
+            "legacySsl": self.legacy_ssl,
+            "tlsResumed": self.tls_resumed,
+            "connectionsReused": self.reused,
+            "p50": round(percentile(ordered, 50), 4),
+            "p95": round(percentile(ordered, 95), 4),
+            "max": round(ordered[-1], 4) if ordered else 0.0,
+        }
+
+
+_LOCK = threading.Lock()
+_RECORDS: List[RequestTiming] = []
+
+
+def percentile(sorted_values: List[float], pct: float) -> float:
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, -(-len(sorted_values) * pct // 100))
+    return sorted_values[min(int(rank), len(sorted_values)) - 1]
+
+
+def current_provider() -> str:
+    return _CURRENT_PROVIDER.get()
+
+
+@contextmanager
+def provider_scope(name: str):
+    token = _CURRENT_PROVIDER.set(name)
+    try:
+        yield
+    finally:
+        _CURRENT_PROVIDER.reset(token)
+
+
+def current_product() -> str:
+    return _CURRENT_PRODUCT.get()
+
+
+@contextmanager
+def product_scope(url: str):
+    """Attribute requests made inside the block to the catalog product at url."""
+    token = _CURRENT_PRODUCT.set(url)
+    try:
+        yield
+    finally:
+        _CURRENT_PRODUCT.reset(token)
+
+
+def current_cache_ttl() -> float:
+    return _CACHE_TTL.get()
+
+
+@contextmanager
+def cached_scope(ttl: float):
+    """Mark requests made inside the block as loading data cached for ttl seconds."""
+    token = _CACHE_TTL.set(ttl)
+    try:
+        yield
+    finally:
+        _CACHE_TTL.reset(token)
+
+
+def record(timing: RequestTiming) -> None:
+    with _LOCK:
+        _RECORDS.append(timing)
+
+
+def reset() -> None:
+    with _LOCK:
+        _RECORDS.clear()
+
+
+def records() -> List[RequestTiming]:
+    with _LOCK:
+        return list(_RECORDS)
+
+
+def _aggregate(items: Iterable[RequestTiming], key: str) -> Dict[str, Dict]:
+    groups: Dict[str, _Aggregate] = {}
+    for timing in items:
+        name = getattr(timing, key) or "unknown"
+        groups.setdefault(name, _Aggregate()).add(timing)
+    return {name: groups[name].to_dict() for name in sorted(groups)}
+
+
+def summarize() -> Dict[str, Dict]:
+    snapshot = records()
+    return {
+        "hosts": _aggregate(snapshot, "host"),
+        "providers": _aggregate(snapshot, "provider"),
+    }
+
+
+def _prom_label(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def render_prometheus(summary: Dict[str, Dict]) -> str:
+    lines: List[str] = []
+    metrics = (
+        ("requests", "wealth_scraper_http_requests_total", "counter", "HTTP requests issued"),
+        ("errors", "wealth_scraper_http_errors_total", "counter", "HTTP requests that ultimately failed"),
+        ("attempts", "wealth_scraper_http_attempts_total", "counter", "HTTP attempts including retries"),
+        ("bytes", "wealth_scraper_http_response_bytes_total", "counter", "Response bytes downloaded"),
+        ("backoffSeconds", "wealth_scraper_http_backoff_seconds_total", "counter", "Seconds spent in retry backoff"),
+        ("queuedSeconds", "wealth_scraper_http_queued_seconds_total", "counter", "Seconds spent waiting for a host slot"),
+        ("legacySsl", "wealth_scraper_http_legacy_ssl_total", "counter", "Requests that needed the legacy SSL context"),
+        ("tlsResumed", "wealth_scraper_http_tls_resumed_total", "counter", "Requests whose TLS session was resumed"),
+        ("connectionsReused", "wealth_scraper_http_connections_reused_total", "counter", "Requests sent on a kept-alive connection"),
+    )
+    for group, label in (("hosts", "host"), ("providers", "provider")):
+        for key, name, kind, help_text in metrics:
+            metric = f"{name[:-6]}_by_{label}_total" if name.endswith("_total") else name
+            lines.append(f"# HELP {metric} {help_text}, by {label}.")
+            lines.append(f"# TYPE {metric} {kind}")
+            for item, stats in summary[group].items():
+                lines.append(f'{metric}{{{label}="{_prom_label(item)}"}} {stats[key]}')
+        metric = f"wealth_scraper_http_latency_seconds_by_{label}"
+        lines.append(f"# HELP {metric} HTTP request latency, by {label}.")
+        lines.append(f"# TYPE {metric} gauge")
+        for item, stats in summary[group].items():
+            for quantile in ("p50", "p95"):
+                lines.append(
+                    f'{metric}{{{label}="{_prom_label(item)}",quantile="0.{quantile[1:]}"}} {stats[quantile]}'
+                )
+    return "\n".join(lines) + "\n"
+
+
+def _product_requests(items: Iterable[RequestTiming]) -> Dict[str, Dict]:
+    """Requests per product, with how many of them load data cached for each TTL (seconds)."""
+    products: Dict[str, Dict] = {}
+    for timing in items:
+        if not timing.product:
+            continue
+        entry = products.setdefault(timing.product, {"provider": timing.provider, "requests": 0})
+        entry["requests"] += 1
+        if timing.cache_ttl:
+            cached = entry.setdefault("cached", {})
+            ttl = str(int(timing.cache_ttl))
+            cached[ttl] = cached.get(ttl, 0) + 1
+    return products
+
+
+def _report_limit() -> Optional[int]:
+    value = (os.environ.get("WEALTH_REPORT_REQUESTS") or "").strip().lower()
+    if value == "all":
+        return None
+    try:
+        return max(0, int(value)) if value else _REPORT_REQUESTS
+    except ValueError:
+        return _REPORT_REQUESTS
+
+
+def _notable_requests(items: List[RequestTiming], limit: Optional[int]) -> List[RequestTiming]:
+    """Every failed request and the limit slowest (all with limit None), in the order they were made."""
+    if limit is None:
+        return list(items)
+    slowest = {id(timing) for timing in heapq.nlargest(limit, items, key=lambda timing: timing.total)}
+    return [timing for timing in items if timing.error or id(timing) in slowest]
+
+
+def write_run_report(output_dir: Path, extra: Optional[Dict] = None) -> Dict[str, Dict]:
+    """Write run_report.json and a Prometheus textfile into output_dir."""
+    snapshot = records()
+    summary = summarize()
+    kept = _notable_requests(snapshot, _report_limit())
+    report = {
+        "generatedAt": dt.datetime.now(dt.timezone.utc).replace(microsecond=0).isoformat(),
+        **summary,
+        "products": _product_requests(snapshot),
+        "requests": [asdict(timing) for timing in kept],
+        "requestsOmitted": len(snapshot) - len(kept),
+    }
+    if extra:
+        report.update(extra)
+    output_dir.mkdir(parents=True, exist_ok=True)
+    (output_dir / RUN_REPORT_NAME).write_bytes(codec.dumps(report, indent=True))
+    (output_dir / PROMETHEUS_NAME).write_text(render_prometheus(summary), encoding="utf-8")
+    return summary
@@ -0,0 +1,147 @@
+"""Typed records: catalog targets read from the links files and the products every provider returns.
+
+``Product.to_dict`` is the one serializer behind ``wealth.json``: keys come out in a
+fixed order, provider-specific identifiers are omitted when a provider does not
+have them, and ``validate`` rejects malformed records before they are written.
+"""
+
+from __future__ import annotations
+
+import math
+import sys
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional
+
+from .utils import normalize_returns
+
+# Slotted dataclasses need Python 3.10; older runtimes get regular ones.
+_SLOTS: Dict[str, Any] = {"slots": True} if sys.version_info >= (3, 10) else {}
+
+PRODUCT_TYPES = ("wealth", "fund")
+
+
+@dataclass(**_SLOTS)
+class Target:
+    """One catalog entry after normalization, with its site's defaults already applied."""
+
+    url: str
+    scraper: Optional[str] = None
+    retries: Optional[int] = None
+    sales_channels: Optional[List[str]] = None
+    limits: Optional[Dict[str, Any]] = None
+
+
+@dataclass(**_SLOTS)
+class Returns:
+    """Annualised returns (percent) over the 1/3/6-month windows; missing values are 0.0."""
+
+    one_month: float = 0.0
+    three_month: float = 0.0
+    six_month: float = 0.0
+
+    @classmethod
+    def from_values(cls, values: Dict[str, Optional[float]]) -> "Returns":
+        normalized = normalize_returns(values)
+        return cls(normalized["1m"], normalized["3m"], normalized["6m"])
+
+    def to_dict(self) -> Dict[str, float]:
+        return {"1m": self.one_month, "3m": self.three_month, "6m": self.six_month}
+
+
+@dataclass(**_SLOTS)
+class Product:
+    name: str
+    code: str
+    issuer: str
+    banks: List[str]
+    currency: str
+    min_hold_days: Optional[int]
+    risk_level: str
+    returns: Returns
+    url: str
+    type: str = "wealth"
+    registration_code: Optional[str] = None
+    fund_code: Optional[str] = None
+    real_product_code: Optional[str] = None
+    sub_share_code: Optional[str] = None
+    saa_code: Optional[str] = None
+    fun_code: Optional[str] = None
+    nav_date: str = ""
+    id: str = ""
+    updated_at: str = ""
+    last_checked_at: str = ""
+
+    def validate(self) -> None:
+        if not self.url:
+            raise ValueError("product has no url")
+        for label in ("name", "code", "issuer", "currency", "risk_level"):
+            if not isinstance(getattr(self, label), str):
+                raise ValueError(f"{self.url}: {label} must be a string")
+        if not isinstance(self.banks, list) or not all(isinstance(bank, str) and bank for bank in self.banks):
+            raise ValueError(f"{self.url}: banks must be a list of non-empty strings")
+        if self.min_hold_days is not None and (not isinstance(self.min_hold_days, int) or self.min_hold_days < 0):
+            raise ValueError(f"{self.url}: minHoldDays must be a non-negative integer")
+        if self.type not in PRODUCT_TYPES:
+            raise ValueError(f"{self.url}: unknown product type {self.type!r}")
+        for value in (self.returns.one_month, self.returns.three_month, self.returns.six_month):
+            if not isinstance(value, float) or not math.isfinite(value):
+                raise ValueError(f"{self.url}: returns must be finite floats")
+
+    def to_dict(self) -> Dict[str, Any]:
+        data: Dict[str, Any] = {"name": self.name, "code": self.code}
+        for key, value in (
+            ("registrationCode", self.registration_code),
+            ("fundCode", self.fund_code),
+            ("realProductCode", self.real_product_code),
+            ("subShareCode", self.sub_share_code),
+            ("saaCode", self.saa_code),
+            ("funCode", self.fun_code),
+        ):
+            if value is not None:
+                data[key] = value
+        data.update(
+            issuer=self.issuer,
+            banks=self.banks,
+            currency=self.currency,
+            minHoldDays=self.min_hold_days,
+            riskLevel=self.risk_level,
+            returns=self.returns.to_dict(),
+            url=self.url,
+            type=self.type,
+        )
+        if self.nav_date:
+            data["navDate"] = self.nav_date
+        if self.id:
+            data["id"] = self.id
+        if self.updated_at:
+            data["updatedAt"] = self.updated_at
+        if self.last_checked_at:
+            data["lastCheckedAt"] = self.last_checked_at
+        return data
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "Product":
+        """Inverse of to_dict, for records read back from a previous output file."""
+        returns = data.get("returns") or {}
+        return cls(
+            name=data.get("name") or "",
+            code=data.get("code") or "",
+            issuer=data.get("issuer") or "",
+            banks=list(data.get("banks") or []),
+            currency=data.get("currency") or "",
+            min_hold_days=data.get("minHoldDays"),
+            risk_level=data.get("riskLevel") or "",
+            returns=Returns.from_values({key: returns.get(key) for key in ("1m", "3m", "6m")}),
+            url=data.get("url") or "",
+            type=data.get("type") or "wealth",
+            registration_code=data.get("registrationCode"),
+            fund_code=data.get("fundCode"),
+            real_product_code=data.get("realProductCode"),
+            sub_share_code=data.get("subShareCode"),
+            saa_code=data.get("saaCode"),
+            fun_code=data.get("funCode"),
+            nav_date=data.get("navDate") or "",
+            id=data.get("id") or "",
+            updated_at=data.get("updatedAt") or "",
+            last_checked_at=data.get("lastCheckedAt") or "",
+        )
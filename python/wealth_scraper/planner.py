@@ -0,0 +1,218 @@
+"""Run planning: predicted HTTP calls and wall time for a catalog, without running it.
+
+Per product the planner expects as many requests as it made in the last run
+(``products`` in ``run_report.json`` counts them per product), minus those whose
+responses are still cached (metadata, the chinawealth index), else the average
+of its provider in that run, else a cold-cache count from how each provider
+fetches (metadata, NAV pages, signing round-trips). cmb and chinawealth requests
+each cost about one ``openssl`` call for signing.
+
+A product takes as long as it did in earlier runs (the scheduler's ``timings``
+state), or its requests times the host's median latency from the last run report
+plus the signing calls. Serial time adds all products up. Concurrent time is the
+slowest host: its products spread over the host's concurrency, paced by its
+``rps``; it also stays above the serial time over ``WEALTH_WORKERS`` and above
+the signing work spread over the CPUs. Hosts, providers and the run as a whole
+are flagged when they are expected to exceed the function timeout.
+"""
+
+from __future__ import annotations
+
+import datetime as dt
+import os
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional
+
+from . import cache, codec, scheduler
+from .catalog import load_targets
+from .logger import get_logger
+from .metrics import RUN_REPORT_NAME
+from .models import Target
+from .scraper import _detect_scraper
+
+_log = get_logger("planner")
+
+# The Lambda and FC deploy scripts both configure 60 seconds.
+DEFAULT_TIMEOUT = 60.0
+
+# Requests per product with nothing cached yet.
+_COLD_REQUESTS: Dict[str, int] = {
+    "wealthccb": 1,
+    "cibwm": 3,
+    "bocomm": 3,
+    "spdb": 2,
+    "chinawealth": 4,
+    "cmb": 3,
+}
+# cmb signs every request with one openssl call; chinawealth signs every other
+# request (getInitData is not signed) with two, so both average one per request.
+_SIGNED = frozenset({"cmb", "chinawealth"})
+_SIGN_SECONDS = 0.025
+_DEFAULT_LATENCY = 0.5
+
+
+@dataclass
+class History:
+    """What the last run report says about request counts and latencies."""
+
+    product_requests: Dict[str, int]
+    provider_requests: Dict[str, float]
+    host_latency: Dict[str, float]
+    provider_latency: Dict[str, float]
+    source: Optional[str] = None
+
+
+def load_history(report_dir: Path, now: Optional[float] = None) -> History:
+    path = Path(report_dir) / RUN_REPORT_NAME
+    history = History({}, {}, {}, {})
+    try:
+        report = codec.loads(path.read_bytes())
+    except FileNotFoundError:
+        return history
+    except (OSError, codec.JSONDecodeError) as exc:
+        _log.warning("[planner] ignoring unreadable %s: %s", path, exc)
+        return history
+    if not isinstance(report, dict):
+        return history
+    history.source = str(path)
+    try:
+        age = (now if now is not None else time.time()) - dt.datetime.fromisoformat(report["generatedAt"]).timestamp()
+    except (KeyError, TypeError, ValueError):
+        age = float("inf")
+    products: Dict[str, Dict[str, int]] = {}
+    summary = report.get("products")
+    if isinstance(summary, dict):
+        for product, item in summary.items():
+            if not isinstance(item, dict):
+                continue
+            # Responses that are still cached will not be requested again.
+            cached = sum(
+                count for ttl, count in (item.get("cached") or {}).items() if cache.enabled() and age < float(ttl)
+            )
+            products.setdefault(item.get("provider") or "", {})[product] = int(item.get("requests") or 0) - cached
+    else:
+        # Reports from before the per-product counts list every request instead.
+        for item in report.get("requests") or []:
+            if not isinstance(item, dict) or not item.get("product"):
+                continue
+            counts = products.setdefault(item.get("provider") or "", {})
+            counts.setdefault(item["product"], 0)
+            if not (cache.enabled() and age < (item.get("cache_ttl") or 0)):
+                counts[item["product"]] += 1
+    for provider, counts in products.items():
+        history.product_requests.update(counts)
+        if provider:
+            history.provider_requests[provider] = sum(counts.values()) / len(counts)
+    for key, target in (("hosts", history.host_latency), ("providers", history.provider_latency)):
+        for name, stats in (report.get(key) or {}).items():
+            if isinstance(stats, dict) and stats.get("p50"):
+                target[name] = float(stats["p50"])
+    return history
+
+
+@dataclass
+class _Load:
+    products: int = 0
+    requests: int = 0
+    signing: int = 0
+    serial: float = 0.0
+    longest: float = 0.0
+    concurrent: float = 0.0
+
+    def add(self, requests: int, signing: int, seconds: float) -> None:
+        self.products += 1
+        self.requests += requests
+        self.signing += signing
+        self.serial += seconds
+        self.longest = max(self.longest, seconds)
+
+    def to_dict(self, timeout: float) -> Dict:
+        return {
+            "products": self.products,
+            "requests": self.requests,
+            "signingCalls": self.signing,
+            "serialSeconds": round(self.serial, 1),
+            "concurrentSeconds": round(self.concurrent, 1),
+            "exceedsTimeout": self.concurrent > timeout,
+        }
+
+
+def _host_concurrency(limits: Optional[Dict]) -> int:
+    fixed = os.environ.get("WEALTH_HOST_CONCURRENCY")
+    value = int(fixed) if fixed else int(float(os.environ.get("WEALTH_HOST_CONCURRENCY_MAX") or 8))
+    if limits and limits.get("maxConcurrency"):
+        value = min(value, limits["maxConcurrency"])
+    return max(1, value)
+
+
+def _provider(target: Target) -> str:
+    try:
+        return target.scraper or _detect_scraper(target.url)
+    except RuntimeError:
+        return "unknown"
+
+
+def estimate(targets: Iterable[Target], history: History, *, timeout: float = DEFAULT_TIMEOUT) -> Dict:
+    """Predicted requests, signing calls and wall time per host, per provider and overall."""
+    targets = list(targets)
+    jobs = scheduler.plan([scheduler.Job(index, target.url) for index, target in enumerate(targets)])
+    hosts: Dict[str, _Load] = {}
+    host_info: Dict[str, Dict] = {}
+    providers: Dict[str, _Load] = {}
+    provider_hosts: Dict[str, set] = {}
+    total = _Load()
+    for job in sorted(jobs, key=lambda job: job.index):
+        target = targets[job.index]
+        provider = _provider(target)
+        requests = history.product_requests.get(target.url)
+        if requests is None:
+            requests = round(history.provider_requests.get(provider) or _COLD_REQUESTS.get(provider, 1))
+        signing = requests if provider in _SIGNED else 0
+        latency = history.host_latency.get(job.host) or history.provider_latency.get(provider) or _DEFAULT_LATENCY
+        seconds = job.estimate or requests * latency + signing * _SIGN_SECONDS
+        for load in (hosts.setdefault(job.host, _Load()), providers.setdefault(provider, _Load()), total):
+            load.add(requests, signing, seconds)
+        provider_hosts.setdefault(provider, set()).add(job.host)
+        info = host_info.setdefault(job.host, {"provider": provider, "latency": latency, "limits": None})
+        info["limits"] = info["limits"] or target.limits
+
+    for host, load in hosts.items():
+        limits = host_info[host]["limits"] or {}
+        concurrency = _host_concurrency(limits)
+        load.concurrent = max(load.serial / concurrency, load.longest)
+        if limits.get("rps"):
+            load.concurrent = max(load.concurrent, load.requests / limits["rps"])
+        host_info[host].update(concurrency=concurrency, rps=limits.get("rps"))
+    for name, load in providers.items():
+        load.concurrent = max(hosts[host].concurrent for host in provider_hosts[name])
+
+    total.concurrent = max(
+        [load.concurrent for load in hosts.values()]
+        + [total.serial / scheduler.workers(), total.signing * _SIGN_SECONDS / (os.cpu_count() or 1)]
+    )
+    return {
+        **total.to_dict(timeout),
+        "timeoutSeconds": timeout,
+        "history": history.source,
+        "providers": {name: providers[name].to_dict(timeout) for name in sorted(providers)},
+        "hosts": {
+            host: {
+                "provider": host_info[host]["provider"],
+                "latency": round(host_info[host]["latency"], 4),
+                "concurrency": host_info[host]["concurrency"],
+                "rps": host_info[host]["rps"],
+                **hosts[host].to_dict(timeout),
+            }
+            for host in sorted(hosts)
+        },
+    }
+
+
+def plan_run(links: List[Path], report_dir: Path, *, timeout: float = DEFAULT_TIMEOUT) -> Dict:
+    """estimate() for the catalogs at links (loaded with ``load_targets``) run together."""
+    targets: List[Target] = []
+    for path in links:
+        targets.extend(load_targets(Path(path)))
+    return estimate(targets, load_history(report_dir), timeout=timeout)
@@ -0,0 +1,239 @@
+"""Opt-in CPU/memory profiling of scrape runs, per provider and per product.
+
+Each product is run under its own ``cProfile`` profiler, and ``tracemalloc`` records
+the peak traced memory while it runs. Stats are merged per provider and written to
+the report directory as ``profile/<provider>.pstats`` and ``<provider>.collapsed``.
+``profile/all.collapsed`` has every provider under its own root frame. The
+collapsed-stack files are in the format used by ``flamegraph.pl``/speedscope.
+cProfile only records caller/callee edges, so stacks are rebuilt from the call graph
+and time is split between callers in proportion to their share of each callee.
+
+Enable with ``--profile`` or ``WEALTH_PROFILE=1``. ``WEALTH_PROFILE_TOP`` sets how many
+products/functions the run summary lists (default 10). tracemalloc is process-wide,
+so per-product peaks are only exact while products are scraped one at a time.
+"""
+
+from __future__ import annotations
+
+import cProfile
+import os
+import pstats
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from .metrics import current_provider
+
+PROFILE_DIR_NAME = "profile"
+
+_MAX_STACK_DEPTH = 64
+# Stacks below this share of the total are dropped, which bounds the number of paths.
+_MIN_STACK_SHARE = 1e-5
+
+_ENABLED = False
+_STARTED_TRACEMALLOC = False
+_LOCK = threading.Lock()
+_PROVIDER_STATS: Dict[str, pstats.Stats] = {}
+
+
+@dataclass
+class ProductProfile:
+    url: str
+    provider: str
+    seconds: float
+    peak_bytes: int
+    error: Optional[str] = None
+
+
+_PRODUCTS: List[ProductProfile] = []
+
+
+def enabled() -> bool:
+    return _ENABLED
+
+
+def env_enabled() -> bool:
+    return os.environ.get("WEALTH_PROFILE", "").strip().lower() in ("1", "true", "yes", "on")
+
+
+def start() -> None:
+    global _ENABLED, _STARTED_TRACEMALLOC
+    with _LOCK:
+        _PROVIDER_STATS.clear()
+        _PRODUCTS.clear()
+    if not tracemalloc.is_tracing():
+        tracemalloc.start()
+        _STARTED_TRACEMALLOC = True
+    _ENABLED = True
+
+
+def stop() -> None:
+    global _ENABLED, _STARTED_TRACEMALLOC
+    _ENABLED = False
+    if _STARTED_TRACEMALLOC:
+        tracemalloc.stop()
+        _STARTED_TRACEMALLOC = False
+
+
+@contextmanager
+def session(enable: bool) -> Iterator[None]:
+    if not enable:
+        yield
+        return
+    start()
+    try:
+        yield
+    finally:
+        stop()
+
+
+@contextmanager
+def product(url: str) -> Iterator[None]:
+    """Profile one product scrape; a no-op unless profiling is on."""
+    if not _ENABLED:
+        yield
+        return
+    tracemalloc.reset_peak()
+    started = time.perf_counter()
+    profiler: Optional[cProfile.Profile] = cProfile.Profile()
+    try:
+        profiler.enable()
+    except ValueError:
+        # Another profiler (e.g. `python -m cProfile`) owns this thread; keep the memory numbers.
+        profiler = None
+    error: Optional[str] = None
+    try:
+        yield
+    except BaseException as exc:
+        error = f"{type(exc).__name__}: {exc}"
+        raise
+    finally:
+        if profiler is not None:
+            profiler.disable()
+        elapsed = time.perf_counter() - started
+        peak = tracemalloc.get_traced_memory()[1] if tracemalloc.is_tracing() else 0
+        _collect(url, profiler, elapsed, peak, error)
+
+
+def _collect(url: str, profiler: Optional[cProfile.Profile], elapsed: float, peak: int, error: Optional[str]) -> None:
+    provider = current_provider() or "unknown"
+    stats = pstats.Stats(profiler) if profiler is not None and profiler.getstats() else None
+    with _LOCK:
+        _PRODUCTS.append(ProductProfile(url, provider, elapsed, peak, error))
+        if stats is None:
+            return
+        merged = _PROVIDER_STATS.get(provider)
+        if merged is None:
+            _PROVIDER_STATS[provider] = stats
+        else:
+            merged.add(stats)
+
+
+def _frame_label(func: Tuple[str, int, str]) -> str:
+    filename, lineno, name = func
+    if filename == "~":
+        return name.replace(";", ":")
+    return f"{name} ({os.path.basename(filename)}:{lineno})".replace(";", ":")
+
+
+def collapse(stats: pstats.Stats) -> Dict[str, int]:
+    """Rebuild collapsed stacks (frame;frame;... -> microseconds) from a cProfile call graph."""
+    entries = stats.stats  # type: ignore[attr-defined]
+    stacks: Dict[str, float] = {}
+    cutoff = max(1.0, sum(entry[2] for entry in entries.values()) * 1_000_000 * _MIN_STACK_SHARE)
+
+    def walk(func, path: List[Tuple[str, int, str]], micros: float) -> None:
+        callers = entries.get(func, (0, 0, 0.0, 0.0, {}))[4]
+        callers = {caller: edge for caller, edge in callers.items() if caller not in path}
+        if not callers or len(path) >= _MAX_STACK_DEPTH:
+            key = ";".join(_frame_label(frame) for frame in reversed(path))
+            stacks[key] = stacks.get(key, 0.0) + micros
+            return
+        total = sum(edge[3] for edge in callers.values())
+        counts = sum(edge[1] for edge in callers.values())
+        for caller, edge in callers.items():
+            share = edge[3] / total if total > 0 else (edge[1] / counts if counts else 1 / len(callers))
+            if micros * share >= cutoff:
+                walk(caller, path + [caller], micros * share)
+
+    for func, (_, _, tottime, _, _) in entries.items():
+        micros = tottime * 1_000_000
+        if micros >= cutoff:
+            walk(func, [func], micros)
+    return {key: int(round(value)) for key, value in stacks.items() if value >= 0.5}
+
+
+def _collapsed_lines(stacks: Dict[str, int], root: str | None = None) -> List[str]:
+    prefix = f"{root};" if root else ""
+    return [f"{prefix}{key} {value}\n" for key, value in sorted(stacks.items())]
+
+
+def summarize(top: int | None = None) -> Dict:
+    if top is None:
+        top = int(os.environ.get("WEALTH_PROFILE_TOP") or 10)
+    with _LOCK:
+        products = list(_PRODUCTS)
+        provider_stats = dict(_PROVIDER_STATS)
+
+    providers: Dict[str, Dict] = {}
+    for item in products:
+        entry = providers.setdefault(item.provider, {"products": 0, "seconds": 0.0, "peakKb": 0})
+        entry["products"] += 1
+        entry["seconds"] += item.seconds
+        entry["peakKb"] = max(entry["peakKb"], item.peak_bytes // 1024)
+    for entry in providers.values():
+        entry["seconds"] = round(entry["seconds"], 4)
+
+    functions = []
+    for provider, stats in provider_stats.items():
+        for func, (_, calls, tottime, cumtime, _) in stats.stats.items():  # type: ignore[attr-defined]
+            functions.append(
+                {
+                    "function": _frame_label(func),
+                    "provider": provider,
+                    "calls": calls,
+                    "tottime": round(tottime, 4),
+                    "cumtime": round(cumtime, 4),
+                }
+            )
+    functions.sort(key=lambda item: item["tottime"], reverse=True)
+
+    slowest = sorted(products, key=lambda item: item.seconds, reverse=True)[:top]
+    return {
+        "providers": providers,
+        "products": [
+            {
+                "url": item.url,
+                "provider": item.provider,
+                "seconds": round(item.seconds, 4),
+                "peakKb": item.peak_bytes // 1024,
+                **({"error": item.error} if item.error else {}),
+            }
+            for item in slowest
+        ],
+        "functions": functions[:top],
+    }
+
+
+def write_profiles(output_dir: Path, top: int | None = None) -> Dict:
+    """Write pstats and collapsed stacks under output_dir/profile and return the top-N summary."""
+    directory = output_dir / PROFILE_DIR_NAME
+    directory.mkdir(parents=True, exist_ok=True)
+    with _LOCK:
+        provider_stats = dict(_PROVIDER_STATS)
+
+    combined: List[str] = []
+    for provider, stats in sorted(provider_stats.items()):
+        stats.dump_stats(str(directory / f"{provider}.pstats"))
+        stacks = collapse(stats)
+        (directory / f"{provider}.collapsed").write_text("".join(_collapsed_lines(stacks)), encoding="utf-8")
+        combined.extend(_collapsed_lines(stacks, root=provider))
+    (directory / "all.collapsed").write_text("".join(combined), encoding="utf-8")
+
+    summary = summarize(top)
+    summary["dir"] = str(directory)
+    return summary
@@ -3,6 +3,7 @@ from __future__ import annotations
 from .bocomm import fetch as fetch_bocomm
 from .cibwm import fetch as fetch_cibwm
 from .chinawealth import fetch as fetch_chinawealth
+from .chinawealth import prefetch as prefetch_chinawealth
 from .cmb import fetch as fetch_cmb
 from .spdb import fetch as fetch_spdb
 from .wealthccb import fetch as fetch_wealthccb
@@ -14,4 +15,5 @@ __all__ = [
     "fetch_cmb",
     "fetch_spdb",
     "fetch_wealthccb",
+    "prefetch_chinawealth",
 ]
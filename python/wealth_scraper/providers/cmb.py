@@ -1,56 +1,66 @@
 from __future__ import annotations
 
+import asyncio
 import base64
-import json
 import re
-import subprocess
 import time
 import uuid
 from typing import Dict, List, Optional, Tuple
 from urllib.parse import parse_qs, urlparse
 
 from ..config import CMB_SA_BANK_OVERRIDES
-from ..http import fetch_json
-from ..logger import debug_log
+from .. import cache, codec
+from ..http import afetch_json
+from ..logger import get_logger
+from ..models import Product, Returns
+from ..tracing import span, traced
 from ..utils import (
     compute_window_return_with_details,
-    normalize_returns,
+    latest_nav_date,
     parse_date,
     parse_min_hold_days,
     strip_company_suffix,
 )
 
+_log = get_logger("cmb")
+
 _BASE_URL = "https://cfweb.paas.cmbchina.com/api"
 _APP_ID = "LB50.22_CFWebUI"
 _AUTH_SN_B64 = "NXF3QkdqdTczSkFYaWQ0RA=="
 _AUTH_SN_HEX = base64.b64decode(_AUTH_SN_B64).hex()
 
+_METADATA_FIELDS = ("detail", "info")
+_DETAIL_FIELDS = ("prdBrief", "prdCode", "defMaaCod", "regcode")
+_DETAIL_INFO_FIELDS = ("prdName", "comNam", "risk", "regCode", "currency", "term")
+
 
 def _to_json_bytes(payload: Dict) -> bytes:
-    return json.dumps(payload, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+    return codec.dumps(payload)
 
 
-def _sm4_ecb_signature(plaintext: str) -> str:
+async def _sm4_ecb_signature(plaintext: str) -> str:
     try:
-        output = subprocess.run(
-            ["openssl", "enc", "-sm4-ecb", "-K", _AUTH_SN_HEX, "-nosalt", "-base64", "-A"],
-            input=plaintext.encode("utf-8"),
-            capture_output=True,
-            check=True,
+        process = await asyncio.create_subprocess_exec(
+            "openssl", "enc", "-sm4-ecb", "-K", _AUTH_SN_HEX, "-nosalt", "-base64", "-A",
+            stdin=asyncio.subprocess.PIPE,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.PIPE,
         )
     except FileNotFoundError as exc:
         raise RuntimeError("openssl not found; required for cmb signing") from exc
-    except subprocess.CalledProcessError as exc:
-        raise RuntimeError(f"cmb signing failed: {exc.stderr.decode('utf-8', errors='ignore')}") from exc
-    signature = output.stdout.decode("utf-8").strip()
+    stdout, stderr = await process.communicate(plaintext.encode("utf-8"))
+    if process.returncode:
+        raise RuntimeError(f"cmb signing failed: {stderr.decode('utf-8', errors='ignore')}")
+    signature = stdout.decode("utf-8").strip()
     if not signature:
         raise RuntimeError("cmb signature empty")
     return signature
 
 
-def _build_headers() -> Dict[str, str]:
+@traced("sign")
+async def _build_headers() -> Dict[str, str]:
     ts = str(int(time.time() * 1000))
-    signature = _sm4_ecb_signature(f"{_APP_ID}|{ts}")
+    signature = await _sm4_ecb_signature(f"{_APP_ID}|{ts}")
     return {
         "Content-Type": "application/json",
         "appId": _APP_ID,
@@ -60,13 +70,15 @@ def _build_headers() -> Dict[str, str]:
     }
 
 
-def _post(endpoint: str, payload: Dict) -> Dict:
-    return fetch_json(
-        f"{_BASE_URL}/{endpoint}",
-        method="POST",
-        data=_to_json_bytes(payload),
-        headers=_build_headers(),
-    )
+async def _post(endpoint: str, payload: Dict) -> Dict:
+    headers = await _build_headers()
+    with span("fetch", endpoint=endpoint.split("?")[0]):
+        return await afetch_json(
+            f"{_BASE_URL}/{endpoint}",
+            method="POST",
+            data=_to_json_bytes(payload),
+            headers=headers,
+        )
 
 
 def _parse_risk_level(text: str) -> str:
@@ -88,7 +100,22 @@ def _parse_risk_level(text: str) -> str:
     return ""
 
 
-def fetch(url: str) -> Dict:
+async def _fetch_metadata(saa_cod: str, fun_cod: str) -> Dict:
+    detail, detail_info = await asyncio.gather(
+        _post(f"ProductInfo/getSAProductDetail?funCod={fun_cod}&saaCod={saa_cod}", {}),
+        _post(f"ProductInfo/getSAProductDetailInfo?saaCod={saa_cod}&funCod={fun_cod}", {}),
+    )
+    detail_body = detail.get("body") or {}
+    detail_info_body = detail_info.get("body") or {}
+    if not detail_body and not detail_info_body:
+        return {}
+    return {
+        "detail": {field: detail_body[field] for field in _DETAIL_FIELDS if field in detail_body},
+        "info": {field: detail_info_body[field] for field in _DETAIL_INFO_FIELDS if field in detail_info_body},
+    }
+
+
+async def fetch(url: str) -> Product:
     parsed = urlparse(url)
     query = parse_qs(parsed.query)
     saa_cod = query.get("saaCod", [""])[0].strip()
@@ -96,55 +123,83 @@ def fetch(url: str) -> Dict:
     if not saa_cod or not fun_cod:
         raise RuntimeError(f"Missing saaCod/funCod in {url}")
 
-    detail = _post(f"ProductInfo/getSAProductDetail?funCod={fun_cod}&saaCod={saa_cod}", {})
-    detail_info = _post(f"ProductInfo/getSAProductDetailInfo?saaCod={saa_cod}&funCod={fun_cod}", {})
-    value = _post(
-        "ProductValue/getSAValueByPage",
-        {"funCod": fun_cod, "saaCod": saa_cod, "pageNum": 1, "pageSize": 200},
+    metadata, value = await asyncio.gather(
+        cache.metadata(
+            f"cmb:{saa_cod}|{fun_cod}",
+            lambda: _fetch_metadata(saa_cod, fun_cod),
+            _METADATA_FIELDS,
+        ),
+        _post(
+            "ProductValue/getSAValueByPage",
+            {"funCod": fun_cod, "saaCod": saa_cod, "pageNum": 1, "pageSize": 200},
+        ),
     )
 
-    detail_body = detail.get("body") or {}
-    detail_info_body = detail_info.get("body") or {}
+    detail_body = metadata.get("detail") or {}
+    detail_info_body = metadata.get("info") or {}
     value_body = value.get("body") or {}
     rows = value_body.get("data") or []
     total_record = int(value_body.get("totalRecord") or len(rows) or 0)
 
-    page_num = 2
-    while len(rows) < total_record:
-        page_resp = _post(
-            "ProductValue/getSAValueByPage",
-            {"funCod": fun_cod, "saaCod": saa_cod, "pageNum": page_num, "pageSize": 200},
+    # totalRecord and the size of the first page tell how many pages remain (up to
+    # page 20); fetch them together.
+    last_page = 1
+    if rows and len(rows) < total_record:
+        last_page = min(20, -(-total_record // len(rows)))
+    pages = await asyncio.gather(
+        *(
+            _post(
+                "ProductValue/getSAValueByPage",
+                {"funCod": fun_cod, "saaCod": saa_cod, "pageNum": page_num, "pageSize": 200},
+            )
+            for page_num in range(2, last_page + 1)
         )
+    )
+    for page_resp in pages:
         page_rows = (page_resp.get("body") or {}).get("data") or []
         if not page_rows:
             break
         rows.extend(page_rows)
-        page_num += 1
-        if page_num > 20:
-            break
 
     series: List[Tuple] = []
-    for item in rows:
-        date_value = parse_date(item.get("znavDat"))
-        nav_value = item.get("znavVal") or item.get("znavCtl")
-        if date_value and nav_value:
-            series.append((date_value, float(nav_value)))
-
-    return_1m, start_1m, start_val_1m, end_1m, end_val_1m = compute_window_return_with_details(series, 30)
-    return_3m, start_3m, start_val_3m, end_3m, end_val_3m = compute_window_return_with_details(series, 90)
-    return_6m, start_6m, start_val_6m, end_6m, end_val_6m = compute_window_return_with_details(series, 180)
-
-    debug_log(
-        f"[calc][cmb] {fun_cod}/{saa_cod} 1m from NAV "
-        f"start={start_1m} nav={start_val_1m} end={end_1m} nav={end_val_1m} -> {return_1m}"
+    with span("parse", rows=len(rows)):
+        for item in rows:
+            date_value = parse_date(item.get("znavDat"))
+            nav_value = item.get("znavVal") or item.get("znavCtl")
+            if date_value and nav_value:
+                series.append((date_value, float(nav_value)))
+
+    with span("compute", points=len(series)):
+        return_1m, start_1m, start_val_1m, end_1m, end_val_1m = compute_window_return_with_details(series, 30)
+        return_3m, start_3m, start_val_3m, end_3m, end_val_3m = compute_window_return_with_details(series, 90)
+        return_6m, start_6m, start_val_6m, end_6m, end_val_6m = compute_window_return_with_details(series, 180)
+
+    _log.debug(
+        "[calc][cmb] %s/%s 1m from NAV start=%s nav=%s end=%s nav=%s -> %s",
+        fun_cod, saa_cod,
+        start_1m,
+        start_val_1m,
+        end_1m,
+        end_val_1m,
+        return_1m,
     )
-    debug_log(
-        f"[calc][cmb] {fun_cod}/{saa_cod} 3m from NAV "
-        f"start={start_3m} nav={start_val_3m} end={end_3m} nav={end_val_3m} -> {return_3m}"
+    _log.debug(
+        "[calc][cmb] %s/%s 3m from NAV start=%s nav=%s end=%s nav=%s -> %s",
+        fun_cod, saa_cod,
+        start_3m,
+        start_val_3m,
+        end_3m,
+        end_val_3m,
+        return_3m,
     )
-    debug_log(
-        f"[calc][cmb] {fun_cod}/{saa_cod} 6m from NAV "
-        f"start={start_6m} nav={start_val_6m} end={end_6m} nav={end_val_6m} -> {return_6m}"
+    _log.debug(
+        "[calc][cmb] %s/%s 6m from NAV start=%s nav=%s end=%s nav=%s -> %s",
+        fun_cod, saa_cod,
+        start_6m,
+        start_val_6m,
+        end_6m,
+        end_val_6m,
+        return_6m,
     )
 
     banks = CMB_SA_BANK_OVERRIDES.get(f"{saa_cod}|{fun_cod}") or ["招商银行"]
@@ -153,25 +208,25 @@ def fetch(url: str) -> Dict:
     risk_text = detail_info_body.get("risk") or ""
     reg_code = detail_info_body.get("regCode") or detail_body.get("regcode") or ""
 
-    return {
-        "name": name,
-        "code": reg_code or detail_body.get("prdCode") or fun_cod,
-        "registrationCode": reg_code,
-        "realProductCode": detail_body.get("prdCode") or fun_cod,
-        "issuer": issuer,
-        "banks": banks,
-        "currency": detail_info_body.get("currency") or "",
-        "minHoldDays": parse_min_hold_days(detail_info_body.get("term") or name),
-        "riskLevel": _parse_risk_level(risk_text),
-        "returns": normalize_returns(
+    return Product(
+        name=name,
+        code=reg_code or detail_body.get("prdCode") or fun_cod,
+        registration_code=reg_code,
+        real_product_code=detail_body.get("prdCode") or fun_cod,
+        issuer=issuer,
+        banks=banks,
+        currency=detail_info_body.get("currency") or "",
+        min_hold_days=parse_min_hold_days(detail_info_body.get("term") or name),
+        risk_level=_parse_risk_level(risk_text),
+        returns=Returns.from_values(
             {
                 "1m": return_1m,
                 "3m": return_3m,
                 "6m": return_6m,
             }
         ),
-        "url": url,
-        "type": "wealth",
-        "saaCode": saa_cod,
-        "funCode": fun_cod,
-    }
+        url=url,
+        saa_code=saa_cod,
+        fun_code=fun_cod,
+        nav_date=latest_nav_date(series),
+    )
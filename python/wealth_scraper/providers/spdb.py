@@ -1,16 +1,23 @@
 from __future__ import annotations
 
-import json
+import asyncio
 from typing import Dict, List, Tuple
 from urllib.parse import parse_qs, urlparse
 
 from ..config import SPDB_BANKS, SPDB_ISSUER, SPDB_MIN_HOLD_DAYS
-from ..http import fetch_json
-from ..logger import debug_log
-from ..utils import compute_window_return_with_details, normalize_returns, parse_date
+from .. import cache, codec
+from ..http import afetch_json
+from ..logger import get_logger
+from ..models import Product, Returns
+from ..tracing import span
+from ..utils import compute_window_return_with_details, latest_nav_date, parse_date
 
+_log = get_logger("spdb")
 
-def _search(chlid: int, searchword: str, page: int = 1, maxline: int = 200) -> Dict:
+_METADATA_FIELDS = ("PRDC_NM", "PRDC_RGST_CD", "RS_CRRN", "RISK_GRADE")
+
+
+async def _search(chlid: int, searchword: str, page: int = 1, maxline: int = 200) -> Dict:
     url = "https://www.spdb-wm.com/api/search"
     payload = {
         "page": page,
@@ -21,29 +28,39 @@ def _search(chlid: int, searchword: str, page: int = 1, maxline: int = 200) -> D
         "pageflag": "true",
         "searchword": searchword,
     }
-    return fetch_json(
-        url,
-        method="POST",
-        data=json.dumps(payload, ensure_ascii=False).encode("utf-8"),
-        headers={"Content-Type": "application/json"},
-    )
+    with span("fetch", chlid=chlid, page=page):
+        return await afetch_json(
+            url,
+            method="POST",
+            data=codec.dumps(payload, separators=codec.STDLIB),
+            headers={"Content-Type": "application/json"},
+        )
+
+
+async def _fetch_detail(real_code: str) -> Dict:
+    detail = await _search(1002, f"(PRDC_CD = '{real_code}')")
+    detail_content = (detail.get("data") or {}).get("content") or []
+    return detail_content[0] if detail_content else {}
 
 
-def fetch(url: str) -> Dict:
+async def fetch(url: str) -> Product:
     parsed = urlparse(url)
     query = parse_qs(parsed.query)
     real_code = query.get("REAL_PRD_CODE", [""])[0]
     if not real_code:
         raise RuntimeError(f"Missing REAL_PRD_CODE in {url}")
 
-    detail = _search(1002, f"(PRDC_CD = '{real_code}')")
-    detail_content = (detail.get("data") or {}).get("content") or []
-    detail_item = detail_content[0] if detail_content else {}
+    nav_query = f"(REAL_PRD_CODE = '{real_code}')"
+    detail_item, nav_resp = await asyncio.gather(
+        cache.metadata(f"spdb:{real_code}", lambda: _fetch_detail(real_code), _METADATA_FIELDS),
+        _search(1003, nav_query, page=1, maxline=200),
+    )
 
     nav_items: List[Dict] = []
     page = 1
     while True:
-        nav_resp = _search(1003, f"(REAL_PRD_CODE = '{real_code}')", page=page, maxline=200)
+        if page > 1:
+            nav_resp = await _search(1003, nav_query, page=page, maxline=200)
         data = nav_resp.get("data") or {}
         content = data.get("content") or []
         nav_items.extend(content)
@@ -54,27 +71,44 @@ def fetch(url: str) -> Dict:
             break
 
     series: List[Tuple] = []
-    for item in nav_items:
-        date_value = parse_date(item.get("ISS_DATE"))
-        nav_value = item.get("NAV") or item.get("TOT_NAV")
-        if date_value and nav_value:
-            series.append((date_value, float(nav_value)))
-
-    return_1m, start_1m, start_val_1m, end_1m, end_val_1m = compute_window_return_with_details(series, 30)
-    return_3m, start_3m, start_val_3m, end_3m, end_val_3m = compute_window_return_with_details(series, 90)
-    return_6m, start_6m, start_val_6m, end_6m, end_val_6m = compute_window_return_with_details(series, 180)
-
-    debug_log(
-        f"[calc][spdb] {real_code} 1m from NAV "
-        f"start={start_1m} nav={start_val_1m} end={end_1m} nav={end_val_1m} -> {return_1m}"
+    with span("parse", rows=len(nav_items)):
+        for item in nav_items:
+            date_value = parse_date(item.get("ISS_DATE"))
+            nav_value = item.get("NAV") or item.get("TOT_NAV")
+            if date_value and nav_value:
+                series.append((date_value, float(nav_value)))
+
+    with span("compute", points=len(series)):
+        return_1m, start_1m, start_val_1m, end_1m, end_val_1m = compute_window_return_with_details(series, 30)
+        return_3m, start_3m, start_val_3m, end_3m, end_val_3m = compute_window_return_with_details(series, 90)
+        return_6m, start_6m, start_val_6m, end_6m, end_val_6m = compute_window_return_with_details(series, 180)
+
+    _log.debug(
+        "[calc][spdb] %s 1m from NAV start=%s nav=%s end=%s nav=%s -> %s",
+        real_code,
+        start_1m,
+        start_val_1m,
+        end_1m,
+        end_val_1m,
+        return_1m,
     )
-    debug_log(
-        f"[calc][spdb] {real_code} 3m from NAV "
-        f"start={start_3m} nav={start_val_3m} end={end_3m} nav={end_val_3m} -> {return_3m}"
+    _log.debug(
+        "[calc][spdb] %s 3m from NAV start=%s nav=%s end=%s nav=%s -> %s",
+        real_code,
+        start_3m,
+        start_val_3m,
+        end_3m,
+        end_val_3m,
+        return_3m,
     )
-    debug_log(
-        f"[calc][spdb] {real_code} 6m from NAV "
-        f"start={start_6m} nav={start_val_6m} end={end_6m} nav={end_val_6m} -> {return_6m}"
+    _log.debug(
+        "[calc][spdb] %s 6m from NAV start=%s nav=%s end=%s nav=%s -> %s",
+        real_code,
+        start_6m,
+        start_val_6m,
+        end_6m,
+        end_val_6m,
+        return_6m,
     )
 
     returns = {
@@ -95,16 +129,16 @@ def fetch(url: str) -> Dict:
     else:
         risk_level = ""
 
-    return {
-        "name": detail_item.get("PRDC_NM") or "",
-        "code": detail_item.get("PRDC_RGST_CD") or "",
-        "realProductCode": real_code,
-        "issuer": SPDB_ISSUER,
-        "banks": SPDB_BANKS,
-        "currency": detail_item.get("RS_CRRN") or "人民币",
-        "minHoldDays": SPDB_MIN_HOLD_DAYS,
-        "riskLevel": risk_level,
-        "returns": normalize_returns(returns),
-        "url": url,
-        "type": "wealth",
-    }
+    return Product(
+        name=detail_item.get("PRDC_NM") or "",
+        code=detail_item.get("PRDC_RGST_CD") or "",
+        real_product_code=real_code,
+        issuer=SPDB_ISSUER,
+        banks=SPDB_BANKS,
+        currency=detail_item.get("RS_CRRN") or "人民币",
+        min_hold_days=SPDB_MIN_HOLD_DAYS,
+        risk_level=risk_level,
+        returns=Returns.from_values(returns),
+        url=url,
+        nav_date=latest_nav_date(series),
+    )
@@ -1,54 +1,166 @@
 from __future__ import annotations
 
+import logging
 import re
-from typing import Dict, List, Tuple
+from typing import Dict, Iterable, List, Tuple
 
 from ..config import WEALTHCCB_BANKS, WEALTHCCB_ISSUER
-from ..http import http_fetch
-from ..logger import debug_log
-from ..utils import compute_return_from_series, normalize_returns, parse_date, parse_min_hold_days
+from ..http import ahttp_fetch
+from ..logger import get_logger
+from ..models import Product, Returns
+from ..tracing import span
+from ..utils import compute_return_from_series, latest_nav_date, parse_date, parse_min_hold_days
+
+_log = get_logger("wealthccb")
+
+
+_TOKEN_RE = re.compile(
+    r"if\(time\s*==\s*'(?P<block>[^']*)'(?P<opens>\))?"
+    r"|(?P<axis>[xs])Data\s*=\s*\[(?P<values>[^\]]*)\]"
+    r'|<h4[^>]*class="cp-title"[^>]*>(?P<title>[\s\S]*?)</h4>'
+    r'|<p class="firtst">\s*(?P<risk>[^<]*R\d[^<]*)</p>\s*<p class="second">\s*风险等级'
+)
+# A token cut off by the end of a streamed chunk starts at the last occurrence of
+# one of these openers and runs to the end of the buffer.
+_PARTIAL_TOKENS = (
+    ("if(time", 0, re.compile(r"if\(time\s*(?:=(?:=\s*(?:'[^']*'?)?)?)?\Z")),
+    ("Data", 1, re.compile(r"[xs]Data\s*(?:=\s*(?:\[[^\]]*)?)?\Z")),
+    ("<h4", 0, re.compile(r"<h4(?:(?!</h4>)[\s\S])*\Z")),
+    ('<p class="firtst">', 0, re.compile(r'<p class="firtst">[^<]*(?:<[^<]*(?:<[^<]*)?)?\Z')),
+)
+# Long enough to keep any opener that is itself split across chunks.
+_OPENER_TAIL = 32
+_DATE_RE = re.compile(r"\d{8}")
+_NUMBER_RE = re.compile(r"-?\d+(?:\.\d+)?")
+
+
+class PageScanner:
+    """Single-pass scanner for wealthccb product pages.
+
+    One walk over the document collects the title, the risk text and the
+    ``xData``/``sData`` arrays of every ``if(time == '...')`` chart block. Text can be
+    fed in chunks as it streams in; only a possibly incomplete trailing token is kept
+    between chunks.
+    """
+
+    def __init__(self) -> None:
+        self.title_html = ""
+        self.risk_text = ""
+        self._buffer = ""
+        self._block: str | None = None
+        self._seen_blocks: set = set()
+        self._candidates: Dict[str, Dict[str, List[str]]] = {}
+        self._title_found = False
+        self._risk_found = False
+
+    def feed(self, chunk: str) -> None:
+        buffer = self._buffer + chunk if self._buffer else chunk
+        consumed, pending = self._scan(buffer, final=False)
+        rest = buffer[consumed:]
+        if pending:
+            self._buffer = rest
+            return
+        keep = max(0, len(rest) - _OPENER_TAIL)
+        for opener, lead, partial in _PARTIAL_TOKENS:
+            index = rest.rfind(opener, 0, keep + len(opener)) - lead
+            if 0 <= index < keep and partial.match(rest, index):
+                keep = index
+        self._buffer = rest[keep:]
+
+    def close(self) -> "PageScanner":
+        if self._buffer:
+            self._scan(self._buffer, final=True)
+            self._buffer = ""
+        return self
+
+    def _scan(self, text: str, final: bool) -> Tuple[int, bool]:
+        consumed = 0
+        for match in _TOKEN_RE.finditer(text):
+            if not final and match.end() == len(text):
+                # A block header cut right before its ")" would be misread; wait for more input.
+                return match.start(), True
+            consumed = match.end()
+            key = match.group("block")
+            if key is not None:
+                # Any block header ends the current block; only the first block per key counts.
+                if match.group("opens") and key not in self._seen_blocks:
+                    self._seen_blocks.add(key)
+                    self._block = key
+                else:
+                    self._block = None
+                continue
+            axis = match.group("axis")
+            if axis is not None:
+                if self._block is not None:
+                    block = self._candidates.setdefault(self._block, {"x": [], "s": []})
+                    block[axis].append(match.group("values"))
+                continue
+            title = match.group("title")
+            if title is not None:
+                if not self._title_found:
+                    self.title_html = title
+                    self._title_found = True
+                continue
+            if not self._risk_found:
+                self.risk_text = match.group("risk").strip()
+                self._risk_found = True
+        return consumed, False
+
+    def series(self, time_key: str) -> List[Tuple]:
+        block = self._candidates.get(time_key)
+        if not block or not block["x"] or not block["s"]:
+            return []
+        dates_raw = _pick_values(block["x"], _DATE_RE)
+        values_raw = _pick_values(block["s"], _NUMBER_RE)
+        if not dates_raw or not values_raw:
+            return []
+
+        series = []
+        for date_str, value_str in zip(dates_raw, values_raw):
+            date_value = parse_date(date_str)
+            if not date_value:
+                continue
+            series.append((date_value, float(value_str)))
+        return series
+
+
+def _pick_values(candidates: List[str], pattern: "re.Pattern[str]") -> List[str]:
+    best: List[str] = []
+    for candidate in candidates:
+        values = pattern.findall(candidate)
+        if len(values) > len(best):
+            best = values
+    return best
+
+
+def scan_page(html: str) -> PageScanner:
+    scanner = PageScanner()
+    scanner.feed(html)
+    return scanner.close()
 
 
 def _extract_series(html: str, time_key: str) -> List[Tuple]:
-    block_match = re.search(
-        rf"if\(time\s*==\s*'{time_key}'\)([\s\S]*?)(?=if\(time\s*==\s*'|$)",
-        html,
-    )
-    if not block_match:
-        return []
-    block = block_match.group(1)
-    x_candidates = re.findall(r"xData\s*=\s*\[([\s\S]*?)\]", block)
-    s_candidates = re.findall(r"sData\s*=\s*\[([\s\S]*?)\]", block)
-    if not x_candidates or not s_candidates:
-        return []
-
-    def pick_values(candidates: List[str], pattern: str) -> List[str]:
-        best: List[str] = []
-        best_count = 0
-        for candidate in candidates:
-            values = re.findall(pattern, candidate)
-            if len(values) > best_count:
-                best = values
-                best_count = len(values)
-        return best
-
-    dates_raw = pick_values(x_candidates, r"\d{8}")
-    values_raw = pick_values(s_candidates, r"-?\d+(?:\.\d+)?")
-    if not dates_raw or not values_raw:
-        return []
-
-    series = []
-    for date_str, value_str in zip(dates_raw, values_raw):
-        date_value = parse_date(date_str)
-        if not date_value:
-            continue
-        series.append((date_value, float(value_str)))
-    return series
-
-
-def parse_html(html: str, url: str) -> Dict:
-    title_match = re.search(r'<h4[^>]*class="cp-title"[^>]*>([\s\S]*?)</h4>', html)
-    title_html = title_match.group(1) if title_match else ""
+    return scan_page(html).series(time_key)
+
+
+def parse_html(html: str, url: str) -> Product:
+    with span("parse", bytes=len(html)):
+        scanner = scan_page(html)
+    return _build_product(scanner, url)
+
+
+def parse_stream(chunks: Iterable[str], url: str) -> Product:
+    """parse_html for a body that arrives in chunks."""
+    scanner = PageScanner()
+    with span("parse"):
+        for chunk in chunks:
+            scanner.feed(chunk)
+        scanner.close()
+    return _build_product(scanner, url)
+
+
+def _build_product(scanner: PageScanner, url: str) -> Product:
+    title_html = scanner.title_html
     code_match = re.search(r"\(([^)]+)\)", title_html)
     code = code_match.group(1).strip() if code_match else ""
     name = re.sub(r"<[^>]+>", "", title_html)
@@ -56,38 +168,41 @@ def parse_html(html: str, url: str) -> Dict:
         name = name.replace(f"({code})", "")
     name = re.sub(r"\s+", " ", name).strip()
 
-    risk_match = re.search(
-        r'<p class="firtst">\s*([^<]*R\d[^<]*)</p>\s*<p class="second">\s*风险等级',
-        html,
-    )
-    risk_text = risk_match.group(1).strip() if risk_match else ""
-    risk_level_match = re.search(r"R\d", risk_text)
+    risk_level_match = re.search(r"R\d", scanner.risk_text)
     risk_level = risk_level_match.group(0) if risk_level_match else ""
 
-    series_1m = _extract_series(html, "week")
-    series_3m = _extract_series(html, "month")
-    series_6m = _extract_series(html, "byear")
+    series_1m = scanner.series("week")
+    series_3m = scanner.series("month")
+    series_6m = scanner.series("byear")
 
-    return_1m = compute_return_from_series(series_1m)
-    return_3m = compute_return_from_series(series_3m)
-    return_6m = compute_return_from_series(series_6m)
+    with span("compute"):
+        return_1m = compute_return_from_series(series_1m)
+        return_3m = compute_return_from_series(series_3m)
+        return_6m = compute_return_from_series(series_6m)
 
     def log_series(label: str, series: List[Tuple], value: float | None) -> None:
         if not series:
-            debug_log(f"[calc][wealthccb] {code or url} {label} series empty")
+            _log.debug("[calc][wealthccb] %s %s series empty", code or url, label)
             return
         series_sorted = sorted(series, key=lambda x: x[0])
         start_date, start_value = series_sorted[0]
         end_date, end_value = series_sorted[-1]
-        debug_log(
-            f"[calc][wealthccb] {code or url} {label} "
-            f"len={len(series_sorted)} start={start_date} nav={start_value} "
-            f"end={end_date} nav={end_value} -> {value}"
+        _log.debug(
+            "[calc][wealthccb] %s %s len=%d start=%s nav=%s end=%s nav=%s -> %s",
+            code or url,
+            label,
+            len(series_sorted),
+            start_date,
+            start_value,
+            end_date,
+            end_value,
+            value,
         )
 
-    log_series("1m", series_1m, return_1m)
-    log_series("3m", series_3m, return_3m)
-    log_series("6m", series_6m, return_6m)
+    if _log.isEnabledFor(logging.DEBUG):
+        log_series("1m", series_1m, return_1m)
+        log_series("3m", series_3m, return_3m)
+        log_series("6m", series_6m, return_6m)
 
     returns = {
         "1m": return_1m,
@@ -95,21 +210,22 @@ def parse_html(html: str, url: str) -> Dict:
         "6m": return_6m,
     }
 
-    return {
-        "name": name,
-        "code": code,
-        "issuer": WEALTHCCB_ISSUER,
-        "banks": WEALTHCCB_BANKS,
-        "currency": "人民币",
-        "minHoldDays": parse_min_hold_days(name),
-        "riskLevel": risk_level,
-        "returns": normalize_returns(returns),
-        "url": url,
-        "type": "wealth",
-    }
+    return Product(
+        name=name,
+        code=code,
+        issuer=WEALTHCCB_ISSUER,
+        banks=WEALTHCCB_BANKS,
+        currency="人民币",
+        min_hold_days=parse_min_hold_days(name),
+        risk_level=risk_level,
+        returns=Returns.from_values(returns),
+        url=url,
+        nav_date=latest_nav_date(series_1m + series_3m + series_6m),
+    )
 
 
-def fetch(url: str) -> Dict:
-    html = http_fetch(url).text
+async def fetch(url: str) -> Product:
+    with span("fetch", url=url):
+        html = (await ahttp_fetch(url)).text
     parsed = parse_html(html, url)
     return parsed
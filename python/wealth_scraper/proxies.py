@@ -0,0 +1,238 @@
+"""Egress proxy pool: spreads requests over several proxies and sidelines bad ones.
+
+``WEALTH_PROXIES`` lists proxy urls (``http://[user:pass@]host:port``,
+comma-separated). With it set every request goes through one of them instead of
+the ``http_proxy``/``https_proxy`` environment proxy (``no_proxy`` still
+applies, to the host actually connected to). ``WEALTH_PROXY_STRATEGY`` picks the proxy: ``least-inflight`` (the
+default; the one with the fewest requests in flight, then the lowest smoothed
+latency) or ``round-robin``.
+
+Each proxy keeps its smoothed latency and the outcome of its last
+``WEALTH_PROXY_WINDOW`` attempts (default 20). Connection failures, timeouts and
+429/503 answers count as errors: another IP may well get through. After
+``WEALTH_PROXY_MAX_FAILURES`` consecutive errors (default 3), or an error rate
+of ``WEALTH_PROXY_MAX_ERROR_RATE`` (default 0.5) over at least 5 attempts, a
+proxy is ejected for ``WEALTH_PROXY_EJECT_SECONDS`` (default 30), twice as long
+each further time, up to 5 minutes. It then comes back with a clean window. When
+every proxy is ejected the one due back first is used rather than failing.
+
+Hosts in ``WEALTH_PROXY_AFFINITY`` (comma-separated, ``*`` for all) need one IP
+for the whole call sequence of a product (a session, a key handed out by an
+earlier call): the first request of a product to such a host pins the proxy
+it used, and the product's later requests to the host go through it as long as
+it is not ejected.
+"""
+
+from __future__ import annotations
+
+import collections
+import itertools
+import os
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Deque, Dict, FrozenSet, Iterator, List, Optional
+from urllib.parse import SplitResult, urlsplit
+
+from .logger import get_logger
+
+_log = get_logger("proxies")
+
+STRATEGIES = ("least-inflight", "round-robin")
+_LATENCY_SMOOTHING = 0.2
+_MIN_SAMPLES = 5
+_MAX_EJECT_SECONDS = 300.0
+
+
+class Proxy:
+    """One egress proxy and its health."""
+
+    def __init__(self, url: str, window: int = 20) -> None:
+        self.url: SplitResult = urlsplit(url if "://" in url else f"http://{url}")
+        if not self.url.hostname:
+            raise ValueError(f"invalid proxy url: {url!r}")
+        # Credentials stay out of logs and reports.
+        self.name = f"{self.url.hostname}:{self.url.port or 80}"
+        self.pool: Optional["ProxyPool"] = None
+        self.in_flight = 0
+        self.latency: Optional[float] = None
+        self.requests = 0
+        self.errors = 0
+        self.ejections = 0
+        self.ejected_until = 0.0
+        self._failures = 0
+        self._outcomes: Deque[bool] = collections.deque(maxlen=window)
+
+    def available(self, now: float) -> bool:
+        return now >= self.ejected_until
+
+    def error_rate(self) -> float:
+        return self._outcomes.count(False) / len(self._outcomes) if self._outcomes else 0.0
+
+    def record(self, ok: bool, seconds: float, now: float) -> None:
+        self.requests += 1
+        self._outcomes.append(ok)
+        if ok:
+            self._failures = 0
+            self.latency = seconds if self.latency is None else (
+                (1 - _LATENCY_SMOOTHING) * self.latency + _LATENCY_SMOOTHING * seconds
+            )
+            return
+        self.errors += 1
+        self._failures += 1
+        if not self.available(now):
+            return
+        max_failures = int(os.environ.get("WEALTH_PROXY_MAX_FAILURES") or 3)
+        max_rate = float(os.environ.get("WEALTH_PROXY_MAX_ERROR_RATE") or 0.5)
+        if self._failures >= max_failures or (len(self._outcomes) >= _MIN_SAMPLES and self.error_rate() >= max_rate):
+            base = float(os.environ.get("WEALTH_PROXY_EJECT_SECONDS") or 30)
+            seconds = min(base * 2 ** self.ejections, _MAX_EJECT_SECONDS)
+            self.ejections += 1
+            self.ejected_until = now + seconds
+            _log.warning(
+                "[proxies] ejecting %s for %.0fs (%d consecutive errors, error rate %.0f%%)",
+                self.name, seconds, self._failures, self.error_rate() * 100,
+            )
+            # It comes back on a clean slate.
+            self._failures = 0
+            self._outcomes.clear()
+
+
+class ProxyPool:
+    def __init__(self, urls: List[str], strategy: str = "least-inflight", affinity: FrozenSet[str] = frozenset()) -> None:
+        if strategy not in STRATEGIES:
+            raise ValueError(f"unknown proxy strategy {strategy!r} (expected one of {', '.join(STRATEGIES)})")
+        if not urls:
+            raise ValueError("proxy pool needs at least one proxy")
+        window = int(os.environ.get("WEALTH_PROXY_WINDOW") or 20)
+        self.proxies = [Proxy(url, window) for url in urls]
+        for proxy in self.proxies:
+            proxy.pool = self
+        self.strategy = strategy
+        self.affinity = affinity
+        self._turn = itertools.count()
+        self._lock = threading.Lock()
+
+    def _pinned(self, host: str) -> bool:
+        return "*" in self.affinity or host in self.affinity
+
+    def _choose(self, now: float) -> Proxy:
+        candidates = [proxy for proxy in self.proxies if proxy.available(now)]
+        if not candidates:
+            return min(self.proxies, key=lambda proxy: proxy.ejected_until)
+        # Rotating the start breaks ties evenly for least-inflight too.
+        offset = next(self._turn) % len(candidates)
+        candidates = candidates[offset:] + candidates[:offset]
+        if self.strategy == "round-robin":
+            return candidates[0]
+        return min(candidates, key=lambda proxy: (proxy.in_flight, proxy.latency or 0.0))
+
+    def acquire(self, host: str) -> Proxy:
+        """The proxy for the next request to host, counted as in flight until release()."""
+        host = host.lower()
+        pins = _PINS.get() if self._pinned(host) else None
+        with self._lock:
+            now = time.monotonic()
+            proxy = pins.get(host) if pins is not None else None
+            if proxy is None or not proxy.available(now):
+                proxy = self._choose(now)
+                if pins is not None:
+                    pins[host] = proxy
+            proxy.in_flight += 1
+            return proxy
+
+    def release(self, proxy: Proxy, ok: Optional[bool], seconds: float) -> None:
+        with self._lock:
+            proxy.in_flight -= 1
+            if ok is not None:
+                proxy.record(ok, seconds, time.monotonic())
+
+    def summary(self) -> Dict[str, Dict]:
+        with self._lock:
+            now = time.monotonic()
+            return {
+                proxy.name: {
+                    "requests": proxy.requests,
+                    "errors": proxy.errors,
+                    "errorRate": round(proxy.error_rate(), 3),
+                    "latency": round(proxy.latency or 0.0, 4),
+                    "ejections": proxy.ejections,
+                    "ejectedFor": round(max(0.0, proxy.ejected_until - now), 1),
+                }
+                for proxy in self.proxies
+            }
+
+
+_POOL: Optional[ProxyPool] = None
+_POOL_KEY: Optional[tuple] = None
+_CONFIGURED: Optional[ProxyPool] = None
+_LOCK = threading.Lock()
+# Proxies pinned by the product being scraped, per host.
+_PINS: ContextVar[Optional[Dict[str, Proxy]]] = ContextVar("wealth_proxy_pins", default=None)
+
+
+def _split(raw: str) -> List[str]:
+    return [item.strip() for item in raw.split(",") if item.strip()]
+
+
+def configure(urls: Optional[List[str]], strategy: str = "least-inflight", affinity: Optional[List[str]] = None) -> Optional[ProxyPool]:
+    """Use a pool of urls instead of WEALTH_PROXIES (None = back to the environment)."""
+    global _CONFIGURED
+    pool = ProxyPool(urls, strategy, frozenset(host.lower() for host in affinity or ())) if urls else None
+    with _LOCK:
+        _CONFIGURED = pool
+    return pool
+
+
+def pool() -> Optional[ProxyPool]:
+    """The active pool, or None when requests use the environment proxy."""
+    global _POOL, _POOL_KEY
+    if _CONFIGURED is not None:
+        return _CONFIGURED
+    key = tuple(os.environ.get(name, "") for name in ("WEALTH_PROXIES", "WEALTH_PROXY_STRATEGY", "WEALTH_PROXY_AFFINITY"))
+    if not key[0].strip():
+        return None
+    with _LOCK:
+        if key != _POOL_KEY:
+            _POOL = ProxyPool(
+                _split(key[0]),
+                key[1].strip().lower() or "least-inflight",
+                frozenset(host.lower() for host in _split(key[2])),
+            )
+            _POOL_KEY = key
+        return _POOL
+
+
+def acquire(host: str) -> Optional[Proxy]:
+    """A proxy of the pool for a request to host, or None without a pool."""
+    current = pool()
+    return current.acquire(host) if current is not None else None
+
+
+def release(proxy: Optional[Proxy], ok: Optional[bool], seconds: float) -> None:
+    """Return proxy to its pool (the one it came from, even if reconfigured since);
+    ok None (the attempt was cancelled) leaves its health as it was."""
+    if proxy is not None and proxy.pool is not None:
+        proxy.pool.release(proxy, ok, seconds)
+
+
+@contextmanager
+def affinity_scope() -> Iterator[None]:
+    """Pin proxies for requests made inside the block (one product's calls)."""
+    token = _PINS.set({})
+    try:
+        yield
+    finally:
+        _PINS.reset(token)
+
+
+def summary() -> Dict[str, Dict]:
+    current = pool()
+    return current.summary() if current is not None else {}
+
+
+def reset() -> None:
+    global _POOL, _POOL_KEY, _CONFIGURED
+    with _LOCK:
+        _POOL = _POOL_KEY = _CONFIGURED = None
@@ -0,0 +1,118 @@
+"""Adaptive refresh: skip products whose next NAV cannot have been published yet.
+
+For every product the ``refresh`` state cache keeps the last few NAV dates together
+with the day each one was first seen. From those it learns the publication cadence
+(median gap, in business days) and lag (business days between a NAV date and the
+day it showed up). A product is due again once its next NAV date plus the usual
+lag has arrived; until then ``scrape_all`` carries its previous record forward from
+the last output file. A due check that finds nothing new backs off for
+``WEALTH_REFRESH_RECHECK_HOURS`` (default 12), and every product is fetched at
+least every ``WEALTH_REFRESH_MAX_AGE_HOURS`` (default 168).
+
+Products without history, without a NAV date, or missing from the previous output
+are always fetched. ``WEALTH_REFRESH=0`` fetches everything; ``--refresh-cache``
+does the same for one run.
+"""
+
+from __future__ import annotations
+
+import datetime as dt
+import os
+import time
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from . import cache, codec
+from .logger import get_logger
+
+_log = get_logger("refresh")
+
+_HISTORY = 10
+_CHINA_TZ = dt.timezone(dt.timedelta(hours=8))
+
+
+def enabled() -> bool:
+    return os.environ.get("WEALTH_REFRESH", "1").strip().lower() not in ("0", "false", "no", "off")
+
+
+def _store() -> cache.TTLCache:
+    hours = float(os.environ.get("WEALTH_REFRESH_MAX_AGE_HOURS") or 168)
+    return cache.get_cache("refresh", ttl=hours * 3600)
+
+
+def _business_days_between(start: dt.date, end: dt.date) -> int:
+    """Weekdays in (start, end]; negative spans count as zero."""
+    days = 0
+    current = start
+    while current < end:
+        current += dt.timedelta(days=1)
+        if current.weekday() < 5:
+            days += 1
+    return days
+
+
+def _add_business_days(start: dt.date, days: int) -> dt.date:
+    current = start
+    while days > 0:
+        current += dt.timedelta(days=1)
+        if current.weekday() < 5:
+            days -= 1
+    return current
+
+
+def _median(values: List[int]) -> int:
+    ordered = sorted(values)
+    return ordered[(len(ordered) - 1) // 2]
+
+
+def next_check_date(seen: List[List[str]]) -> Optional[dt.date]:
+    """First day a new NAV is expected to be visible, from [navDate, firstSeen] pairs."""
+    if len(seen) < 2:
+        return None
+    nav_dates = [dt.date.fromisoformat(nav_date) for nav_date, _ in seen]
+    gaps = [_business_days_between(a, b) for a, b in zip(nav_dates, nav_dates[1:])]
+    lags = [_business_days_between(dt.date.fromisoformat(nav), dt.date.fromisoformat(first)) for nav, first in seen]
+    cadence = max(_median(gaps), 1)
+    # The first sample may be an old NAV seen on our first visit; never wait past a full cycle.
+    return _add_business_days(nav_dates[-1], cadence + min(_median(lags), cadence))
+
+
+def is_due(url: str, now: Optional[float] = None) -> bool:
+    now = time.time() if now is None else now
+    entry = _store().get(url)
+    if entry is None:
+        return True
+    expected = next_check_date(entry.get("seen") or [])
+    if expected is None:
+        return True
+    if dt.datetime.fromtimestamp(now, _CHINA_TZ).date() < expected:
+        return False
+    recheck = float(os.environ.get("WEALTH_REFRESH_RECHECK_HOURS") or 12) * 3600
+    return not (entry.get("stale") and now - entry.get("checkedAt", 0) < recheck)
+
+
+def record(url: str, nav_date: str, now: Optional[float] = None) -> None:
+    """Remember a successful fetch of url whose newest NAV is nav_date ("" if unknown)."""
+    now = time.time() if now is None else now
+    store = _store()
+    entry = store.get(url, allow_stale=True) or {}
+    seen: List[List[str]] = list(entry.get("seen") or [])
+    stale = True
+    if nav_date and (not seen or nav_date > seen[-1][0]):
+        seen.append([nav_date, dt.datetime.fromtimestamp(now, _CHINA_TZ).date().isoformat()])
+        stale = False
+    store.set(url, {"seen": seen[-_HISTORY:], "stale": stale, "checkedAt": round(now, 3)})
+
+
+def load_previous(path: Path) -> Dict[str, Dict]:
+    """Records of the last output file keyed by url ({} when it is missing or unreadable)."""
+    try:
+        items = codec.loads(Path(path).read_bytes())
+    except FileNotFoundError:
+        return {}
+    except (OSError, codec.JSONDecodeError) as exc:
+        _log.warning("[refresh] ignoring unreadable %s: %s", path, exc)
+        return {}
+    if not isinstance(items, list):
+        return {}
+    return {item["url"]: item for item in items if isinstance(item, dict) and item.get("url")}
@@ -1,9 +1,10 @@
 from __future__ import annotations
 
-import json
+import asyncio
 import os
+import time
 from pathlib import Path
-from typing import Dict
+from typing import Dict, List
 
 from .config import (
     DEFAULT_FUND_LINKS,
@@ -11,8 +12,10 @@ from .config import (
     DEFAULT_WEALTH_LINKS,
     DEFAULT_WEALTH_OUTPUT,
 )
-from .scraper import load_links, load_targets, scrape_all, write_json
-from .storage import publish_outputs
+from . import cache, cassette, changes, codec, events, metrics, profiling, proxies, refresh, runtime, throttle, tracing
+from .models import Target
+from .scraper import ascrape_all, write_json
+from .storage import publish_output
 
 
 def _build_paths(
@@ -29,42 +32,121 @@ def _build_paths(
     }
 
 
-def run_scrape(
+async def _catalog(name: str, targets: List[Target], output: Path, changed_only: bool = False) -> Dict:
+    """Scrape one catalog, write its output and publish it, timing each stage.
+
+    With changed_only, only targets that changed since the last output are
+    scraped and merged into it (see ``changes``).
+    """
+    stages: Dict[str, float] = {}
+    result: Dict = {}
+    started = time.perf_counter()
+    previous = refresh.load_previous(output)
+    selection = changes.select(targets, previous, changes.load_snapshot(output)) if changed_only else None
+    if selection is None:
+        products, failures = await ascrape_all(targets, previous=previous, catalog=name)
+        records = [product.to_dict() for product in products]
+    else:
+        products, failures = await ascrape_all(selection.changed, catalog=name)
+        records = changes.merge(targets, selection, products)
+        result["changes"] = {"scraped": len(selection.changed), "kept": len(selection.kept), "removed": selection.removed}
+    scraped = time.perf_counter()
+    stages["scrape"] = round(scraped - started, 3)
+    if selection is None or records != list(previous.values()) or not output.exists():
+        write_json(output, records)
+        changes.save_snapshot(output, targets, records)
+        written = time.perf_counter()
+        stages["write"] = round(written - scraped, 3)
+        # Uploads use blocking SDKs; keep them off the event loop so the other catalog keeps scraping.
+        await asyncio.to_thread(publish_output, name, output)
+        stages["publish"] = round(time.perf_counter() - written, 3)
+    result.update(
+        count=len(records),
+        failed=len(failures),
+        failures=failures,
+        output=str(output),
+        stages=stages,
+    )
+    return result
+
+
+async def arun_scrape(
     *,
     wealth_links: Path | str | None = None,
     fund_links: Path | str | None = None,
     wealth_output: Path | str | None = None,
     fund_output: Path | str | None = None,
+    profile: bool | None = None,
+    changed_only: bool = False,
 ) -> Dict:
+    """Scrape the wealth and fund catalogs concurrently; each is written and
+    published as soon as it finishes. changed_only scrapes only new or changed
+    targets and merges them into the previous outputs."""
     paths = _build_paths(wealth_links, fund_links, wealth_output, fund_output)
+    metrics.reset()
 
-    wealth_targets = load_targets(paths["wealth_links"])
-    fund_urls = load_links(paths["fund_links"])
-
-    wealth_products, wealth_failures = scrape_all(wealth_targets)
-    fund_products, fund_failures = scrape_all(fund_urls)
-
-    write_json(paths["wealth_output"], wealth_products)
-    write_json(paths["fund_output"], fund_products)
-
-    summary = {
-        "wealth": {
-            "count": len(wealth_products),
-            "failed": len(wealth_failures),
-            "failures": wealth_failures,
-            "output": str(paths["wealth_output"]),
-        },
-        "fund": {
-            "count": len(fund_products),
-            "failed": len(fund_failures),
-            "failures": fund_failures,
-            "output": str(paths["fund_output"]),
-        },
+    profile = profiling.env_enabled() if profile is None else profile
+    started = time.perf_counter()
+    # Warm Lambda/FC invocations reuse the catalogs parsed by earlier ones (see ``runtime``).
+    state = runtime.current()
+    state.begin()
+
+    with tracing.session(os.environ.get("WEALTH_TRACE_FILE")), profiling.session(profile), events.session():
+        wealth_targets = state.load_targets(paths["wealth_links"])
+        fund_targets = state.load_targets(paths["fund_links"])
+
+        catalogs = (("wealth", wealth_targets, paths["wealth_output"]), ("fund", fund_targets, paths["fund_output"]))
+        if profile:
+            # Profiles attribute work to one product at a time, so the catalogs run one after the other.
+            results = [await _catalog(*catalog, changed_only=changed_only) for catalog in catalogs]
+        else:
+            results = await asyncio.gather(*(_catalog(*catalog, changed_only=changed_only) for catalog in catalogs))
+        summary: Dict = {"wealth": results[0], "fund": results[1]}
+
+    report_started = time.perf_counter()
+    report_dir = Path(os.environ.get("WEALTH_REPORT_DIR") or paths["wealth_output"].parent)
+    profile_summary = profiling.write_profiles(report_dir) if profile else None
+    summary["runtime"] = state.finish()
+    extra: Dict = {"throttle": throttle.summary(), "runtime": summary["runtime"]}
+    if proxies.pool() is not None:
+        extra["proxies"] = proxies.summary()
+    if profile_summary:
+        extra["profile"] = profile_summary
+    http_summary = metrics.write_run_report(report_dir, extra=extra)
+    summary["http"] = {
+        host: {"requests": stats["requests"], "p50": stats["p50"], "p95": stats["p95"]}
+        for host, stats in http_summary["hosts"].items()
     }
+    if profile_summary:
+        summary["profile"] = profile_summary
 
-    publish_outputs(paths)
+    cassette.flush()
+    cache.flush()
+    finished = time.perf_counter()
+    summary["stages"] = {"report": round(finished - report_started, 3), "total": round(finished - started, 3)}
     return summary
 
 
+def run_scrape(
+    *,
+    wealth_links: Path | str | None = None,
+    fund_links: Path | str | None = None,
+    wealth_output: Path | str | None = None,
+    fund_output: Path | str | None = None,
+    profile: bool | None = None,
+    changed_only: bool = False,
+) -> Dict:
+    return runtime.current().run(
+        arun_scrape(
+            wealth_links=wealth_links,
+            fund_links=fund_links,
+            wealth_output=wealth_output,
+            fund_output=fund_output,
+            profile=profile,
+            changed_only=changed_only,
+        )
+    )
+
+
 def to_json(obj: Dict) -> str:
-    return json.dumps(obj, ensure_ascii=False, indent=2)
+    return codec.dumps_text(obj, indent=True)
@@ -0,0 +1,193 @@
+"""Process-wide state kept between runs, for warm Lambda/FC containers.
+
+A container that stays warm runs ``run_scrape`` once per invocation in the same
+process. Most expensive state already lives at module level and survives:
+the SSL contexts and TLS sessions (``http``), the learned host limits
+(``throttle``), the state caches loaded on first use (``cache``: metadata, the
+chinawealth index, refresh history, timings) and the chinawealth signing key
+files. This module adds the parsed catalogs, reused while the file's size and
+mtime are unchanged (one ``stat`` per invocation; ``WEALTH_CACHE=0`` and
+``WEALTH_CACHE_REFRESH=catalog`` parse again, as for the compiled catalogs), and
+the event loop ``run_scrape`` runs on, kept open for the process so the
+connections ``http`` keeps alive serve the next invocation (until they have
+been idle for ``WEALTH_HTTP_KEEPALIVE`` seconds; one the server closed in the
+meantime is replaced transparently). It reports what each invocation found warm
+and what its setup cost, under ``runtime`` in the run summary and
+``run_report.json``.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import atexit
+import threading
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Coroutine, Dict, List, Optional, Tuple, TypeVar
+
+from . import cache, http
+from .catalog import load_targets as _parse_targets
+from .logger import get_logger
+from .models import Target
+from .providers import chinawealth
+
+_log = get_logger("runtime")
+
+_STARTED = time.time()
+
+T = TypeVar("T")
+
+
+@dataclass
+class Invocation:
+    """What one run found already warm, and what loading its catalogs cost."""
+
+    number: int
+    warm: bool
+    started: float = field(default_factory=time.perf_counter)
+    catalog_seconds: float = 0.0
+    catalogs_reused: int = 0
+    catalogs_loaded: int = 0
+    tls_sessions: int = 0
+    legacy_hosts: int = 0
+    caches: int = 0
+    signing_keys: int = 0
+    idle_connections: int = 0
+    connections_opened: int = 0
+    connections_reused: int = 0
+
+    def to_dict(self) -> Dict:
+        return {
+            "invocation": self.number,
+            "warm": self.warm,
+            "containerAgeSeconds": round(time.time() - _STARTED, 1),
+            "catalogSeconds": round(self.catalog_seconds, 4),
+            "catalogsReused": self.catalogs_reused,
+            "catalogsLoaded": self.catalogs_loaded,
+            "tlsSessions": self.tls_sessions,
+            "legacyHosts": self.legacy_hosts,
+            "cachesLoaded": self.caches,
+            "signingKeys": self.signing_keys,
+            "idleConnections": self.idle_connections,
+            "connectionsOpened": self.connections_opened,
+            "connectionsReused": self.connections_reused,
+        }
+
+
+class Runtime:
+    def __init__(self) -> None:
+        self.invocations = 0
+        self._catalogs: Dict[str, Tuple[int, int, List[Target]]] = {}
+        self._lock = threading.Lock()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._loop_lock = threading.Lock()
+        self._connections: Dict[str, int] = {}
+        self.current: Optional[Invocation] = None
+
+    def begin(self) -> Invocation:
+        with self._lock:
+            self.invocations += 1
+            invocation = Invocation(self.invocations, warm=self.invocations > 1)
+        tls = http.tls_state()
+        invocation.tls_sessions = tls["sessions"]
+        invocation.legacy_hosts = tls["legacyHosts"]
+        invocation.caches = cache.loaded()
+        invocation.signing_keys = chinawealth.signing_keys()
+        self._connections = http.connection_state()
+        invocation.idle_connections = self._connections["idle"]
+        self.current = invocation
+        return invocation
+
+    def load_targets(self, path: Path) -> List[Target]:
+        """The catalog at path, parsed again only when its size or mtime changed."""
+        path = Path(path)
+        started = time.perf_counter()
+        try:
+            stat = path.stat()
+            key = str(path.resolve())
+        except OSError:
+            stat, key = None, str(path)
+        with self._lock:
+            entry = self._catalogs.get(key)
+        fresh = stat is not None and entry is not None and entry[:2] == (stat.st_size, stat.st_mtime_ns)
+        reused = fresh and cache.enabled() and not cache.refresh_requested("catalog")
+        if reused:
+            targets = entry[2]
+        else:
+            targets = _parse_targets(path)
+            if stat is not None:
+                with self._lock:
+                    self._catalogs[key] = (stat.st_size, stat.st_mtime_ns, targets)
+        invocation = self.current
+        if invocation is not None:
+            invocation.catalog_seconds += time.perf_counter() - started
+            if reused:
+                invocation.catalogs_reused += 1
+            else:
+                invocation.catalogs_loaded += 1
+        # Callers get their own list; the Targets themselves are never modified.
+        return list(targets)
+
+    def finish(self) -> Dict:
+        invocation, self.current = self.current, None
+        if invocation is None:
+            return {}
+        connections = http.connection_state()
+        invocation.connections_opened = connections["opened"] - self._connections.get("opened", 0)
+        invocation.connections_reused = connections["reused"] - self._connections.get("reused", 0)
+        report = invocation.to_dict()
+        report["seconds"] = round(time.perf_counter() - invocation.started, 3)
+        _log.info(
+            "[runtime] invocation %d (%s) in %.3fs, catalogs %.4fs, connections %d new/%d reused",
+            invocation.number, "warm" if invocation.warm else "cold", report["seconds"], invocation.catalog_seconds,
+            invocation.connections_opened, invocation.connections_reused,
+        )
+        return report
+
+    def run(self, coro: Coroutine[Any, Any, T]) -> T:
+        """Run coro to completion on the event loop kept for this process.
+
+        Unlike ``run_sync`` the loop stays open afterwards, and with it the idle
+        kept-alive connections. Invocations take turns on it.
+        """
+        try:
+            asyncio.get_running_loop()
+        except RuntimeError:
+            pass
+        else:
+            coro.close()
+            raise RuntimeError("synchronous wrapper called from a running event loop; await the async variant")
+        with self._loop_lock:
+            if self._loop is None or self._loop.is_closed():
+                self._loop = asyncio.new_event_loop()
+            return self._loop.run_until_complete(coro)
+
+    def close(self) -> None:
+        """Close the kept event loop and its idle connections (at exit, or by reset)."""
+        with self._loop_lock:
+            loop, self._loop = self._loop, None
+            if loop is None or loop.is_closed():
+                return
+            try:
+                loop.run_until_complete(http.close_idle())
+                loop.run_until_complete(loop.shutdown_asyncgens())
+                loop.run_until_complete(loop.shutdown_default_executor())
+            finally:
+                loop.close()
+
+    def reset(self) -> None:
+        self.close()
+        with self._lock:
+            self.invocations = 0
+            self._catalogs.clear()
+            self.current = None
+
+
+_RUNTIME = Runtime()
+atexit.register(_RUNTIME.close)
+
+
+def current() -> Runtime:
+    """The runtime of this process (the same object across warm invocations)."""
+    return _RUNTIME
@@ -0,0 +1,157 @@
+"""Concurrent product scheduling: longest jobs first, capped per host.
+
+How long each product took in earlier runs is kept in the ``timings`` state cache
+(an exponentially weighted average per url). ``run`` starts jobs in decreasing
+order of that estimate (LPT), so a slow chinawealth or cmb product with many NAV
+pages starts early instead of stretching the tail of the run, and never has more
+than ``host_cap`` products in flight against one host. Products without history
+are estimated from the median of their host, or of all products. Every job that
+succeeds updates its estimate with the time it spent working: from its start
+(after waiting for a worker and a host slot) to its end, less the time its
+requests waited on ``throttle``. Failed jobs leave it alone. ``cache.flush()``
+persists the estimates at the end of the run.
+
+Jobs are coroutines sharing one event loop. ``WEALTH_WORKERS`` (default 64) sets
+how many run at once across all hosts. The per-host cap follows the host's
+adaptive request limit (see ``throttle``); setting ``WEALTH_HOST_CONCURRENCY``
+pins it instead. With one worker jobs run one after another in catalog order.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import collections
+import os
+import statistics
+import time
+from dataclasses import dataclass
+from typing import Awaitable, Callable, Deque, Dict, List, Optional, Tuple
+from urllib.parse import urlsplit
+
+from . import cache, throttle
+
+_TIMINGS_TTL = 30 * 86400
+_SMOOTHING = 0.5
+
+
+@dataclass
+class Job:
+    index: int
+    url: str
+    host: str = ""
+    estimate: float = 0.0
+
+    def __post_init__(self) -> None:
+        if not self.host:
+            self.host = (urlsplit(self.url).hostname or "").lower()
+
+
+def workers() -> int:
+    return max(1, int(os.environ.get("WEALTH_WORKERS") or 64))
+
+
+def host_cap(host: str) -> int:
+    fixed = os.environ.get("WEALTH_HOST_CONCURRENCY")
+    if fixed:
+        return max(1, int(fixed))
+    return throttle.capacity(host, default=2)
+
+
+def _timings() -> cache.TTLCache:
+    return cache.get_cache("timings", ttl=_TIMINGS_TTL)
+
+
+def record_duration(url: str, seconds: float) -> None:
+    store = _timings()
+    previous = store.get(url, allow_stale=True)
+    if isinstance(previous, (int, float)):
+        seconds = _SMOOTHING * seconds + (1 - _SMOOTHING) * previous
+    store.set(url, round(seconds, 4))
+
+
+def plan(jobs: List[Job]) -> List[Job]:
+    """Fill in estimates and return jobs longest first (catalog order among equals)."""
+    store = _timings()
+    known: Dict[str, List[float]] = {}
+    unknown: List[Job] = []
+    for job in jobs:
+        value = store.get(job.url, allow_stale=True)
+        if isinstance(value, (int, float)):
+            job.estimate = float(value)
+            known.setdefault(job.host, []).append(job.estimate)
+        else:
+            unknown.append(job)
+    overall = [value for values in known.values() for value in values]
+    fallback = statistics.median(overall) if overall else 0.0
+    for job in unknown:
+        values = known.get(job.host)
+        job.estimate = statistics.median(values) if values else fallback
+    return sorted(jobs, key=lambda job: -job.estimate)
+
+
+async def run(
+    jobs: List[Job],
+    work: Callable[[Job], Awaitable[Optional[bool]]],
+    *,
+    max_workers: Optional[int] = None,
+    per_host: Optional[int] = None,
+) -> None:
+    """Await work(job) for every job; exceptions from work propagate after all workers stop.
+
+    work returns False for a job that failed without raising; like one that
+    raised, its duration is not recorded.
+    """
+    max_workers = workers() if max_workers is None else max_workers
+    cap = host_cap if per_host is None else (lambda host: per_host)
+
+    async def timed(job: Job) -> None:
+        with throttle.waits() as waited:
+            started = time.perf_counter()
+            ok = await work(job)
+        if ok is not False:
+            record_duration(job.url, max(0.0, time.perf_counter() - started - waited[0]))
+
+    if max_workers <= 1 or len(jobs) <= 1:
+        for job in jobs:
+            await timed(job)
+        return
+
+    # One queue per host, in plan order; a pass looks at the head of each queue only.
+    queues: Dict[str, Deque[Tuple[int, Job]]] = {}
+    for order, job in enumerate(plan(jobs)):
+        queues.setdefault(job.host, collections.deque()).append((order, job))
+    running: Dict[str, int] = {}
+    tasks: Dict[asyncio.Task, Job] = {}
+    errors: List[BaseException] = []
+
+    def ready() -> Optional[Job]:
+        best: Optional[Deque[Tuple[int, Job]]] = None
+        for host, queue in queues.items():
+            if queue and (best is None or queue[0][0] < best[0][0]) and running.get(host, 0) < cap(host):
+                best = queue
+        return best.popleft()[1] if best is not None else None
+
+    try:
+        while tasks or (not errors and any(queues.values())):
+            while not errors and len(tasks) < max_workers:
+                job = ready()
+                if job is None:
+                    break
+                running[job.host] = running.get(job.host, 0) + 1
+                tasks[asyncio.ensure_future(timed(job))] = job
+            # Host caps can grow while jobs run, so a job held back by its cap is looked at
+            # again after a short while even if nothing finishes.
+            blocked = not errors and len(tasks) < max_workers and any(queues.values())
+            done, _ = await asyncio.wait(tasks, timeout=0.05 if blocked else None, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                job = tasks.pop(task)
+                running[job.host] -= 1
+                if not task.cancelled() and task.exception() is not None:
+                    errors.append(task.exception())
+    finally:
+        for task in tasks:
+            task.cancel()
+        if tasks:
+            await asyncio.wait(tasks)
+    if errors:
+        raise errors[0]
@@ -1,14 +1,20 @@
 from __future__ import annotations
 
-import os
-import json
+import asyncio
+import inspect
 import re
-import sys
+import time
 import datetime as dt
-from contextlib import contextmanager
 from pathlib import Path
-from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
-
+from typing import Any, Awaitable, Callable, Dict, Iterable, List, Optional, Tuple, Union
+from urllib.parse import urlsplit
+
+from . import codec, events, profiling, proxies, refresh, scheduler, throttle, tracing
+from .catalog import load_links, load_targets, normalize_target
+from .http import retries_override
+from .logger import get_logger
+from .metrics import product_scope, provider_scope
+from .models import Product, Target
 from .providers import (
     fetch_bocomm,
     fetch_cibwm,
@@ -16,9 +22,14 @@ from .providers import (
     fetch_cmb,
     fetch_spdb,
     fetch_wealthccb,
+    prefetch_chinawealth,
 )
+from .utils import run_sync
+
+_log = get_logger("scrape")
 
-_FETCHERS: Dict[str, Callable[[str], Dict]] = {
+# Providers implement ``async def fetch(url)``; plain callables are accepted too.
+_FETCHERS: Dict[str, Callable[[str], Union[Product, Awaitable[Product]]]] = {
     "wealthccb": fetch_wealthccb,
     "cibwm": fetch_cibwm,
     "bocomm": fetch_bocomm,
@@ -28,149 +39,16 @@ _FETCHERS: Dict[str, Callable[[str], Dict]] = {
 }
 
 
-def build_product_id(product: Dict, index: int) -> str:
-    code = product.get("code") or product.get("fundCode") or str(index)
-    slug = re.sub(r"[^A-Za-z0-9]+", "-", str(code)).strip("-")
-    return f"w-{slug or index}"
-
-
-def _normalize_channels(value: Any, context: str) -> Optional[List[str]]:
-    if value is None:
-        return None
-    if isinstance(value, str):
-        channel = value.strip()
-        return [channel] if channel else None
-    if not isinstance(value, list):
-        raise ValueError(f"{context}: salesChannels/banks must be string or list")
-
-    channels: List[str] = []
-    for idx, item in enumerate(value, start=1):
-        channel = str(item).strip()
-        if not channel:
-            raise ValueError(f"{context}: empty channel at index {idx}")
-        if channel not in channels:
-            channels.append(channel)
-    return channels or None
-
-
-def _normalize_retries(value: Any, context: str) -> Optional[int]:
-    if value is None or value == "":
-        return None
-    retries = int(value)
-    if retries < 0:
-        raise ValueError(f"{context}: retries must be >= 0")
-    return retries
-
+# Optional catalog-wide lookups run once per provider before its products are scraped.
+_PREFETCHERS: Dict[str, Callable[[List[str]], Optional[Awaitable[None]]]] = {
+    "chinawealth": prefetch_chinawealth,
+}
 
-def _normalize_target(
-    raw: Any,
-    *,
-    context: str,
-    default_scraper: str | None = None,
-    default_retries: int | None = None,
-    default_channels: List[str] | None = None,
-) -> Dict[str, Any]:
-    if isinstance(raw, str):
-        url = raw.strip()
-        if not url:
-            raise ValueError(f"{context}: empty url")
-        return {
-            "url": url,
-            "scraper": default_scraper,
-            "retries": default_retries,
-            "salesChannels": default_channels,
-        }
-    if not isinstance(raw, dict):
-        raise ValueError(f"{context}: item must be string or object")
-
-    url = str(raw.get("url") or "").strip()
-    if not url:
-        raise ValueError(f"{context}: missing url")
-
-    scraper = raw.get("scraper")
-    if scraper is None:
-        scraper = default_scraper
-    else:
-        scraper = str(scraper).strip().lower() or None
-
-    retries = _normalize_retries(raw.get("retries"), context)
-    if retries is None:
-        retries = default_retries
-
-    channels = _normalize_channels(raw.get("salesChannels"), context)
-    if channels is None:
-        channels = _normalize_channels(raw.get("banks"), context)
-    if channels is None:
-        channels = default_channels
-
-    return {
-        "url": url,
-        "scraper": scraper,
-        "retries": retries,
-        "salesChannels": channels,
-    }
-
-
-def load_targets(path: Path) -> List[Dict[str, Any]]:
-    if not path.exists():
-        raise FileNotFoundError(path)
-    if path.suffix.lower() != ".json":
-        return [_normalize_target(url, context=f"{path}") for url in load_links(path)]
 
-    try:
-        raw = json.loads(path.read_text(encoding="utf-8"))
-    except json.JSONDecodeError as exc:
-        raise ValueError(f"Invalid JSON in {path}: {exc}") from exc
-
-    targets: List[Dict[str, Any]] = []
-    if isinstance(raw, list):
-        for idx, item in enumerate(raw, start=1):
-            targets.append(_normalize_target(item, context=f"{path}:items[{idx}]"))
-        return targets
-
-    if not isinstance(raw, dict):
-        raise ValueError(f"{path}: root must be object or list")
-
-    if "sites" in raw:
-        sites = raw.get("sites") or []
-        if not isinstance(sites, list):
-            raise ValueError(f"{path}: sites must be an array")
-        for site_idx, site in enumerate(sites, start=1):
-            context = f"{path}:sites[{site_idx}]"
-            if not isinstance(site, dict):
-                raise ValueError(f"{context}: site must be object")
-
-            site_scraper_raw = site.get("scraper")
-            site_scraper = str(site_scraper_raw).strip().lower() if site_scraper_raw else None
-            site_retries = _normalize_retries(site.get("retries"), context)
-            site_channels = _normalize_channels(site.get("salesChannels"), context)
-            if site_channels is None:
-                site_channels = _normalize_channels(site.get("banks"), context)
-
-            products = site.get("products") or []
-            if not isinstance(products, list):
-                raise ValueError(f"{context}: products must be an array")
-
-            for prod_idx, product in enumerate(products, start=1):
-                prod_context = f"{context}:products[{prod_idx}]"
-                targets.append(
-                    _normalize_target(
-                        product,
-                        context=prod_context,
-                        default_scraper=site_scraper,
-                        default_retries=site_retries,
-                        default_channels=site_channels,
-                    )
-                )
-        return targets
-
-    products = raw.get("products")
-    if isinstance(products, list):
-        for idx, item in enumerate(products, start=1):
-            targets.append(_normalize_target(item, context=f"{path}:products[{idx}]"))
-        return targets
-
-    raise ValueError(f"{path}: expected sites[] or products[]")
+def build_product_id(product: Product, index: int) -> str:
+    code = product.code or product.fund_code or str(index)
+    slug = re.sub(r"[^A-Za-z0-9]+", "-", str(code)).strip("-")
+    return f"w-{slug or index}"
 
 
 def _detect_scraper(url: str) -> str:
@@ -189,67 +67,163 @@ def _detect_scraper(url: str) -> str:
     raise RuntimeError(f"Unsupported URL: {url}")
 
 
-def scrape_product(url: str, scraper: str | None = None) -> Dict:
+async def ascrape_product(url: str, scraper: str | None = None) -> Product:
     selected_scraper = scraper or _detect_scraper(url)
     fetcher = _FETCHERS.get(selected_scraper)
     if fetcher is None:
         raise RuntimeError(f"Unsupported scraper: {selected_scraper} (url={url})")
-    return fetcher(url)
+    events.emit("product_start", url=url, provider=selected_scraper)
+    started = time.perf_counter()
+    outcome: Dict[str, Any] = {"ok": False}
+    try:
+        with provider_scope(selected_scraper), product_scope(url), proxies.affinity_scope(), tracing.span("product", url=url), profiling.product(url):
+            product = fetcher(url)
+            if inspect.isawaitable(product):
+                product = await product
+        outcome["ok"] = True
+        return product
+    except Exception as exc:
+        outcome["error"] = str(exc)
+        raise
+    finally:
+        events.emit("product_finish", url=url, provider=selected_scraper, seconds=round(time.perf_counter() - started, 3), **outcome)
 
 
-def load_links(path: Path) -> List[str]:
-    if not path.exists():
-        raise FileNotFoundError(path)
-    if path.suffix.lower() == ".json":
-        return [target["url"] for target in load_targets(path)]
+def scrape_product(url: str, scraper: str | None = None) -> Product:
+    return run_sync(ascrape_product(url, scraper=scraper))
 
-    urls: List[str] = []
-    for line in path.read_text(encoding="utf-8").splitlines():
-        line = line.strip()
-        if not line or line.startswith("#"):
+
+async def _prefetch(targets: List[Target]) -> None:
+    by_scraper: Dict[str, List[str]] = {}
+    for target in targets:
+        try:
+            name = target.scraper or _detect_scraper(target.url)
+        except RuntimeError:
             continue
-        urls.append(line)
-    return urls
+        if name in _PREFETCHERS:
+            by_scraper.setdefault(name, []).append(target.url)
+    for name, urls in by_scraper.items():
+        try:
+            with provider_scope(name):
+                pending = _PREFETCHERS[name](urls)
+                if inspect.isawaitable(pending):
+                    await pending
+        except Exception as exc:
+            # Products fall back to their own lookups.
+            _log.warning("[scrape] %s prefetch failed: %s", name, exc)
 
 
-@contextmanager
-def _override_http_retries(retries: int | None):
-    if retries is None:
-        yield
-        return
-    old_value = os.environ.get("WEALTH_HTTP_RETRIES")
-    os.environ["WEALTH_HTTP_RETRIES"] = str(retries)
+def _carried_forward(target: Target, previous: Dict[str, Dict]) -> Optional[Product]:
+    """The previous record for target when its next NAV cannot be out yet."""
+    record = previous.get(target.url)
+    if record is None or refresh.is_due(target.url):
+        return None
     try:
-        yield
-    finally:
-        if old_value is None:
-            os.environ.pop("WEALTH_HTTP_RETRIES", None)
-        else:
-            os.environ["WEALTH_HTTP_RETRIES"] = old_value
+        return Product.from_dict(record)
+    except (TypeError, ValueError, AttributeError):
+        return None
 
 
-def scrape_all(items: Iterable[str | Dict[str, Any]]) -> Tuple[List[Dict], List[Tuple[str, str]]]:
-    products: List[Dict] = []
+async def ascrape_all(
+    items: Iterable[str | Dict[str, Any] | Target],
+    previous: Optional[Dict[str, Dict]] = None,
+    *,
+    catalog: str = "",
+) -> Tuple[List[Product], List[Tuple[str, str]]]:
+    """Scrape every target concurrently on the running event loop; with previous
+    (url -> record of the last output) products that are not due for a refresh are
+    carried forward instead of fetched. catalog names the run in progress events."""
+    products: List[Product] = []
     failures: List[Tuple[str, str]] = []
     timestamp = dt.datetime.now(dt.timezone.utc).replace(microsecond=0).isoformat()
-    for index, item in enumerate(items, start=1):
-        target = _normalize_target(item, context=f"item[{index}]")
-        url = target["url"]
+    targets = [normalize_target(item, context=f"item[{index}]") for index, item in enumerate(items, start=1)]
+    for target in targets:
+        limits = target.limits
+        if limits:
+            throttle.configure_site(
+                (urlsplit(target.url).hostname or "").lower(),
+                rps=limits.get("rps"),
+                burst=limits.get("burst"),
+                max_concurrency=limits.get("maxConcurrency"),
+            )
+    track = refresh.enabled()
+    carried: Dict[str, Product] = {}
+    if track and previous:
+        for target in targets:
+            product = _carried_forward(target, previous)
+            if product is not None:
+                carried[target.url] = product
+    if carried:
+        _log.info("[refresh] carrying forward %d of %d products", len(carried), len(targets))
+    await _prefetch([target for target in targets if target.url not in carried])
+    jobs = [scheduler.Job(index, target.url) for index, target in enumerate(targets, start=1) if target.url not in carried]
+    events.emit("scrape_start", catalog=catalog, total=len(jobs), carried=len(carried))
+    progress = events.Progress(len(jobs), catalog=catalog)
+
+    fetched: Dict[int, Product] = {}
+    errors: Dict[int, Exception] = {}
+
+    async def work(job: scheduler.Job) -> bool:
+        target = targets[job.index - 1]
         try:
-            with _override_http_retries(target.get("retries")):
-                product = scrape_product(url, scraper=target.get("scraper"))
-            if target.get("salesChannels"):
-                product["banks"] = target["salesChannels"]
-            product["id"] = build_product_id(product, index)
-            product.setdefault("updatedAt", timestamp)
+            with retries_override(target.retries), throttle.site_scope(job.host):
+                product = await ascrape_product(job.url, scraper=target.scraper)
+        except Exception as exc:
+            errors[job.index] = exc
+            progress.finish(ok=False)
+            return False
+        progress.finish(ok=True)
+        if track:
+            refresh.record(job.url, product.nav_date)
+        product.updated_at = product.updated_at or timestamp
+        fetched[job.index] = product
+        return True
+
+    ticker = asyncio.create_task(progress.run()) if events.enabled() else None
+    try:
+        # Profiles attribute CPU and memory to one product at a time, so they run serially.
+        await scheduler.run(jobs, work, max_workers=1 if profiling.enabled() else None)
+    finally:
+        if ticker is not None:
+            ticker.cancel()
+    progress.report()
+
+    for index, target in enumerate(targets, start=1):
+        url = target.url
+        try:
+            if index in errors:
+                raise errors[index]
+            product = carried.get(url)
+            if product is not None:
+                # Not fetched this run: lastCheckedAt stays when the site was last asked.
+                product.last_checked_at = product.last_checked_at or product.updated_at
+            else:
+                product = fetched[index]
+                product.last_checked_at = timestamp
+            if target.sales_channels:
+                product.banks = target.sales_channels
+            product.id = build_product_id(product, index)
+            product.validate()
             products.append(product)
         except Exception as exc:
             failures.append((url, str(exc)))
-            print(f"[scrape] failed for {url}: {exc}", file=sys.stderr, flush=True)
+            _log.warning("[scrape] failed for %s: %s", url, exc, extra={"fields": {"url": url}})
             continue
+    events.emit("scrape_finish", catalog=catalog, succeeded=len(products), failed=len(failures), seconds=round(time.monotonic() - progress.started, 3))
     return products, failures
 
 
-def write_json(path: Path, data: List[Dict]) -> None:
+def scrape_all(
+    items: Iterable[str | Dict[str, Any] | Target],
+    previous: Optional[Dict[str, Dict]] = None,
+    *,
+    catalog: str = "",
+) -> Tuple[List[Product], List[Tuple[str, str]]]:
+    """Synchronous wrapper around ascrape_all."""
+    return run_sync(ascrape_all(items, previous=previous, catalog=catalog))
+
+
+def write_json(path: Path, data: Iterable[Product | Dict]) -> None:
     path.parent.mkdir(parents=True, exist_ok=True)
-    path.write_text(json.dumps(data, ensure_ascii=False, indent=2), encoding="utf-8")
+    items = [item.to_dict() if isinstance(item, Product) else item for item in data]
+    path.write_bytes(codec.dumps(items, indent=True))
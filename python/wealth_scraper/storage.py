@@ -43,29 +43,24 @@ def _upload_s3(file_path: Path, bucket: str, key: str, region: str | None = None
     s3.upload_file(str(file_path), bucket, key)
 
 
-def publish_outputs(paths: Dict) -> None:
-    """Publish generated JSONs to OSS or S3 if env variables are present."""
-
-    wealth_path: Path = paths["wealth_output"]
-    fund_path: Path = paths["fund_output"]
+def publish_output(name: str, file_path: Path) -> None:
+    """Publish one generated JSON (``<prefix>/<name>.json``) to OSS or S3 if env variables are present."""
 
     # OSS
     oss_bucket = os.environ.get("OSS_BUCKET")
     if oss_bucket:
         prefix = os.environ.get("OSS_PREFIX", "data")
-        region = os.environ.get("OSS_REGION")  # optional
-        wealth_key = f"{prefix}/wealth.json"
-        fund_key = f"{prefix}/fund.json"
-        _upload_oss(wealth_path, oss_bucket, wealth_key, os.environ.get("OSS_ENDPOINT"))
-        _upload_oss(fund_path, oss_bucket, fund_key, os.environ.get("OSS_ENDPOINT"))
+        _upload_oss(file_path, oss_bucket, f"{prefix}/{name}.json", os.environ.get("OSS_ENDPOINT"))
 
     # S3
     s3_bucket = os.environ.get("S3_BUCKET")
     if s3_bucket:
         prefix = os.environ.get("S3_PREFIX", "data")
         region = os.environ.get("S3_REGION")  # optional
-        wealth_key = f"{prefix}/wealth.json"
-        fund_key = f"{prefix}/fund.json"
-        _upload_s3(wealth_path, s3_bucket, wealth_key, region)
-        _upload_s3(fund_path, s3_bucket, fund_key, region)
+        _upload_s3(file_path, s3_bucket, f"{prefix}/{name}.json", region)
 
+
+def publish_outputs(paths: Dict) -> None:
+    """Publish generated JSONs to OSS or S3 if env variables are present."""
+    publish_output("wealth", paths["wealth_output"])
+    publish_output("fund", paths["fund_output"])
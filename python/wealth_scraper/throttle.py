@@ -0,0 +1,323 @@
+"""Adaptive per-host request concurrency (AIMD), shared by every product on a host.
+
+Each host starts at ``WEALTH_HOST_CONCURRENCY_START`` (default 2) requests in
+flight. A response that is neither throttled nor slower than twice the host's
+smoothed latency adds ``1/limit``, i.e. about one more slot per full window, up
+to ``WEALTH_HOST_CONCURRENCY_MAX`` (default 8). A 429 or 503 halves the limit,
+at most once per smoothed latency so one burst of errors counts once, down to a
+single request; for ``WEALTH_THROTTLE_CEILING_SECONDS`` (default 60) afterwards
+the limit stays below the level that was throttled instead of probing it again.
+``Retry-After`` pauses the host: no new request starts before it has passed
+(capped at ``WEALTH_RETRY_AFTER_MAX`` seconds, default 60).
+
+``WEALTH_THROTTLE=0`` turns the controller off.
+
+Sites in ``wealth_links.json`` can also declare fixed limits: ``rps`` requests
+per second with bursts of up to ``burst`` (a token bucket), and at most
+``maxConcurrency`` requests in flight. They apply to the host of the site's
+products and to every other host those products request, stay in force with
+the adaptive controller off, and cap its limit.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import datetime as dt
+import email.utils
+import os
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, Iterator, List, Optional
+
+from .logger import get_logger
+
+_log = get_logger("throttle")
+
+THROTTLE_STATUSES = frozenset({429, 503})
+_SLOW_FACTOR = 2.0
+_LATENCY_SMOOTHING = 0.2
+
+
+def enabled() -> bool:
+    return os.environ.get("WEALTH_THROTTLE", "1").strip().lower() not in ("0", "false", "no", "off")
+
+
+def parse_retry_after(value: Optional[str], now: Optional[float] = None) -> Optional[float]:
+    """Seconds to wait from a Retry-After header (delta-seconds or HTTP date)."""
+    if not value:
+        return None
+    value = value.strip()
+    if value.isdigit():
+        seconds = float(value)
+    else:
+        try:
+            when = email.utils.parsedate_to_datetime(value)
+        except (TypeError, ValueError):
+            return None
+        if when.tzinfo is None:
+            when = when.replace(tzinfo=dt.timezone.utc)
+        seconds = when.timestamp() - (time.time() if now is None else now)
+    limit = float(os.environ.get("WEALTH_RETRY_AFTER_MAX") or 60)
+    return min(max(seconds, 0.0), limit)
+
+
+class HostLimiter:
+    def __init__(self, host: str, start: float, maximum: float) -> None:
+        self.host = host
+        self.limit = float(start)
+        self.maximum = float(maximum)
+        self.in_flight = 0
+        self.latency: Optional[float] = None
+        self.throttled = 0
+        self._paused_until = 0.0
+        self._last_cut = 0.0
+        self._ceiling = float(maximum)
+        self._ceiling_until = 0.0
+        self._lock = threading.Lock()
+        self._waiters: List[asyncio.Future] = []
+
+    def capacity(self) -> int:
+        return max(1, int(self.limit))
+
+    async def acquire(self) -> float:
+        """Wait until a slot is free and the host is not paused; returns seconds waited."""
+        loop = asyncio.get_running_loop()
+        started = time.monotonic()
+        while True:
+            with self._lock:
+                pause = self._paused_until - time.monotonic()
+                if pause <= 0 and self.in_flight < self.capacity():
+                    self.in_flight += 1
+                    return _count_wait(time.monotonic() - started)
+                waiter = loop.create_future()
+                self._waiters.append(waiter)
+            try:
+                await asyncio.wait_for(waiter, timeout=pause if pause > 0 else None)
+            except asyncio.TimeoutError:
+                pass
+            finally:
+                with self._lock:
+                    if waiter in self._waiters:
+                        self._waiters.remove(waiter)
+
+    def release(self, seconds: float, status: Optional[int], retry_after: Optional[float] = None) -> None:
+        with self._lock:
+            self.in_flight -= 1
+            now = time.monotonic()
+            if retry_after:
+                self._paused_until = max(self._paused_until, now + retry_after)
+            if status in THROTTLE_STATUSES:
+                self.throttled += 1
+                if now - self._last_cut >= (self.latency or 0.0):
+                    self._ceiling = max(1.0, float(self.capacity()) - 1)
+                    self._ceiling_until = now + float(os.environ.get("WEALTH_THROTTLE_CEILING_SECONDS") or 60)
+                    self.limit = max(1.0, self.limit / 2)
+                    self._last_cut = now
+                    _log.info("[throttle] %s answered %s; concurrency now %d", self.host, status, self.capacity())
+            elif status is not None and status < 400:
+                stable = self.latency is None or seconds <= self.latency * _SLOW_FACTOR
+                self.latency = seconds if self.latency is None else (
+                    (1 - _LATENCY_SMOOTHING) * self.latency + _LATENCY_SMOOTHING * seconds
+                )
+                if stable:
+                    ceiling = self._ceiling if now < self._ceiling_until else self.maximum
+                    self.limit = max(self.limit, min(ceiling, self.limit + 1 / self.limit))
+            waiters, self._waiters = self._waiters, []
+        _wake_all(waiters)
+
+
+class TokenBucket:
+    """Fixed limits declared for a site: rps/burst pacing and a cap on requests in flight."""
+
+    def __init__(self, host: str, rps: Optional[float] = None, burst: Optional[float] = None, max_concurrency: Optional[int] = None) -> None:
+        self.host = host
+        self.rps = rps
+        self.burst = max(1.0, burst if burst is not None else (rps or 1.0))
+        self.max_concurrency = max_concurrency
+        self.in_flight = 0
+        self.waited = 0.0
+        self._tokens = self.burst
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+        self._waiters: List[asyncio.Future] = []
+
+    def limits(self) -> tuple:
+        return (self.rps, self.burst, self.max_concurrency)
+
+    def _refill(self, now: float) -> None:
+        if self.rps:
+            self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rps)
+        self._updated = now
+
+    async def acquire(self) -> float:
+        """Wait for a token and a free slot; returns seconds waited."""
+        loop = asyncio.get_running_loop()
+        started = time.monotonic()
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._refill(now)
+                slot = self.max_concurrency is None or self.in_flight < self.max_concurrency
+                if slot and (not self.rps or self._tokens >= 1):
+                    if self.rps:
+                        self._tokens -= 1
+                    self.in_flight += 1
+                    waited = now - started
+                    self.waited += waited
+                    return _count_wait(waited)
+                # Without a free slot, wait for a release; otherwise until the next token.
+                timeout = (1 - self._tokens) / self.rps if slot else None
+                waiter = loop.create_future()
+                self._waiters.append(waiter)
+            try:
+                await asyncio.wait_for(waiter, timeout=timeout)
+            except asyncio.TimeoutError:
+                pass
+            finally:
+                with self._lock:
+                    if waiter in self._waiters:
+                        self._waiters.remove(waiter)
+
+    def release(self) -> None:
+        with self._lock:
+            self.in_flight -= 1
+            waiters, self._waiters = self._waiters, []
+        _wake_all(waiters)
+
+
+# Running total of the acquire() waits inside the innermost waits() block.
+_WAITED: ContextVar[Optional[List[float]]] = ContextVar("wealth_throttle_waited", default=None)
+
+
+def _count_wait(seconds: float) -> float:
+    total = _WAITED.get()
+    if total is not None:
+        total[0] += seconds
+    return seconds
+
+
+@contextmanager
+def waits() -> Iterator[List[float]]:
+    """Add up the slot and token waits of requests made in the block (and in the
+    tasks it starts); the total is the single item of the yielded list."""
+    total = [0.0]
+    token = _WAITED.set(total)
+    try:
+        yield total
+    finally:
+        _WAITED.reset(token)
+
+
+def _wake_all(waiters: List[asyncio.Future]) -> None:
+    for waiter in waiters:
+        # Waiters may belong to another thread's event loop (or one that has closed).
+        try:
+            waiter.get_loop().call_soon_threadsafe(_wake, waiter)
+        except RuntimeError:
+            pass
+
+
+def _wake(waiter: asyncio.Future) -> None:
+    if not waiter.done():
+        waiter.set_result(None)
+
+
+_LIMITERS: Dict[str, HostLimiter] = {}
+_BUCKETS: Dict[str, TokenBucket] = {}
+_LOCK = threading.Lock()
+# The site bucket of the product being scraped, so its requests to other hosts share it.
+_SITE: ContextVar[Optional[TokenBucket]] = ContextVar("wealth_site_bucket", default=None)
+
+
+def limiter(host: str) -> Optional[HostLimiter]:
+    """The shared limiter for host, or None when throttling is off."""
+    if not enabled():
+        return None
+    host = host.lower()
+    with _LOCK:
+        current = _LIMITERS.get(host)
+        if current is None:
+            start = float(os.environ.get("WEALTH_HOST_CONCURRENCY_START") or 2)
+            maximum = float(os.environ.get("WEALTH_HOST_CONCURRENCY_MAX") or 8)
+            site = _BUCKETS.get(host)
+            if site is not None and site.max_concurrency:
+                maximum = min(maximum, float(site.max_concurrency))
+            current = _LIMITERS[host] = HostLimiter(host, min(start, maximum), maximum)
+        return current
+
+
+def configure_site(host: str, *, rps: Optional[float] = None, burst: Optional[float] = None, max_concurrency: Optional[int] = None) -> TokenBucket:
+    """Declare fixed limits for host (replacing earlier ones for it)."""
+    host = host.lower()
+    wanted = TokenBucket(host, rps, burst, max_concurrency)
+    with _LOCK:
+        current = _BUCKETS.get(host)
+        if current is None or current.limits() != wanted.limits():
+            current = _BUCKETS[host] = wanted
+        adaptive = _LIMITERS.get(host)
+        if adaptive is not None and max_concurrency:
+            adaptive.maximum = min(adaptive.maximum, float(max_concurrency))
+            adaptive.limit = min(adaptive.limit, adaptive.maximum)
+        return current
+
+
+def site_bucket(host: str) -> Optional[TokenBucket]:
+    """The fixed limits for a request to host: its own, or else those of the site
+    being scraped (looked up per request, so a host shared by several sites
+    follows whichever site's product is asking)."""
+    with _LOCK:
+        current = _BUCKETS.get(host.lower())
+    return current if current is not None else _SITE.get()
+
+
+@contextmanager
+def site_scope(host: str) -> Iterator[None]:
+    """Bind requests made inside the block to host's site limits, whatever host they go to."""
+    with _LOCK:
+        current = _BUCKETS.get(host.lower())
+    token = _SITE.set(current)
+    try:
+        yield
+    finally:
+        _SITE.reset(token)
+
+
+def capacity(host: str, default: int) -> int:
+    current = limiter(host)
+    value = default if current is None else current.capacity()
+    with _LOCK:
+        site = _BUCKETS.get(host.lower())
+    if site is not None and site.max_concurrency:
+        value = min(value, site.max_concurrency)
+    return value
+
+
+def summary() -> Dict[str, Dict]:
+    with _LOCK:
+        limiters = dict(_LIMITERS)
+        buckets = dict(_BUCKETS)
+    report: Dict[str, Dict] = {}
+    for host in sorted(set(limiters) | set(buckets)):
+        entry: Dict = {}
+        item = limiters.get(host)
+        if item is not None:
+            entry.update(concurrency=item.capacity(), throttled=item.throttled, latency=round(item.latency or 0.0, 4))
+        site = buckets.get(host)
+        if site is not None:
+            entry.update(
+                site=site.host,
+                rps=site.rps,
+                burst=site.burst,
+                maxConcurrency=site.max_concurrency,
+                rateWaitSeconds=round(site.waited, 4),
+            )
+        report[host] = entry
+    return report
+
+
+def reset() -> None:
+    with _LOCK:
+        _LIMITERS.clear()
+        _BUCKETS.clear()
@@ -0,0 +1,157 @@
+"""Lightweight stage spans exported as Chrome trace-event JSON (open in Perfetto)."""
+
+from __future__ import annotations
+
+import asyncio
+import functools
+import inspect
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+
+from .metrics import current_provider
+
+_ENABLED = False
+_ORIGIN_NS = 0
+_LOCK = threading.Lock()
+_EVENTS: List[Dict[str, Any]] = []
+
+
+class _NullSpan:
+    __slots__ = ()
+
+    def __enter__(self) -> "_NullSpan":
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> bool:
+        return False
+
+    def set(self, **args: Any) -> None:
+        pass
+
+
+_NULL_SPAN = _NullSpan()
+
+
+class _Span:
+    __slots__ = ("stage", "args", "_start")
+
+    def __init__(self, stage: str, args: Dict[str, Any]) -> None:
+        self.stage = stage
+        self.args = args
+        self._start = 0
+
+    def __enter__(self) -> "_Span":
+        self._start = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> bool:
+        end = time.perf_counter_ns()
+        if exc_type is not None:
+            self.args["error"] = f"{exc_type.__name__}: {exc}"
+        provider = current_provider()
+        event = {
+            "name": f"{provider}.{self.stage}" if provider else self.stage,
+            "cat": self.stage,
+            "ph": "X",
+            "ts": (self._start - _ORIGIN_NS) / 1000,
+            "dur": (end - self._start) / 1000,
+            "pid": os.getpid(),
+            "tid": _lane(),
+            "args": self.args,
+        }
+        with _LOCK:
+            _EVENTS.append(event)
+        return False
+
+    def set(self, **args: Any) -> None:
+        self.args.update(args)
+
+
+def _lane() -> int:
+    """Trace row of the running code: its asyncio task, so concurrent products get separate rows."""
+    try:
+        task = asyncio.current_task()
+    except RuntimeError:
+        task = None
+    return id(task) if task is not None else threading.get_ident()
+
+
+def enabled() -> bool:
+    return _ENABLED
+
+
+def span(stage: str, **args: Any):
+    """Time a stage (fetch/sign/parse/compute); a shared no-op when tracing is off."""
+    if not _ENABLED:
+        return _NULL_SPAN
+    return _Span(stage, args)
+
+
+def traced(stage: str) -> Callable[[Callable], Callable]:
+    def decorator(func: Callable) -> Callable:
+        if inspect.iscoroutinefunction(func):
+
+            @functools.wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                if not _ENABLED:
+                    return await func(*args, **kwargs)
+                with _Span(stage, {"func": func.__name__}):
+                    return await func(*args, **kwargs)
+
+            return async_wrapper
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not _ENABLED:
+                return func(*args, **kwargs)
+            with _Span(stage, {"func": func.__name__}):
+                return func(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
+
+
+def start() -> None:
+    global _ENABLED, _ORIGIN_NS
+    with _LOCK:
+        _EVENTS.clear()
+    _ORIGIN_NS = time.perf_counter_ns()
+    _ENABLED = True
+
+
+def stop(path: Optional[Path] = None) -> List[Dict[str, Any]]:
+    global _ENABLED
+    _ENABLED = False
+    with _LOCK:
+        events = list(_EVENTS)
+    if path is not None:
+        export(path, events)
+    return events
+
+
+def export(path: Path, events: Optional[List[Dict[str, Any]]] = None) -> None:
+    if events is None:
+        with _LOCK:
+            events = list(_EVENTS)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    payload = {"traceEvents": events, "displayTimeUnit": "ms"}
+    path.write_text(json.dumps(payload, ensure_ascii=False, default=str), encoding="utf-8")
+
+
+@contextmanager
+def session(path: Path | str | None):
+    """Trace the enclosed block into path; does nothing when path is empty."""
+    if not path:
+        yield
+        return
+    start()
+    try:
+        yield
+    finally:
+        stop(Path(path))
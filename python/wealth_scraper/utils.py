@@ -1,8 +1,11 @@
 from __future__ import annotations
 
+import asyncio
 import datetime as dt
 import re
-from typing import Dict, List, Optional, Tuple
+from typing import Any, Awaitable, Callable, Coroutine, Dict, List, Optional, Tuple, TypeVar
+
+T = TypeVar("T")
 
 
 def parse_date(value: str | int | float) -> Optional[dt.date]:
@@ -87,6 +90,11 @@ def compute_window_return_with_details(
     )
 
 
+def latest_nav_date(series: List[Tuple[dt.date, float]]) -> str:
+    """ISO date of the newest point in series, or "" when it is empty."""
+    return max(point[0] for point in series).isoformat() if series else ""
+
+
 def normalize_returns(returns: Dict[str, Optional[float]]) -> Dict[str, float]:
     normalized: Dict[str, float] = {}
     for key in ("1m", "3m", "6m"):
@@ -112,3 +120,34 @@ def parse_min_hold_days(text: str) -> Optional[int]:
 
 def strip_company_suffix(name: str) -> str:
     return re.sub(r"(有限责任公司|有限公司)$", "", name or "").strip()
+
+
+# Coroutine functions awaited before run_sync's event loop closes (e.g. closing kept-alive connections).
+_LOOP_EXIT: List[Callable[[], Awaitable[None]]] = []
+
+
+def on_loop_exit(cleanup: Callable[[], Awaitable[None]]) -> Callable[[], Awaitable[None]]:
+    """Register cleanup to be awaited at the end of every run_sync call."""
+    _LOOP_EXIT.append(cleanup)
+    return cleanup
+
+
+async def _run_then_clean_up(coro: Coroutine[Any, Any, T]) -> T:
+    try:
+        return await coro
+    finally:
+        for cleanup in _LOOP_EXIT:
+            await cleanup()
+
+
+def run_sync(coro: Coroutine[Any, Any, T]) -> T:
+    """Run a coroutine to completion from synchronous code (one event loop per call).
+
+    Inside a running event loop the coroutine must be awaited instead.
+    """
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return asyncio.run(_run_then_clean_up(coro))
+    coro.close()
+    raise RuntimeError("synchronous wrapper called from a running event loop; await the async variant")